@@ -53,6 +53,10 @@ setup(
         'backoff==1.3.2',
         'psycopg2==2.7.3.2',
       ],
+      extras_require={
+        'orjson': ['orjson>=3.9'],
+        'unload': ['boto3'],
+      },
       setup_requires=[
         'pytest-runner>=2.11,<3.0a',
       ],
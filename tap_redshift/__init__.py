@@ -18,13 +18,13 @@
 # data.world, Inc.(http://data.world/).
 
 import copy
+import hashlib
 import time
+from collections import namedtuple
 from itertools import groupby
 
 import pendulum
 import datetime
-import sys
-import simplejson as json
 
 import psycopg2
 import singer
@@ -34,7 +34,15 @@ from singer import utils
 from singer.catalog import Catalog, CatalogEntry
 from singer.schema import Schema
 
-from tap_redshift import resolve
+from tap_redshift import (cache, checkpoint, delta, keyset, parallel,
+                          partition, planner, resolve, rowhash, unload,
+                          window)
+from tap_redshift.connections import ConnectionPool, config_list
+from tap_redshift.convert import TypecastConnection, build_row_converter
+from tap_redshift.encoders import get_encoder
+from tap_redshift.messages import RecordBatch
+from tap_redshift.output import (DEFAULT_BUFFER_SIZE, DEFAULT_FLUSH_INTERVAL,
+                                 CatalogWriter, OutputWriter)
 
 __version__ = '1.0.0b9'
 
@@ -66,126 +74,464 @@ DATE_TYPES = {'date'}
 DATETIME_TYPES = {'timestamp', 'timestamptz',
                   'timestamp without time zone', 'timestamp with time zone'}
 
+# Types whose columns rows can be replicated incrementally by: ordered, and
+# held in zone maps, so range predicates on them skip blocks
+REPLICATION_KEY_TYPES = (DATETIME_TYPES | DATE_TYPES |
+                         set(BYTES_FOR_INTEGER_TYPE))
+
+# Schema properties of each supported column type
+TYPE_SCHEMAS = dict(
+    [('bool', {'type': 'boolean'})] +
+    [(column_type, {'type': 'integer',
+                    'minimum': 0 - 2 ** (size * 8 - 1),
+                    'maximum': 2 ** (size * 8 - 1) - 1})
+     for column_type, size in BYTES_FOR_INTEGER_TYPE.items()] +
+    [(column_type, {'type': 'number'})
+     for column_type in FLOAT_TYPES | {'numeric'}] +
+    [(column_type, {'type': 'string'}) for column_type in STRING_TYPES] +
+    [(column_type, {'type': 'string', 'format': 'date-time'})
+     for column_type in DATETIME_TYPES] +
+    [(column_type, {'type': 'string', 'format': 'date'})
+     for column_type in DATE_TYPES])
+
+# A column classified once during discovery
+ColumnRecord = namedtuple(
+    'ColumnRecord', ['name', 'sql_datatype', 'schema', 'replication_key'])
+
+DEFAULT_ITERSIZE = 20000
+
+# Column rows fetched per round trip while discovering over pg_catalog
+DISCOVERY_ITERSIZE = 2000
+
+# Metadata written by discovery, as opposed to what users and the planner add
+DISCOVERY_METADATA_KEYS = {
+    'selected-by-default', 'table-key-properties', 'view-key-properties',
+    'is-view', 'schema-name', 'database-name', 'valid-replication-keys',
+    'forced-replication-method', 'sql-datatype', 'inclusion',
+    'column-signature'}
+
 CONFIG = {}
 
 
-def discover_catalog(conn, db_schema):
-    '''Returns a Catalog describing the structure of the database.'''
+def information_schema_tables(conn, db_schemas):
+    '''Yields (schema, table, is view, columns, primary keys) for each table
+    of the schemas, read from the INFORMATION_SCHEMA views with three
+    queries per schema.
+
+    Each query's result is fetched whole, so a schema's columns are all
+    held in memory at once.'''
+    for db_schema in db_schemas:
+        table_spec = select_all(
+            conn,
+            """
+            SELECT table_name, table_type
+            FROM INFORMATION_SCHEMA.Tables
+            WHERE table_schema = %s
+            """,
+            (db_schema,))
+
+        column_specs = select_all(
+            conn,
+            """
+            SELECT c.table_name, c.ordinal_position, c.column_name,
+            c.udt_name, c.is_nullable
+            FROM INFORMATION_SCHEMA.Tables t
+            JOIN INFORMATION_SCHEMA.Columns c
+                ON c.table_schema = t.table_schema AND
+                   c.table_name = t.table_name
+            WHERE t.table_schema = %s
+            ORDER BY c.table_name, c.ordinal_position
+            """,
+            (db_schema,))
+
+        pk_specs = select_all(
+            conn,
+            """
+            SELECT kc.table_name, kc.column_name
+            FROM information_schema.table_constraints tc
+            JOIN information_schema.key_column_usage kc
+                ON kc.table_name = tc.table_name AND
+                   kc.table_schema = tc.table_schema AND
+                   kc.constraint_name = tc.constraint_name
+            WHERE tc.constraint_type = 'PRIMARY KEY' AND
+                  tc.table_schema = %s
+            ORDER BY
+              tc.table_schema,
+              tc.table_name,
+              kc.ordinal_position
+            """,
+            (db_schema,))
+
+        table_pks = {k: [t[1] for t in v]
+                     for k, v in groupby(pk_specs, key=lambda t: t[0])}
+        table_types = dict(table_spec)
+
+        for table_name, rows in groupby(column_specs, key=lambda t: t[0]):
+            cols = [{'pos': t[1], 'name': t[2], 'type': t[3],
+                     'nullable': t[4]} for t in rows]
+            yield (db_schema, table_name,
+                   table_types.get(table_name) == 'VIEW', cols,
+                   table_pks.get(table_name, []))
+
+
+def pg_catalog_tables(conn, db_schemas):
+    '''Yields (schema, table, is view, columns, primary keys) for each table
+    of the schemas, read from pg_catalog in a single query and grouped one
+    table at a time as the rows are iterated.
+
+    The rows come through a named cursor, DISCOVERY_ITERSIZE at a time, so
+    only that batch and the table being grouped are held in memory.'''
+    with conn.cursor(name='tap_redshift_discovery') as cursor:
+        cursor.itersize = DISCOVERY_ITERSIZE
+        cursor.execute(
+            """
+            SELECT n.nspname, c.relname, c.relkind, a.attnum, a.attname,
+                   t.typname, a.attnotnull, con.conkey
+            FROM pg_catalog.pg_namespace n
+            JOIN pg_catalog.pg_class c ON c.relnamespace = n.oid
+            JOIN pg_catalog.pg_attribute a ON a.attrelid = c.oid
+            JOIN pg_catalog.pg_type t ON t.oid = a.atttypid
+            LEFT JOIN pg_catalog.pg_constraint con
+                ON con.conrelid = c.oid AND con.contype = 'p'
+            WHERE n.nspname IN %s AND c.relkind IN ('r', 'v') AND
+                  a.attnum > 0 AND NOT a.attisdropped
+            ORDER BY n.nspname, c.relname, a.attnum
+            """,
+            (tuple(db_schemas),))
+
+        for (db_schema, table_name), rows in groupby(
+                cursor, key=lambda r: (r[0], r[1])):
+            rows = list(rows)
+            relkind, conkey = rows[0][2], rows[0][7]
+            cols = [{'pos': attnum, 'name': name, 'type': typname,
+                     'nullable': 'NO' if notnull else 'YES'}
+                    for _, _, _, attnum, name, typname, notnull, _ in rows]
+            column_names = {c['pos']: c['name'] for c in cols}
+            pks = [column_names[attnum] for attnum in conkey or []
+                   if attnum in column_names]
+            yield db_schema, table_name, relkind == 'v', cols, pks
+
+
+DISCOVERY_METHODS = {
+    'pg_catalog': pg_catalog_tables,
+    'information_schema': information_schema_tables,
+}
 
-    table_spec = select_all(
-        conn,
-        """
-        SELECT table_name, table_type
-        FROM INFORMATION_SCHEMA.Tables
-        WHERE table_schema = '{}'
-        """.format(db_schema))
-
-    column_specs = select_all(
-        conn,
-        """
-        SELECT c.table_name, c.ordinal_position, c.column_name, c.udt_name,
-        c.is_nullable
-        FROM INFORMATION_SCHEMA.Tables t
-        JOIN INFORMATION_SCHEMA.Columns c ON c.table_name = t.table_name
-        WHERE t.table_schema = '{}'
-        ORDER BY c.table_name, c.ordinal_position
-        """.format(db_schema))
-
-    pk_specs = select_all(
-        conn,
-        """
-        SELECT kc.table_name, kc.column_name
-        FROM information_schema.table_constraints tc
-        JOIN information_schema.key_column_usage kc
-            ON kc.table_name = tc.table_name AND
-               kc.table_schema = tc.table_schema AND
-               kc.constraint_name = tc.constraint_name
-        WHERE tc.constraint_type = 'PRIMARY KEY' AND
-              tc.table_schema = '{}'
-        ORDER BY
-          tc.table_schema,
-          tc.table_name,
-          kc.ordinal_position
-        """.format(db_schema))
 
+def column_signature(cols, pks, is_view):
+    '''Returns a hash of everything a table's catalog entry is built
+    from.'''
+    signature = (is_view, pks, [(c['pos'], c['name'], c['type'],
+                                 c['nullable']) for c in cols])
+    return hashlib.sha1(repr(signature).encode('utf-8')).hexdigest()
+
+
+def build_entry(db_name, db_schema, table_name, cols, pks, is_view,
+                signature):
+    qualified_table_name = '{}.{}'.format(db_schema, table_name)
+    records = [classify_column(c) for c in cols]
+    schema = Schema(type='object',
+                    properties={r.name: r.schema for r in records})
+    key_properties = [
+        column for column in pks
+        if schema.properties[column].inclusion != 'unsupported']
+    mdata = build_metadata(
+        db_name, records, is_view, table_name, key_properties, signature)
+    tap_stream_id = '{}.{}'.format(
+        db_name, qualified_table_name)
+    return CatalogEntry(
+        tap_stream_id=tap_stream_id,
+        stream=stream_name(db_name, db_schema, table_name),
+        schema=schema,
+        table=qualified_table_name,
+        metadata=mdata)
+
+
+def stream_name(db_name, db_schema, table_name):
+    '''Returns the table name, qualified with its schema and database when
+    several are configured so that stream names stay unique.'''
+    parts = [table_name]
+    if len(config_list(CONFIG.get('schema', db_schema))) > 1:
+        parts.insert(0, db_schema)
+    if len(config_list(CONFIG.get('dbname', db_name))) > 1:
+        parts.insert(0, db_name)
+    return '-'.join(parts)
+
+
+def renamed(catalog_entry):
+    '''Returns a reused entry with its stream named for the databases and
+    schemas configured now, which may not be those it was built with.'''
+    db_schema, table_name = catalog_entry.table.split('.')
+    catalog_entry.stream = stream_name(entry_database(catalog_entry),
+                                       db_schema, table_name)
+    return catalog_entry
+
+
+def merge_entry(previous, discovered):
+    '''Returns the discovered entry of an altered table, keeping the
+    metadata the previous entry had beyond what discovery writes, such as
+    selections and replication settings, for breadcrumbs that still
+    exist.'''
+    previous_mdata = metadata.to_map(previous.metadata)
+    mdata = metadata.to_map(discovered.metadata)
+    for breadcrumb, values in mdata.items():
+        for key, value in previous_mdata.get(breadcrumb, {}).items():
+            if key not in DISCOVERY_METADATA_KEYS:
+                values.setdefault(key, value)
+    discovered.metadata = metadata.to_list(mdata)
+    return discovered
+
+
+def previous_schema_entries(db_name, db_schemas, previous):
+    '''Returns the entries of the previous catalog for the tables of a
+    database's schemas, by tap_stream_id.'''
+    stream_prefixes = tuple('{}.{}.'.format(db_name, db_schema)
+                            for db_schema in db_schemas)
+    return {entry.tap_stream_id: entry for entry in
+            (previous.streams if previous else [])
+            if entry.tap_stream_id.startswith(stream_prefixes)}
+
+
+def refresh_previous(catalog, db_name, db_schemas, previous):
+    '''Returns a discovered catalog brought onto the previous one the way
+    discovered_entries does: entries of tables unchanged since are the
+    previous ones, and those of altered tables keep the previous entries'
+    selections and replication settings.'''
+    report = {'added': [], 'altered': [], 'unchanged': []}
+    previous_entries = previous_schema_entries(db_name, db_schemas, previous)
     entries = []
-    table_columns = [{'name': k, 'columns': [
-        {'pos': t[1], 'name': t[2], 'type': t[3],
-         'nullable': t[4]} for t in v]}
-                     for k, v in groupby(column_specs, key=lambda t: t[0])]
-
-    table_pks = {k: [t[1] for t in v]
-                 for k, v in groupby(pk_specs, key=lambda t: t[0])}
-
-    table_types = dict(table_spec)
-
-    for items in table_columns:
-        table_name = items['name']
-        qualified_table_name = '{}.{}'.format(db_schema, table_name)
-        cols = items['columns']
-        schema = Schema(type='object',
-                        properties={
-                            c['name']: schema_for_column(c) for c in cols})
-        key_properties = [
-            column for column in table_pks.get(table_name, [])
-            if schema.properties[column].inclusion != 'unsupported']
-        is_view = table_types.get(table_name) == 'VIEW'
-        db_name = conn.get_dsn_parameters()['dbname']
-        metadata = create_column_metadata(
-            db_name, cols, is_view, table_name, key_properties)
-        tap_stream_id = '{}.{}'.format(
-            db_name, qualified_table_name)
-        entry = CatalogEntry(
-            tap_stream_id=tap_stream_id,
-            stream=table_name,
-            schema=schema,
-            table=qualified_table_name,
-            metadata=metadata)
-
+    for entry in catalog.streams:
+        previous_entry = previous_entries.pop(entry.tap_stream_id, None)
+        if previous_entry is None:
+            report['added'].append(entry.tap_stream_id)
+        elif metadata.get(metadata.to_map(previous_entry.metadata), (),
+                          'column-signature') == metadata.get(
+                metadata.to_map(entry.metadata), (), 'column-signature'):
+            report['unchanged'].append(entry.tap_stream_id)
+            entry = renamed(previous_entry)
+        else:
+            report['altered'].append(entry.tap_stream_id)
+            entry = merge_entry(previous_entry, entry)
         entries.append(entry)
-
+    report['dropped'] = sorted(previous_entries)
+    log_changes(report)
     return Catalog(entries)
 
 
-def do_discover(conn, db_schema):
-    LOGGER.info("Running discover")
-    discover_catalog(conn, db_schema).dump()
-    LOGGER.info("Completed discover")
+def discovered_entries(conn, db_schemas, previous=None, report=None):
+    '''Yields a catalog entry for each table of the schemas as soon as it
+    is read, so only one table is held at a time.
+
+    Entries of the previous catalog are yielded, only renamed, for tables
+    whose column signature has not changed, so only added and altered
+    tables are built again. The tables added, altered, dropped and
+    unchanged since the previous catalog are recorded in `report` once
+    every entry has been yielded.'''
+
+    db_schemas = config_list(db_schemas)
+    report = report if report is not None else {}
+    for change in ('added', 'altered', 'dropped', 'unchanged'):
+        report[change] = []
+    db_name = conn.get_dsn_parameters()['dbname']
+    previous_entries = previous_schema_entries(db_name, db_schemas, previous)
+
+    read_tables = DISCOVERY_METHODS[
+        CONFIG.get('discovery_method', 'pg_catalog')]
+    for db_schema, table_name, is_view, cols, pks in read_tables(
+            conn, db_schemas):
+        tap_stream_id = '{}.{}.{}'.format(db_name, db_schema, table_name)
+        signature = column_signature(cols, pks, is_view)
+
+        previous_entry = previous_entries.pop(tap_stream_id, None)
+        if previous_entry is None:
+            report['added'].append(tap_stream_id)
+        elif metadata.get(metadata.to_map(previous_entry.metadata), (),
+                          'column-signature') == signature:
+            report['unchanged'].append(tap_stream_id)
+            yield renamed(previous_entry)
+            continue
+        else:
+            report['altered'].append(tap_stream_id)
 
+        entry = build_entry(db_name, db_schema, table_name, cols, pks,
+                            is_view, signature)
+        if previous_entry is not None:
+            entry = merge_entry(previous_entry, entry)
+        yield entry
+
+    report['dropped'] = sorted(previous_entries)
 
-def schema_for_column(c):
-    '''Returns the Schema object for the given Column.'''
-    column_type = c['type'].lower()
-    column_nullable = c['nullable'].lower()
-    inclusion = 'available'
-    result = Schema(inclusion=inclusion)
 
-    if column_type == 'bool':
-        result.type = 'boolean'
+def discover_changes(conn, db_schemas, previous=None):
+    '''Returns a Catalog describing the structure of the database along
+    with a report of the tables added, altered, dropped and unchanged since
+    the previous catalog.'''
+    report = {}
+    catalog = Catalog(list(discovered_entries(
+        conn, db_schemas, previous, report)))
+    return catalog, report
 
-    elif column_type in BYTES_FOR_INTEGER_TYPE:
-        result.type = 'integer'
-        bits = BYTES_FOR_INTEGER_TYPE[column_type] * 8
-        result.minimum = 0 - 2 ** (bits - 1)
-        result.maximum = 2 ** (bits - 1) - 1
 
-    elif column_type in FLOAT_TYPES:
-        result.type = 'number'
+def discover_catalog(conn, db_schemas, previous=None):
+    '''Returns a Catalog describing the structure of the database.'''
+    catalog, report = discover_changes(conn, db_schemas, previous)
+    if previous is not None:
+        log_changes(report)
+    return catalog
+
+
+def log_changes(report):
+    LOGGER.info('Discovery found {} added, {} altered, {} dropped and {} '
+                'unchanged tables'.format(
+                    *(len(report[change]) for change in
+                      ('added', 'altered', 'dropped', 'unchanged'))))
+    for change in ('added', 'altered', 'dropped'):
+        for tap_stream_id in report[change]:
+            LOGGER.info('{} {}'.format(change.capitalize(), tap_stream_id))
+
+
+def get_discovered_catalog(conn, db_schemas, previous=None):
+    '''Returns the discovered catalog, reusing the one cached under
+    `discovery_cache_dir` while the schemas' structure is unchanged.
+
+    When it has changed, only the tables that differ from the cached
+    catalog are discovered again. The cache only holds what discovery
+    writes; a previous catalog is brought onto it afterwards.'''
+    db_schemas = config_list(db_schemas)
+    cache_dir = CONFIG.get('discovery_cache_dir')
+    if not cache_dir:
+        return discover_catalog(conn, db_schemas, previous)
+
+    db_name = conn.get_dsn_parameters()['dbname']
+    discovery_cache = cache.DiscoveryCache(
+        cache_dir, db_name, db_schemas, __version__)
+    fingerprint = discovery_cache.fingerprint(conn)
+    cached_fingerprint, catalog = discovery_cache.read()
+    if catalog is not None and cached_fingerprint == fingerprint:
+        LOGGER.info('Using cached catalog for schemas {}'.format(
+            ', '.join(db_schemas)))
+        for entry in catalog.streams:
+            renamed(entry)
+    else:
+        catalog = discover_catalog(conn, db_schemas, catalog)
+        discovery_cache.save(fingerprint, catalog)
+
+    if previous is not None:
+        catalog = refresh_previous(catalog, db_name, db_schemas, previous)
+    return catalog
+
+
+def configured_databases(conn):
+    return config_list(
+        CONFIG.get('dbname', conn.get_dsn_parameters()['dbname']))
+
+
+def entry_database(catalog_entry, mdata=None):
+    if mdata is None:
+        mdata = metadata.to_map(catalog_entry.metadata)
+    return (metadata.get(mdata, (), 'database-name') or
+            catalog_entry.tap_stream_id.split('.')[0])
+
+
+def connection_pool(conn):
+    '''Returns a pool of connections to the configured databases, starting
+    with the one given.'''
+    return ConnectionPool(lambda dbname: open_connection(CONFIG, dbname),
+                          [conn])
+
+
+def discover_databases(pool, databases, db_schemas, previous=None):
+    '''Returns one Catalog covering the schemas of every database, each
+    database discovered over its own connection and all of them at
+    once.'''
+    def discover(pool, dbname):
+        conn = pool.acquire(dbname)
+        try:
+            yield get_discovered_catalog(conn, db_schemas, previous)
+        finally:
+            pool.release(conn)
+
+    catalogs = {}
+    for dbname, catalog in parallel.run_tasks(
+            [pool] * len(databases), databases, discover):
+        if catalog is not parallel.TASK_DONE:
+            catalogs[dbname] = catalog
+    return Catalog([entry for dbname in databases
+                    for entry in catalogs[dbname].streams])
+
+
+def plan_streams(pool, index, db_schemas):
+    '''Plans the extraction of the indexed catalog's streams, one database
+    at a time.'''
+    databases = {}
+    for catalog_entry in index.streams:
+        databases.setdefault(
+            entry_database(catalog_entry, index.metadata(catalog_entry)),
+            []).append(catalog_entry)
+
+    for dbname, entries in databases.items():
+        conn = pool.acquire(dbname)
+        try:
+            stats = planner.table_stats(conn, db_schemas)
+        finally:
+            pool.release(conn)
+        for catalog_entry in entries:
+            planner.plan_entry(catalog_entry, stats, CONFIG,
+                               index.metadata(catalog_entry))
+
+
+def discover_database(pool, dbname, db_schemas, previous=None):
+    '''Yields the planned catalog entries of a database's schemas as they
+    are discovered.'''
+    conn = pool.acquire(dbname)
+    try:
+        stats = {}
+        if CONFIG.get('plan_extraction', True):
+            stats = planner.table_stats(conn, db_schemas)
+
+        report = {}
+        if CONFIG.get('discovery_cache_dir'):
+            # The cache is written from the complete catalog
+            entries = get_discovered_catalog(
+                conn, db_schemas, previous).streams
+        else:
+            entries = discovered_entries(conn, db_schemas, previous, report)
+        for entry in entries:
+            yield planner.plan_entry(entry, stats, CONFIG)
+        if report and previous is not None:
+            log_changes(report)
+    finally:
+        pool.release(conn)
 
-    elif column_type == 'numeric':
-        result.type = 'number'
 
-    elif column_type in STRING_TYPES:
-        result.type = 'string'
+def do_discover(conn, db_schema, previous=None):
+    LOGGER.info("Running discover")
+    db_schemas = config_list(db_schema)
+    databases = configured_databases(conn)
+    pool = connection_pool(conn)
+
+    def discover(pool, dbname):
+        return discover_database(pool, dbname, db_schemas, previous)
+
+    try:
+        with CatalogWriter() as writer:
+            for _, entry in parallel.run_tasks(
+                    [pool] * len(databases), databases, discover):
+                if entry is not parallel.TASK_DONE:
+                    writer.write_entry(entry)
+    finally:
+        pool.close()
+    LOGGER.info("Completed discover")
 
-    elif column_type in DATETIME_TYPES:
-        result.type = 'string'
-        result.format = 'date-time'
 
-    elif column_type in DATE_TYPES:
-        result.type = 'string'
-        result.format = 'date'
+def schema_for_column(c):
+    '''Returns the Schema object for the given Column.'''
+    column_type = c['type'].lower()
+    column_nullable = c['nullable'].lower()
+    properties = TYPE_SCHEMAS.get(column_type)
 
+    if properties is not None:
+        result = Schema(inclusion='available', **properties)
     else:
         result = Schema(None,
                         inclusion='unsupported',
@@ -198,55 +544,60 @@ def schema_for_column(c):
     return result
 
 
-def create_column_metadata(
-        db_name, cols, is_view,
-        table_name, key_properties=[]):
-    mdata = metadata.new()
-    mdata = metadata.write(mdata, (), 'selected-by-default', False)
+def classify_column(c):
+    '''Returns the ColumnRecord for the given Column, from which both its
+    Schema and its metadata are derived.'''
+    sql_datatype = c['type'].lower()
+    return ColumnRecord(name=c['name'],
+                        sql_datatype=sql_datatype,
+                        schema=schema_for_column(c),
+                        replication_key=sql_datatype in REPLICATION_KEY_TYPES)
+
+
+def build_metadata(db_name, records, is_view, table_name,
+                   key_properties=[], signature=None):
+    '''Returns the metadata list of a table from its ColumnRecords.'''
+    stream_md = {'selected-by-default': False}
+    if signature is not None:
+        stream_md['column-signature'] = signature
     if not is_view:
-        mdata = metadata.write(
-            mdata, (), 'table-key-properties', key_properties)
+        stream_md['table-key-properties'] = key_properties
     else:
-        mdata = metadata.write(
-            mdata, (), 'view-key-properties', key_properties)
-    mdata = metadata.write(mdata, (), 'is-view', is_view)
-    mdata = metadata.write(mdata, (), 'schema-name', table_name)
-    mdata = metadata.write(mdata, (), 'database-name', db_name)
-    valid_rep_keys = []
-
-    for c in cols:
-        if c['type'] in DATETIME_TYPES:
-            valid_rep_keys.append(c['name'])
-
-        schema = schema_for_column(c)
-
-        mdata = metadata.write(mdata,
-                               ('properties', c['name']),
-                               'selected-by-default',
-                               schema.inclusion != 'unsupported')
-        mdata = metadata.write(mdata,
-                               ('properties', c['name']),
-                               'sql-datatype',
-                               c['type'].lower())
-        mdata = metadata.write(mdata,
-                               ('properties', c['name']),
-                               'inclusion',
-                               schema.inclusion)
+        stream_md['view-key-properties'] = key_properties
+    stream_md['is-view'] = is_view
+    stream_md['schema-name'] = table_name
+    stream_md['database-name'] = db_name
+
+    valid_rep_keys = [r.name for r in records if r.replication_key]
     if valid_rep_keys:
-        mdata = metadata.write(mdata, (), 'valid-replication-keys',
-                               valid_rep_keys)
+        stream_md['valid-replication-keys'] = valid_rep_keys
     else:
-        mdata = metadata.write(mdata, (), 'forced-replication-method', {
+        stream_md['forced-replication-method'] = {
             'replication-method': 'FULL_TABLE',
-            'reason': 'No replication keys found from table'})
+            'reason': 'No replication keys found from table'}
+
+    mdata = [{'breadcrumb': (), 'metadata': stream_md}]
+    for r in records:
+        inclusion = r.schema.inclusion
+        mdata.append({'breadcrumb': ('properties', r.name),
+                      'metadata': {
+                          'selected-by-default': inclusion != 'unsupported',
+                          'sql-datatype': r.sql_datatype,
+                          'inclusion': inclusion}})
+    return mdata
+
 
-    return metadata.to_list(mdata)
+def create_column_metadata(
+        db_name, cols, is_view,
+        table_name, key_properties=[], signature=None):
+    return build_metadata(db_name, [classify_column(c) for c in cols],
+                          is_view, table_name, key_properties, signature)
 
 
-def open_connection(config):
+def open_connection(config, dbname=None):
     host = config['host'],
     port = config['port'],
-    dbname = config['dbname'],
+    dbname = dbname or config_list(config['dbname'])[0],
     user = config['user'],
     password = config['password']
 
@@ -255,39 +606,351 @@ def open_connection(config):
         port=port[0],
         dbname=dbname[0],
         user=user[0],
-        password=password)
-    LOGGER.info('Connected to Redshift')
+        password=password,
+        connection_factory=TypecastConnection)
+    LOGGER.info('Connected to Redshift database {}'.format(dbname[0]))
     return connection
 
 
-def select_all(conn, query):
+def select_all(conn, query, params=None):
     cur = conn.cursor()
-    cur.execute(query)
+    cur.execute(query, params)
     column_specs = cur.fetchall()
     cur.close()
     return column_specs
 
 
+def fetch_size(catalog_md):
+    '''Returns the number of rows fetched and emitted as one batch.'''
+    return int(catalog_md.get((), {}).get('itersize') or
+               CONFIG.get('itersize', DEFAULT_ITERSIZE))
+
+
+def open_cursor(connection, catalog_md):
+    '''Returns a cursor to stream a table's rows through.
+
+    When `server-side-cursor` is set in the stream's metadata, or
+    `server_side_cursor` in the config, a named cursor is used, so Redshift
+    hands rows over `itersize` at a time instead of the whole result set
+    being transferred into memory on execute.'''
+    if catalog_md.get((), {}).get('server-side-cursor',
+                                  CONFIG.get('server_side_cursor')):
+        cursor = connection.cursor(name='tap_redshift_sync')
+    else:
+        cursor = connection.cursor()
+    cursor.itersize = fetch_size(catalog_md)
+    return cursor
+
+
 def get_stream_version(tap_stream_id, state):
     return singer.get_bookmark(state,
                                tap_stream_id,
                                "version") or int(time.time() * 1000)
 
 
-def row_to_record(catalog_entry, version, row, columns, time_extracted):
-    row_to_persist = ()
-    for idx, elem in enumerate(row):
-        if isinstance(elem, datetime.date):
-            elem = elem.isoformat('T') + 'Z'
-        row_to_persist += (elem,)
-    return singer.RecordMessage(
-        stream=catalog_entry.stream,
-        record=dict(zip(columns, row_to_persist)),
-        version=version,
-        time_extracted=time_extracted)
+def select_sql(columns, table_sql):
+    return 'SELECT {} FROM {}'.format(
+        ','.join('"{}"'.format(c) for c in columns), table_sql)
+
+
+def query_batches(connection, catalog_entry, catalog_md, columns, query,
+                  params, stream_version, time_extracted):
+    '''Runs a query and yields its rows as RecordBatches.'''
+    with open_cursor(connection, catalog_md) as cursor:
+        LOGGER.info('Running {}'.format(cursor.mogrify(query, params)))
+        cursor.execute(query, params)
+        for batch in record_batches(
+                cursor, catalog_entry, columns, stream_version,
+                time_extracted,
+                getattr(connection, 'native_typecasters', False)):
+            yield batch
+
+
+def record_batches(cursor, catalog_entry, columns, stream_version,
+                   time_extracted, native_typecasters=False):
+    '''Yields the rows of an executed cursor as RecordBatches of
+    `cursor.itersize` records.'''
+    convert_row = build_row_converter(catalog_entry, columns,
+                                      native_typecasters)
+
+    with metrics.record_counter(None) as counter:
+        counter.tags['database'] = catalog_entry.database
+        counter.tags['table'] = catalog_entry.table
+        rows = cursor.fetchmany(cursor.itersize)
+        while rows:
+            counter.increment(len(rows))
+            yield RecordBatch(stream=catalog_entry.stream,
+                              records=list(map(convert_row, rows)),
+                              version=stream_version,
+                              time_extracted=time_extracted)
+            rows = cursor.fetchmany(cursor.itersize)
+
+
+def sync_partitions(connection, catalog_entry, state, columns, table_sql,
+                    where, params, column, partition_count, stream_version,
+                    time_extracted):
+    '''Syncs a table as ranges of `column` read concurrently, each over its
+    own connection.
+
+    The ranges and which of them are done are kept in the stream's
+    bookmark, so a run that is interrupted only re-reads the ranges it had
+    not finished.'''
+    tap_stream_id = catalog_entry.tap_stream_id
+    catalog_md = metadata.to_map(catalog_entry.metadata)
+    column_schema = catalog_entry.schema.properties[column]
+    partitions = singer.get_bookmark(state, tap_stream_id, 'partitions')
+
+    if partitions is None or singer.get_bookmark(
+            state, tap_stream_id, 'partition_key') != column:
+        with connection.cursor() as cursor:
+            lower, upper = partition.probe_bounds(
+                cursor, table_sql, column, where, params)
+        partitions = partition.plan_partitions(lower, upper, partition_count)
+        state = singer.write_bookmark(
+            state, tap_stream_id, 'partition_key', column)
+        state = singer.write_bookmark(
+            state, tap_stream_id, 'partition_max', partition.to_bound(upper))
+        state = singer.write_bookmark(
+            state, tap_stream_id, 'partitions', partitions)
+        yield singer.StateMessage(
+            value=checkpoint.snapshot(state, tap_stream_id))
+
+    pending = [p for p in partitions if not p['done']]
+    LOGGER.info('Syncing {} of {} partitions of {} over {}'.format(
+        len(pending), len(partitions), tap_stream_id, column))
+
+    def sync_partition(conn, part):
+        clause, part_params = partition.partition_filter(
+            part, column, column_schema)
+        query = '{}{} {}'.format(select_sql(columns, table_sql),
+                                 where + ' AND' if where else ' WHERE',
+                                 clause)
+        return query_batches(conn, catalog_entry, catalog_md, columns,
+                             query, dict(params, **part_params),
+                             stream_version, time_extracted)
+
+    dbname = connection.get_dsn_parameters()['dbname']
+    connections = [connection] + [
+        open_connection(CONFIG, dbname)
+        for _ in range(min(partition_count, len(pending)) - 1)]
+    try:
+        for part, message in parallel.run_tasks(
+                connections, pending, sync_partition):
+            if message is parallel.TASK_DONE:
+                part['done'] = True
+                yield singer.StateMessage(
+                    value=checkpoint.snapshot(state, tap_stream_id))
+            else:
+                yield message
+    finally:
+        for conn in connections[1:]:
+            conn.close()
+
+    bookmark = state['bookmarks'][tap_stream_id]
+    partition_max = bookmark.pop('partition_max', None)
+    if bookmark.get('replication_key') and partition_max is not None:
+        bookmark['replication_key_value'] = partition_max
+    bookmark.pop('partition_key', None)
+    bookmark.pop('partitions', None)
+    bookmark.pop('replication_key_pk', None)
+
+
+def usable_key_columns(catalog_md, columns, tap_stream_id):
+    '''Returns the stream's primary key columns, or None when it has none
+    or they are not all selected.'''
+    key_columns = keyset.key_columns(catalog_md)
+    if not key_columns or not set(key_columns) <= set(columns):
+        LOGGER.warning('{} needs its primary key selected to be synced in '
+                       'key order, syncing it without'.format(tap_stream_id))
+        return None
+    return key_columns
+
+
+def sync_keyset(connection, catalog_entry, catalog_md, state, columns,
+                table_sql, key_columns, stream_version, time_extracted):
+    '''Syncs a whole table in primary key order, `keyset-chunk-size` rows
+    per query.
+
+    The key of the last row fetched is bookmarked as `last_pk_fetched`
+    after every query, so an interrupted sync resumes after it instead of
+    starting over.'''
+    tap_stream_id = catalog_entry.tap_stream_id
+    chunk_size = int(catalog_md.get((), {}).get('keyset-chunk-size') or
+                     CONFIG.get('keyset_chunk_size',
+                                keyset.DEFAULT_CHUNK_SIZE))
+    last_pk = singer.get_bookmark(state, tap_stream_id, 'last_pk_fetched')
+
+    while True:
+        where, params = '', {}
+        if last_pk is not None:
+            clause, params = keyset.keyset_filter(key_columns, last_pk)
+            where = ' WHERE {}'.format(clause)
+        query = '{}{} ORDER BY {} LIMIT {}'.format(
+            select_sql(columns, table_sql), where,
+            keyset.order_by(key_columns), chunk_size)
+
+        fetched = 0
+        for batch in query_batches(
+                connection, catalog_entry, catalog_md, columns, query,
+                params, stream_version, time_extracted):
+            fetched += len(batch)
+            last_pk = keyset.last_key(batch, key_columns)
+            yield batch
+
+        if fetched:
+            state = singer.write_bookmark(
+                state, tap_stream_id, 'last_pk_fetched', last_pk)
+            yield singer.StateMessage(
+                value=checkpoint.snapshot(state, tap_stream_id))
+        if fetched < chunk_size:
+            break
+
+    state['bookmarks'][tap_stream_id].pop('last_pk_fetched', None)
+
 
+def sync_windows(connection, catalog_entry, catalog_md, state, columns,
+                 table_sql, where, params, replication_key, stream_version,
+                 time_extracted, ordered=True):
+    '''Syncs new rows one window of the replication key at a time, so each
+    query only sorts the rows of its window, or none at all unless ordered.
 
-def sync_table(connection, catalog_entry, state):
+    The end of every window read is bookmarked as the replication key value,
+    so an interrupted sync resumes at the first window it had not
+    finished.'''
+    tap_stream_id = catalog_entry.tap_stream_id
+    size = window.window_size(catalog_md, CONFIG)
+    order_by = ' ORDER BY "{}" ASC'.format(replication_key) if ordered else ''
+    column_schema = catalog_entry.schema.properties[replication_key]
+
+    with connection.cursor() as cursor:
+        lower, upper = (window.parse_bound(bound, column_schema)
+                        for bound in partition.probe_bounds(
+                            cursor, table_sql, replication_key, where,
+                            params))
+    where = where + ' AND' if where else ' WHERE'
+
+    while lower is not None:
+        end = window.advance(lower, size)
+        clause, window_params = window.window_filter(
+            replication_key, lower, end, upper)
+        query = '{}{} {}{}'.format(
+            select_sql(columns, table_sql), where, clause, order_by)
+
+        for batch in query_batches(
+                connection, catalog_entry, catalog_md, columns, query,
+                dict(params, **window_params), stream_version,
+                time_extracted):
+            yield batch
+
+        state = singer.write_bookmark(
+            state, tap_stream_id, 'replication_key_value',
+            partition.to_bound(min(end, upper)))
+        yield singer.StateMessage(
+            value=checkpoint.snapshot(state, tap_stream_id))
+        if end > upper:
+            break
+
+        # Start the next window at the next row rather than at the end of
+        # this one, so gaps in the replication key cost no empty queries.
+        with connection.cursor() as cursor:
+            lower, _ = partition.probe_bounds(
+                cursor, table_sql, replication_key,
+                '{} "{}" >= %(window_lower)s'.format(where, replication_key),
+                dict(params, window_lower=end))
+        lower = window.parse_bound(lower, column_schema)
+
+
+def sync_delta(connection, catalog_entry, catalog_md, state, columns,
+               table_sql, key_columns, time_extracted):
+    '''Syncs only the rows of a table inserted or changed since its last
+    delta sync that the target received.
+
+    Redshift hashes every row as it is read, and the hashes are compared
+    with those kept on disk by primary key. The keys of rows deleted since
+    are written to a report next to the hashes rather than emitted. The
+    sync's number is bookmarked as `delta_run`, so the next sync can tell
+    whether these hashes were delivered.'''
+    tap_stream_id = catalog_entry.tap_stream_id
+    query = 'SELECT {},{} FROM {}'.format(
+        ','.join('"{}"'.format(c) for c in columns),
+        rowhash.row_hash_sql(columns, catalog_md), table_sql)
+    convert_row = build_row_converter(
+        catalog_entry, columns,
+        getattr(connection, 'native_typecasters', False))
+
+    with delta.HashStore(CONFIG['delta_store_dir'], tap_stream_id,
+                         singer.get_bookmark(state, tap_stream_id,
+                                             'delta_run')) as store:
+        with open_cursor(connection, catalog_md) as cursor, \
+                metrics.record_counter(None) as counter:
+            counter.tags['database'] = catalog_entry.database
+            counter.tags['table'] = catalog_entry.table
+            LOGGER.info('Running {}'.format(query))
+            cursor.execute(query)
+            rows = cursor.fetchmany(cursor.itersize)
+            while rows:
+                records = list(map(convert_row, rows))
+                changed = store.changed(
+                    [delta.row_key(r, key_columns) for r in records],
+                    [row[-1] for row in rows])
+                if changed:
+                    counter.increment(len(changed))
+                    yield RecordBatch(stream=catalog_entry.stream,
+                                      records=[records[i] for i in changed],
+                                      time_extracted=time_extracted)
+                rows = cursor.fetchmany(cursor.itersize)
+
+        deleted = store.commit(key_columns, time_extracted)
+        state = singer.write_bookmark(state, tap_stream_id, 'delta_run',
+                                      store.run)
+    LOGGER.info('{} rows of {} were deleted since its last sync, listed in '
+                '{}'.format(len(deleted), tap_stream_id,
+                            store.tombstones_path))
+
+
+def sync_unload(connection, catalog_entry, state, columns, table_sql, where,
+                params, replication_key, stream_version, time_extracted):
+    '''Syncs a table by UNLOADing it to S3 and reading back the part files
+    instead of pulling rows through the leader node.'''
+    unload.check_config(CONFIG)
+    if replication_key is not None:
+        # Part files come back in no particular order, so the bookmark is
+        # the maximum probed up front rather than the last record's value.
+        with connection.cursor() as cursor:
+            _, upper = partition.probe_bounds(
+                cursor, table_sql, replication_key, where, params)
+        if upper is None:
+            LOGGER.info('No new rows to unload for {}'.format(
+                catalog_entry.tap_stream_id))
+            return
+        where = '{} "{}" <= %(replication_key_max)s'.format(
+            where + ' AND' if where else ' WHERE', replication_key)
+        params = dict(params, replication_key_max=upper)
+
+    with connection.cursor() as cursor:
+        query = cursor.mogrify(select_sql(columns, table_sql) + where, params)
+    if isinstance(query, bytes):
+        query = query.decode('utf-8')
+
+    with metrics.record_counter(None) as counter:
+        counter.tags['database'] = catalog_entry.database
+        counter.tags['table'] = catalog_entry.table
+        for batch in unload.extract(
+                connection, query, catalog_entry, columns, stream_version,
+                time_extracted, CONFIG,
+                fetch_size(metadata.to_map(catalog_entry.metadata))):
+            counter.increment(len(batch))
+            yield batch
+
+    if replication_key is not None:
+        state = singer.write_bookmark(
+            state, catalog_entry.tap_stream_id, 'replication_key_value',
+            partition.to_bound(upper))
+        state['bookmarks'][catalog_entry.tap_stream_id].pop(
+            'replication_key_pk', None)
+
+
+def sync_table(connection, catalog_entry, state, catalog_md=None):
     columns = list(catalog_entry.schema.properties.keys())
     start_date = CONFIG.get('start_date')
     formatted_start_date = None
@@ -300,133 +963,291 @@ def sync_table(connection, catalog_entry, state):
 
     tap_stream_id = catalog_entry.tap_stream_id
     LOGGER.info('Beginning sync for {} table'.format(tap_stream_id))
-    with connection.cursor() as cursor:
-        schema, table = catalog_entry.table.split('.')
-        select = 'SELECT {} FROM {}.{}'.format(
-            ','.join('"{}"'.format(c) for c in columns),
-            '"{}"'.format(schema),
-            '"{}"'.format(table))
-        params = {}
-
-        if start_date is not None:
-            formatted_start_date = datetime.datetime.strptime(
-                start_date, '%Y-%m-%dT%H:%M:%SZ').astimezone()
-
-        replication_key = metadata.to_map(catalog_entry.metadata).get(
-            (), {}).get('replication-key')
-        replication_key_value = None
-        bookmark_is_empty = state.get('bookmarks', {}).get(
-            tap_stream_id) is None
-        stream_version = get_stream_version(tap_stream_id, state)
-        state = singer.write_bookmark(
+    schema, table = catalog_entry.table.split('.')
+    table_sql = '"{}"."{}"'.format(schema, table)
+    select = select_sql(columns, table_sql)
+    where = ''
+    order_by = ''
+    params = {}
+
+    if start_date is not None:
+        formatted_start_date = datetime.datetime.strptime(
+            start_date, '%Y-%m-%dT%H:%M:%SZ').astimezone()
+
+    if catalog_md is None:
+        catalog_md = metadata.to_map(catalog_entry.metadata)
+    replication_key = catalog_md.get((), {}).get('replication-key')
+    replication_key_value = None
+
+    # A full table whose signature matches the one bookmarked when it was
+    # last synced in full is skipped, rather than read and emitted again.
+    signature = None
+    if replication_key is None and catalog_md.get((), {}).get(
+            'skip-unchanged', CONFIG.get('skip_unchanged', False)):
+        with connection.cursor() as cursor:
+            signature = rowhash.table_signature(cursor, columns, catalog_md,
+                                                table_sql)
+        if signature == singer.get_bookmark(state, tap_stream_id,
+                                            'table_signature'):
+            LOGGER.info('{} is unchanged since it was last synced, skipping '
+                        'it'.format(tap_stream_id))
+            return
+
+    # In delta mode only the rows inserted or changed since the last sync
+    # are emitted, so there is no complete version of the table to
+    # activate.
+    delta_keys = None
+    if replication_key is None and catalog_md.get((), {}).get(
+            'full-table-mode', CONFIG.get('full_table_mode')) == 'DELTA':
+        if CONFIG.get('delta_store_dir'):
+            delta_keys = usable_key_columns(catalog_md, columns,
+                                            tap_stream_id)
+        else:
+            LOGGER.warning('delta_store_dir is needed to sync {} as a delta, '
+                           'syncing it in full'.format(tap_stream_id))
+
+    bookmark_is_empty = state.get('bookmarks', {}).get(
+        tap_stream_id) is None
+    stream_version = get_stream_version(tap_stream_id, state)
+    state = singer.write_bookmark(
+        state,
+        tap_stream_id,
+        'version',
+        stream_version
+    )
+    activate_version_message = singer.ActivateVersionMessage(
+        stream=catalog_entry.stream,
+        version=stream_version
+    )
+
+    # If there's a replication key, we want to emit an ACTIVATE_VERSION
+    # message at the beginning so the records show up right away. If
+    # there's no bookmark at all for this stream, assume it's the very
+    # first replication. That is, clients have never seen rows for this
+    # stream before, so they can immediately acknowledge the present
+    # version.
+    if (replication_key or bookmark_is_empty) and delta_keys is None:
+        yield activate_version_message
+
+    if replication_key:
+        replication_key_value = singer.get_bookmark(
             state,
             tap_stream_id,
-            'version',
-            stream_version
-        )
-        activate_version_message = singer.ActivateVersionMessage(
-            stream=catalog_entry.stream,
-            version=stream_version
+            'replication_key_value'
         )
+        # start_date only bounds date and time keys; a first sync over an
+        # integer key reads every row.
+        key_format = catalog_entry.schema.properties[replication_key].format
+        if (replication_key_value is None and formatted_start_date and
+                key_format in ('date-time', 'date')):
+            replication_key_value = formatted_start_date.isoformat()
+            if key_format == 'date':
+                replication_key_value = replication_key_value[:10]
+
+    incremental_mode = replication_key and catalog_md.get((), {}).get(
+        'incremental-mode', CONFIG.get('incremental_mode'))
+
+    # In keyset mode, rows are ordered by the replication key then the
+    # primary key, and a run starts straight after the last row synced
+    # instead of at every row sharing its replication key value.
+    key_columns = None
+    if incremental_mode == 'KEYSET':
+        key_columns = usable_key_columns(catalog_md, columns, tap_stream_id)
+        if key_columns is not None:
+            key_columns = [replication_key] + [
+                column for column in key_columns
+                if column != replication_key]
+
+    if replication_key_value is not None:
+        entry_schema = catalog_entry.schema
+
+        if entry_schema.properties[replication_key].format == 'date-time':
+            replication_key_value = pendulum.parse(replication_key_value)
+
+        last_pk = singer.get_bookmark(state, tap_stream_id,
+                                      'replication_key_pk')
+        if key_columns is not None and last_pk is not None:
+            clause, keyset_params = keyset.keyset_filter(
+                key_columns, dict(last_pk, **{
+                    replication_key: replication_key_value}))
+            # The leading range lets Redshift skip blocks by their zone maps,
+            # which it cannot do from the OR of the keyset condition.
+            where = ' WHERE "{}" >= %(keyset_0)s AND {}'.format(
+                replication_key, clause)
+            params.update(keyset_params)
+        else:
+            where = ' WHERE {} >= %(replication_key_value)s'.format(
+                replication_key)
+            params['replication_key_value'] = replication_key_value
 
-        # If there's a replication key, we want to emit an ACTIVATE_VERSION
-        # message at the beginning so the records show up right away. If
-        # there's no bookmark at all for this stream, assume it's the very
-        # first replication. That is, clients have never seen rows for this
-        # stream before, so they can immediately acknowledge the present
-        # version.
-        if replication_key or bookmark_is_empty:
-            yield activate_version_message
+    # Unordered, rows are read without a leader node sort and only the
+    # largest replication key value read is bookmarked, once all are read.
+    unordered = incremental_mode == 'UNORDERED'
+    if key_columns is not None:
+        order_by = ' ORDER BY {}'.format(keyset.order_by(key_columns))
+    elif replication_key is not None and not unordered:
+        order_by = ' ORDER BY {} ASC'.format(replication_key)
+
+    time_extracted = utils.now()
+    partition_count = int(catalog_md.get((), {}).get('partition-count') or 1)
+    partition_key = None
+    if partition_count > 1:
+        partition_key = partition.partition_column(
+            catalog_md, catalog_entry.schema)
+        if partition_key is None:
+            LOGGER.warning('No column to partition {} over, syncing it '
+                           'with a single query'.format(tap_stream_id))
+
+    if replication_key is None and catalog_md.get((), {}).get(
+            'full-table-mode', CONFIG.get('full_table_mode')) == 'KEYSET':
+        key_columns = usable_key_columns(catalog_md, columns, tap_stream_id)
+
+    if delta_keys is not None:
+        for message in sync_delta(
+                connection, catalog_entry, catalog_md, state, columns,
+                table_sql, delta_keys, time_extracted):
+            yield message
+    elif catalog_md.get((), {}).get('extraction-method') == 'UNLOAD':
+        for message in sync_unload(
+                connection, catalog_entry, state, columns, table_sql, where,
+                params, replication_key, stream_version, time_extracted):
+            yield message
+    elif partition_key is not None:
+        for message in sync_partitions(
+                connection, catalog_entry, state, columns, table_sql,
+                where, params, partition_key, partition_count, stream_version,
+                time_extracted):
+            yield message
+    elif incremental_mode == 'WINDOWED' or unordered and (
+            window.window_size(catalog_md, CONFIG, None) is not None):
+        for message in sync_windows(
+                connection, catalog_entry, catalog_md, state, columns,
+                table_sql, where, params, replication_key, stream_version,
+                time_extracted, ordered=not unordered):
+            yield message
+    elif key_columns is not None and replication_key is None:
+        for message in sync_keyset(
+                connection, catalog_entry, catalog_md, state, columns,
+                table_sql, key_columns, stream_version, time_extracted):
+            yield message
+    elif unordered:
+        max_value = None
+        for batch in query_batches(
+                connection, catalog_entry, catalog_md, columns,
+                select + where, params, stream_version, time_extracted):
+            max_value = window.batch_max(batch, replication_key, max_value)
+            yield batch
+
+        if max_value is not None:
+            state = singer.write_bookmark(
+                state, tap_stream_id, 'replication_key_value', max_value)
+    else:
+        checkpoints = checkpoint.Checkpointer.from_config(
+            state, tap_stream_id, CONFIG)
+        for batch in query_batches(
+                connection, catalog_entry, catalog_md, columns,
+                select + where + order_by, params, stream_version,
+                time_extracted):
+            yield batch
+
+            bookmark = {}
+            if replication_key is not None:
+                bookmark['replication_key_value'] = batch.records[-1][
+                    replication_key]
+            if key_columns is not None:
+                bookmark['replication_key_pk'] = keyset.last_key(
+                    batch, key_columns[1:])
+            message = checkpoints.record(batch, **bookmark)
+            if message is not None:
+                yield message
+        state = checkpoints.flush()
 
-        if replication_key:
-            replication_key_value = singer.get_bookmark(
-                state,
-                tap_stream_id,
-                'replication_key_value'
-            ) or formatted_start_date.isoformat()
+    if not replication_key:
+        if delta_keys is None:
+            yield activate_version_message
+        state = singer.write_bookmark(state, catalog_entry.tap_stream_id,
+                                      'version', None)
+        if signature is not None:
+            state = singer.write_bookmark(state, tap_stream_id,
+                                          'table_signature', signature)
 
-        if replication_key_value is not None:
-            entry_schema = catalog_entry.schema
+    yield singer.StateMessage(value=checkpoint.snapshot(state, tap_stream_id))
 
-            if entry_schema.properties[replication_key].format == 'date-time':
-                replication_key_value = pendulum.parse(replication_key_value)
 
-            select += ' WHERE {} >= %(replication_key_value)s ORDER BY {} ' \
-                      'ASC'.format(replication_key, replication_key)
-            params['replication_key_value'] = replication_key_value
+def sync_stream(conn, catalog_entry, state, catalog_md=None):
+    if catalog_md is None:
+        catalog_md = metadata.to_map(catalog_entry.metadata)
 
-        elif replication_key is not None:
-            select += ' ORDER BY {} ASC'.format(replication_key)
+    if catalog_md.get((), {}).get('is-view'):
+        key_properties = catalog_md.get((), {}).get('view-key-properties')
+    else:
+        key_properties = catalog_md.get((), {}).get('table-key-properties')
+    bookmark_properties = catalog_md.get((), {}).get('replication-key')
 
-        time_extracted = utils.now()
-        query_string = cursor.mogrify(select, params)
-        LOGGER.info('Running {}'.format(query_string))
-        cursor.execute(select, params)
-        row = cursor.fetchone()
-        rows_saved = 0
+    # Emit a state message to indicate that we've started this stream
+    yield singer.StateMessage(value=checkpoint.snapshot(
+        state, catalog_entry.tap_stream_id))
 
-        with metrics.record_counter(None) as counter:
-            counter.tags['database'] = catalog_entry.database
-            counter.tags['table'] = catalog_entry.table
-            while row:
-                counter.increment()
-                rows_saved += 1
-                record_message = row_to_record(catalog_entry,
-                                               stream_version,
-                                               row,
-                                               columns,
-                                               time_extracted)
-                yield record_message
-
-                if replication_key is not None:
-                    state = singer.write_bookmark(state,
-                                                  tap_stream_id,
-                                                  'replication_key_value',
-                                                  record_message.record[
-                                                      replication_key])
-                if rows_saved % 1000 == 0:
-                    yield singer.StateMessage(value=copy.deepcopy(state))
-                row = cursor.fetchone()
-
-        if not replication_key:
-            yield activate_version_message
-            state = singer.write_bookmark(state, catalog_entry.tap_stream_id,
-                                          'version', None)
+    # Emit a SCHEMA message before we sync any records
+    yield singer.SchemaMessage(
+        stream=catalog_entry.stream,
+        schema=catalog_entry.schema.to_dict(),
+        key_properties=key_properties,
+        bookmark_properties=bookmark_properties)
 
-        yield singer.StateMessage(value=copy.deepcopy(state))
+    # Emit a RECORD message for each record in the result set
+    with metrics.job_timer('sync_table') as timer:
+        timer.tags['database'] = catalog_entry.database
+        timer.tags['table'] = catalog_entry.table
+        for message in sync_table(conn, catalog_entry, state, catalog_md):
+            yield message
 
 
-def generate_messages(conn, db_schema, catalog, state):
-    catalog = resolve.resolve_catalog(discover_catalog(conn, db_schema),
-                                      catalog, state)
+def sync_pooled_stream(pool, catalog_entry, state, catalog_md=None):
+    '''sync_stream over a connection to the stream's database borrowed
+    from the pool.'''
+    conn = pool.acquire(entry_database(catalog_entry, catalog_md))
+    try:
+        for message in sync_stream(conn, catalog_entry, state, catalog_md):
+            yield message
+    finally:
+        pool.release(conn)
 
-    for catalog_entry in catalog.streams:
-        state = singer.set_currently_syncing(state,
-                                             catalog_entry.tap_stream_id)
-        catalog_md = metadata.to_map(catalog_entry.metadata)
 
-        if catalog_md.get((), {}).get('is-view'):
-            key_properties = catalog_md.get((), {}).get('view-key-properties')
-        else:
-            key_properties = catalog_md.get((), {}).get('table-key-properties')
-        bookmark_properties = catalog_md.get((), {}).get('replication-key')
-
-        # Emit a state message to indicate that we've started this stream
-        yield singer.StateMessage(value=copy.deepcopy(state))
-
-        # Emit a SCHEMA message before we sync any records
-        yield singer.SchemaMessage(
-            stream=catalog_entry.stream,
-            schema=catalog_entry.schema.to_dict(),
-            key_properties=key_properties,
-            bookmark_properties=bookmark_properties)
-
-        # Emit a RECORD message for each record in the result set
-        with metrics.job_timer('sync_table') as timer:
-            timer.tags['database'] = catalog_entry.database
-            timer.tags['table'] = catalog_entry.table
-            for message in sync_table(conn, catalog_entry, state):
+def generate_messages(conn, db_schema, catalog, state):
+    db_schemas = config_list(db_schema)
+    pool = connection_pool(conn)
+    try:
+        discovered = discover_databases(pool, configured_databases(conn),
+                                        db_schemas)
+        catalog = resolve.resolve_catalog(discovered, catalog, state)
+        index = resolve.CatalogIndex(catalog)
+        if CONFIG.get('plan_extraction', True):
+            plan_streams(pool, index, db_schemas)
+        max_workers = min(int(CONFIG.get('max_workers', 1)),
+                          len(catalog.streams))
+
+        def sync_indexed_stream(pool, catalog_entry, state):
+            return sync_pooled_stream(pool, catalog_entry, state,
+                                      index.metadata(catalog_entry))
+
+        if max_workers > 1:
+            # Streams finish out of order, so there is no single stream to
+            # resume from; bookmarks alone carry progress across runs.
+            state = singer.set_currently_syncing(state, None)
+            for message in parallel.sync_streams(
+                    [pool] * max_workers, catalog.streams, state,
+                    sync_indexed_stream):
                 yield message
+        else:
+            for catalog_entry in catalog.streams:
+                state = singer.set_currently_syncing(
+                    state, catalog_entry.tap_stream_id)
+                for message in sync_indexed_stream(pool, catalog_entry,
+                                                   state):
+                    yield message
+    finally:
+        pool.close()
 
     # If we get here, we've finished processing all the streams, so clear
     # currently_syncing from the state and emit a state message.
@@ -434,20 +1255,18 @@ def generate_messages(conn, db_schema, catalog, state):
     yield singer.StateMessage(value=copy.deepcopy(state))
 
 
-def coerce_datetime(o):
-    if isinstance(o, (datetime.datetime, datetime.date)):
-        return o.isoformat()
-    raise TypeError("Type {} is not serializable".format(type(o)))
-
-
 def do_sync(conn, db_schema, catalog, state):
     LOGGER.info("Starting Redshift sync")
-    for message in generate_messages(conn, db_schema, catalog, state):
-        sys.stdout.write(json.dumps(message.asdict(),
-                         default=coerce_datetime,
-                         use_decimal=True) + '\n')
-        sys.stdout.flush()
-    LOGGER.info("Completed sync")
+    with OutputWriter(
+            buffer_size=int(CONFIG.get('output_buffer_size',
+                                       DEFAULT_BUFFER_SIZE)),
+            flush_interval=float(CONFIG.get('output_flush_interval',
+                                            DEFAULT_FLUSH_INTERVAL)),
+            encoder=get_encoder(CONFIG.get('json_encoder', 'auto'))) as out:
+        for message in generate_messages(conn, db_schema, catalog, state):
+            out.write_message(message)
+    LOGGER.info("Completed sync, wrote {} bytes in {} flushes".format(
+        out.bytes_written, out.flush_count))
 
 
 def build_state(raw_state, catalog):
@@ -486,6 +1305,12 @@ def build_state(raw_state, catalog):
                                               tap_stream_id,
                                               'replication_key_value',
                                               raw_replication_key_value)
+                raw_replication_key_pk = singer.get_bookmark(
+                    raw_state, tap_stream_id, 'replication_key_pk')
+                if raw_replication_key_pk is not None:
+                    state = singer.write_bookmark(
+                        state, tap_stream_id, 'replication_key_pk',
+                        raw_replication_key_pk)
 
             if raw_stream_version is not None:
                 state = singer.write_bookmark(
@@ -497,6 +1322,44 @@ def build_state(raw_state, catalog):
                                           'version',
                                           raw_stream_version)
 
+        # The signature of a full table's last complete sync, which it is
+        # skipped while it matches.
+        raw_signature = singer.get_bookmark(
+            raw_state, tap_stream_id, 'table_signature')
+        if raw_signature is not None and replication_method != 'INCREMENTAL':
+            state = singer.write_bookmark(
+                state, tap_stream_id, 'table_signature', raw_signature)
+
+        # The number of the last delta sync, whose hashes a sync starting
+        # from this state knows were delivered.
+        raw_delta_run = singer.get_bookmark(
+            raw_state, tap_stream_id, 'delta_run')
+        if raw_delta_run is not None and replication_method != 'INCREMENTAL':
+            state = singer.write_bookmark(
+                state, tap_stream_id, 'delta_run', raw_delta_run)
+
+        # A partitioned sync that was interrupted resumes its unfinished
+        # partitions under the version the finished ones were written with.
+        raw_partitions = singer.get_bookmark(
+            raw_state, tap_stream_id, 'partitions')
+        if raw_partitions is not None and (
+                replication_method != 'INCREMENTAL' or
+                raw_replication_key == replication_key):
+            for key in ('version', 'partition_key', 'partition_max',
+                        'partitions'):
+                state = singer.write_bookmark(
+                    state, tap_stream_id, key,
+                    singer.get_bookmark(raw_state, tap_stream_id, key))
+
+        # Likewise a keyset sync resumes after the last key it fetched.
+        raw_last_pk = singer.get_bookmark(
+            raw_state, tap_stream_id, 'last_pk_fetched')
+        if raw_last_pk is not None and replication_method != 'INCREMENTAL':
+            for key in ('version', 'last_pk_fetched'):
+                state = singer.write_bookmark(
+                    state, tap_stream_id, key,
+                    singer.get_bookmark(raw_state, tap_stream_id, key))
+
     return state
 
 
@@ -506,7 +1369,7 @@ def main_impl():
     connection = open_connection(args.config)
     db_schema = args.config.get('schema', 'public')
     if args.discover:
-        do_discover(connection, db_schema)
+        do_discover(connection, db_schema, args.catalog)
     elif args.catalog:
         state = build_state(args.state, args.catalog)
         do_sync(connection, db_schema, args.catalog, state)
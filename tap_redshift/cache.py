@@ -0,0 +1,95 @@
+# tap-redshift
+# Copyright 2018 data.world, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the
+# License.
+#
+# You may obtain a copy of the License at
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied. See the License for the specific language governing
+# permissions and limitations under the License.
+#
+# This product includes software developed at
+# data.world, Inc.(http://data.world/).
+
+import hashlib
+import json
+import os
+
+import singer
+from singer.catalog import Catalog
+
+from tap_redshift.connections import config_list
+
+LOGGER = singer.get_logger()
+
+STRUCTURE_QUERY = """
+    SELECT n.nspname, c.relname, c.relkind, a.attnum, a.attname,
+           a.atttypid, a.atttypmod, a.attnotnull
+    FROM pg_catalog.pg_class c
+    JOIN pg_catalog.pg_namespace n ON n.oid = c.relnamespace
+    JOIN pg_catalog.pg_attribute a ON a.attrelid = c.oid
+    WHERE n.nspname IN %s AND c.relkind IN ('r', 'v') AND
+          a.attnum > 0 AND NOT a.attisdropped
+    ORDER BY n.nspname, c.relname, a.attnum
+    """
+
+PRIMARY_KEYS_QUERY = """
+    SELECT n.nspname, c.relname, con.conkey
+    FROM pg_catalog.pg_constraint con
+    JOIN pg_catalog.pg_class c ON c.oid = con.conrelid
+    JOIN pg_catalog.pg_namespace n ON n.oid = c.relnamespace
+    WHERE n.nspname IN %s AND con.contype = 'p'
+    ORDER BY n.nspname, c.relname
+    """
+
+
+class DiscoveryCache(object):
+    '''On-disk copy of the catalog discovered for a database's schemas.
+
+    The catalog is stored along with a fingerprint of the schemas' tables,
+    columns and primary keys read from pg_catalog, which is far cheaper to
+    compute than running discovery. A cached catalog is only used while
+    the fingerprint still matches.'''
+
+    def __init__(self, directory, dbname, db_schemas, version):
+        self.db_schemas = config_list(db_schemas)
+        self.path = os.path.join(directory, '{}.{}.json'.format(
+            dbname, '+'.join(self.db_schemas)))
+        self.version = version
+
+    def fingerprint(self, conn):
+        digest = hashlib.sha256(self.version.encode('utf-8'))
+        with conn.cursor() as cursor:
+            for query in (STRUCTURE_QUERY, PRIMARY_KEYS_QUERY):
+                cursor.execute(query, (tuple(self.db_schemas),))
+                for row in cursor.fetchall():
+                    digest.update(repr(tuple(row)).encode('utf-8'))
+        return digest.hexdigest()
+
+    def read(self):
+        '''Returns the cached fingerprint and Catalog, or (None, None) when
+        nothing has been cached.'''
+        try:
+            with open(self.path) as cached:
+                contents = json.load(cached)
+        except (IOError, ValueError):
+            return None, None
+        catalog = Catalog.from_dict(contents['catalog'])
+        for entry in catalog.streams:
+            for mdata in entry.metadata:
+                mdata['breadcrumb'] = tuple(mdata['breadcrumb'])
+        return contents['fingerprint'], catalog
+
+    def save(self, fingerprint, catalog):
+        os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+        partial = self.path + '.partial'
+        with open(partial, 'w') as cached:
+            json.dump({'fingerprint': fingerprint,
+                       'catalog': catalog.to_dict()}, cached)
+        os.replace(partial, self.path)
@@ -0,0 +1,119 @@
+# tap-redshift
+# Copyright 2018 data.world, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the
+# License.
+#
+# You may obtain a copy of the License at
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied. See the License for the specific language governing
+# permissions and limitations under the License.
+#
+# This product includes software developed at
+# data.world, Inc.(http://data.world/).
+import copy
+import time
+
+import singer
+
+from tap_redshift.messages import RecordBatch, format_message
+
+# Rows synced between STATE messages unless configured otherwise
+DEFAULT_CHECKPOINT_ROWS = 1000
+
+
+def snapshot(state, tap_stream_id):
+    '''Returns a copy of state to emit in a STATE message.
+
+    Only the given stream's bookmark is copied, as it is the one still
+    being written to; the rest of the state is shared, so the copy costs
+    the same however many streams the state holds.'''
+    bookmarks = state.get('bookmarks', {})
+    copied = dict(state, bookmarks=dict(bookmarks))
+    if tap_stream_id in bookmarks:
+        copied['bookmarks'][tap_stream_id] = copy.deepcopy(
+            bookmarks[tap_stream_id])
+    return copied
+
+
+def estimated_bytes(batch):
+    '''Returns the bytes a batch's RECORD messages take, estimated from the
+    size of its first one.'''
+    if not batch.records:
+        return 0
+    first = RecordBatch(batch.stream, batch.records[:1], batch.version,
+                        batch.time_extracted)
+    return len(format_message(first)) * len(batch)
+
+
+class Checkpointer(object):
+    '''Tracks the bookmark of a stream being synced and emits it in a STATE
+    message every `rows` rows, `seconds` seconds or `bytes_emitted` bytes
+    of records, whichever comes first.
+
+    Bookmark values are held here as batches go by, and only written into
+    the state when a checkpoint is due.'''
+
+    def __init__(self, state, tap_stream_id, rows=DEFAULT_CHECKPOINT_ROWS,
+                 seconds=None, bytes_emitted=None):
+        self.state = state
+        self.tap_stream_id = tap_stream_id
+        self.rows = rows
+        self.seconds = seconds
+        self.bytes_emitted = bytes_emitted
+        self.bookmark = {}
+        self._reset()
+
+    @classmethod
+    def from_config(cls, state, tap_stream_id, config):
+        def setting(key, convert, default=None):
+            value = config.get(key, default)
+            return convert(value) if value else None
+        return cls(state, tap_stream_id,
+                   rows=setting('checkpoint_rows', int,
+                                DEFAULT_CHECKPOINT_ROWS),
+                   seconds=setting('checkpoint_seconds', float),
+                   bytes_emitted=setting('checkpoint_bytes', int))
+
+    def _reset(self):
+        self.rows_since = 0
+        self.bytes_since = 0
+        self.started = time.monotonic()
+
+    def due(self):
+        return bool(
+            self.rows and self.rows_since >= self.rows or
+            self.bytes_emitted and self.bytes_since >= self.bytes_emitted or
+            self.seconds and
+            time.monotonic() - self.started >= self.seconds)
+
+    def record(self, batch, **bookmark):
+        '''Notes a batch that has been emitted and the bookmark values it
+        moved the stream to. Returns a STATE message when a checkpoint is
+        due, otherwise None.'''
+        self.bookmark.update(bookmark)
+        self.rows_since += len(batch)
+        if self.bytes_emitted:
+            self.bytes_since += estimated_bytes(batch)
+        if self.due():
+            return self.checkpoint()
+        return None
+
+    def flush(self):
+        '''Writes the bookmark values noted since the last checkpoint into
+        the state.'''
+        for key, value in self.bookmark.items():
+            singer.write_bookmark(self.state, self.tap_stream_id, key, value)
+        self.bookmark = {}
+        return self.state
+
+    def checkpoint(self):
+        self.flush()
+        self._reset()
+        return singer.StateMessage(
+            value=snapshot(self.state, self.tap_stream_id))
@@ -0,0 +1,71 @@
+# tap-redshift
+# Copyright 2018 data.world, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the
+# License.
+#
+# You may obtain a copy of the License at
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied. See the License for the specific language governing
+# permissions and limitations under the License.
+#
+# This product includes software developed at
+# data.world, Inc.(http://data.world/).
+
+import threading
+
+import singer
+
+LOGGER = singer.get_logger()
+
+
+def config_list(value):
+    '''Returns a config value that may be given either as a single item or
+    as a list of them as a list.'''
+    if isinstance(value, (list, tuple)):
+        return list(value)
+    return [value]
+
+
+class ConnectionPool(object):
+    '''Connections to one or more databases, shared by the threads that
+    discover and sync them.
+
+    A connection is opened on first use and kept once released, so every
+    thread borrowing one for the same database reuses it instead of
+    connecting again. Only connections opened by the pool are closed by
+    it.'''
+
+    def __init__(self, open_connection, connections=()):
+        self.open_connection = open_connection
+        self.idle = {}
+        self.opened = []
+        self.lock = threading.Lock()
+        for connection in connections:
+            self.release(connection)
+
+    def acquire(self, dbname):
+        with self.lock:
+            idle = self.idle.get(dbname)
+            if idle:
+                return idle.pop()
+        connection = self.open_connection(dbname)
+        with self.lock:
+            self.opened.append(connection)
+        return connection
+
+    def release(self, connection):
+        dbname = connection.get_dsn_parameters()['dbname']
+        with self.lock:
+            self.idle.setdefault(dbname, []).append(connection)
+
+    def close(self):
+        for connection in self.opened:
+            connection.close()
+        self.opened = []
+        self.idle = {}
@@ -0,0 +1,160 @@
+# tap-redshift
+# Copyright 2018 data.world, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the
+# License.
+#
+# You may obtain a copy of the License at
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied. See the License for the specific language governing
+# permissions and limitations under the License.
+#
+# This product includes software developed at
+# data.world, Inc.(http://data.world/).
+
+import datetime
+
+import psycopg2.extensions
+from singer import metadata
+
+TIMEZONE_AWARE_TYPES = {'timestamptz', 'timestamp with time zone'}
+
+TIMESTAMP_OID = 1114
+
+TIMESTAMPTZ_OID = 1184
+
+DATE_OID = 1082
+
+
+def format_timestamp(value):
+    return value.isoformat('T') + 'Z'
+
+
+def format_timestamptz(value):
+    return value.astimezone(datetime.timezone.utc).replace(
+        tzinfo=None).isoformat('T') + 'Z'
+
+
+def format_date(value):
+    return value.isoformat()
+
+
+def column_conversion(column_schema, sql_datatype):
+    '''Returns the function turning a fetched value into its record value,
+    or None when the value can be emitted as fetched.'''
+    if column_schema.format == 'date-time':
+        if sql_datatype in TIMEZONE_AWARE_TYPES:
+            return format_timestamptz
+        return format_timestamp
+    if column_schema.format == 'date':
+        return format_date
+    return None
+
+
+def iso_timestamp(date, time):
+    '''Joins Redshift's text date and time parts the way isoformat would,
+    with microseconds padded out to six digits.'''
+    if '.' in time:
+        time, _, fraction = time.partition('.')
+        time = '{}.{}'.format(time, fraction.ljust(6, '0'))
+    return '{}T{}'.format(date, time)
+
+
+def cast_timestamp(value, cursor):
+    if value is None:
+        return None
+    date, _, time = value.partition(' ')
+    if not time:
+        # infinity and -infinity have no time part to rearrange
+        return value
+    return iso_timestamp(date, time) + 'Z'
+
+
+def cast_timestamptz(value, cursor):
+    if value is None:
+        return None
+    date, _, time = value.partition(' ')
+    split = max(time.rfind('+'), time.rfind('-'))
+    if split == -1:
+        return cast_timestamp(value, cursor)
+
+    time, offset = time[:split], time[split:]
+    if offset.strip('+-0:') == '':
+        return iso_timestamp(date, time) + 'Z'
+
+    # Only sessions set to a timezone other than UTC get here
+    parts = [int(p) for p in offset[1:].split(':')] + [0, 0]
+    delta = datetime.timedelta(hours=parts[0], minutes=parts[1],
+                               seconds=parts[2])
+    whole, _, fraction = time.partition('.')
+    local = datetime.datetime.strptime(
+        '{} {}'.format(date, whole), '%Y-%m-%d %H:%M:%S').replace(
+            microsecond=int(fraction.ljust(6, '0')) if fraction else 0)
+    sign = 1 if offset[0] == '+' else -1
+    return format_timestamp(local - sign * delta)
+
+
+def cast_date(value, cursor):
+    return value
+
+
+TIMESTAMP = psycopg2.extensions.new_type(
+    (TIMESTAMP_OID,), 'TAP_REDSHIFT_TIMESTAMP', cast_timestamp)
+
+TIMESTAMPTZ = psycopg2.extensions.new_type(
+    (TIMESTAMPTZ_OID,), 'TAP_REDSHIFT_TIMESTAMPTZ', cast_timestamptz)
+
+DATE = psycopg2.extensions.new_type(
+    (DATE_OID,), 'TAP_REDSHIFT_DATE', cast_date)
+
+
+class TypecastConnection(psycopg2.extensions.connection):
+    '''Connection returning timestamp, timestamptz and date values as the
+    strings written to RECORD messages.
+
+    psycopg2 would otherwise build a datetime object for every temporal
+    cell only for it to be formatted back into a string.'''
+
+    native_typecasters = True
+
+    def __init__(self, *args, **kwargs):
+        super(TypecastConnection, self).__init__(*args, **kwargs)
+        for typecaster in (TIMESTAMP, TIMESTAMPTZ, DATE):
+            psycopg2.extensions.register_type(typecaster, self)
+
+
+def build_row_converter(catalog_entry, columns, native_typecasters=False):
+    '''Returns a function converting a fetched row into a record dict.
+
+    The conversions each column needs are worked out once from the
+    stream's schema and `sql-datatype` metadata, so converting a row only
+    touches the positions that need it. With `native_typecasters` the
+    connection has already produced the final strings and rows are only
+    zipped with their column names.'''
+    mdata = metadata.to_map(catalog_entry.metadata)
+    columns = tuple(columns)
+    conversions = []
+    for idx, column in enumerate(columns):
+        conversion = column_conversion(
+            catalog_entry.schema.properties[column],
+            metadata.get(mdata, ('properties', column), 'sql-datatype'))
+        if conversion is not None:
+            conversions.append((idx, conversion))
+
+    if not conversions or native_typecasters:
+        return lambda row: dict(zip(columns, row))
+
+    def convert(row):
+        values = list(row)
+        for idx, conversion in conversions:
+            value = values[idx]
+            if value is not None:
+                values[idx] = conversion(value)
+        return dict(zip(columns, values))
+
+    return convert
@@ -0,0 +1,121 @@
+# tap-redshift
+# Copyright 2018 data.world, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the
+# License.
+#
+# You may obtain a copy of the License at
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied. See the License for the specific language governing
+# permissions and limitations under the License.
+#
+# This product includes software developed at
+# data.world, Inc.(http://data.world/).
+import json
+import os
+import sqlite3
+
+import singer
+
+LOGGER = singer.get_logger()
+
+
+def row_key(record, key_columns):
+    '''Returns the key a record's hash is stored under.'''
+    return json.dumps([record[c] for c in key_columns], default=str)
+
+
+class HashStore(object):
+    '''On-disk index of the row hashes of a table's last delivered delta
+    sync, keyed by primary key.
+
+    Each sync is numbered, and the hashes it reads are kept as pending
+    under its number, which it bookmarks as `delta_run`. A target only
+    hands a state back once it has loaded the records before it, so the
+    pending hashes replace the delivered ones only when a later sync starts
+    from a state holding their number. Until then, rows are compared with
+    the hashes last delivered, and changed rows are emitted again.'''
+
+    def __init__(self, directory, tap_stream_id, delivered_run=None):
+        os.makedirs(directory, exist_ok=True)
+        self.path = os.path.join(directory, '{}.sqlite'.format(tap_stream_id))
+        self.tombstones_path = os.path.join(
+            directory, '{}.deleted.json'.format(tap_stream_id))
+        self.connection = sqlite3.connect(self.path)
+        for table in ('row_hashes', 'pending_hashes'):
+            self.connection.execute(
+                'CREATE TABLE IF NOT EXISTS {} (key TEXT PRIMARY KEY, '
+                'hash TEXT NOT NULL, run INTEGER NOT NULL)'.format(table))
+        self.connection.execute(
+            'CREATE TABLE IF NOT EXISTS pending_run (run INTEGER NOT NULL)')
+        self.promote(delivered_run)
+        self.run = self.connection.execute(
+            'PRAGMA user_version').fetchone()[0] + 1
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def promote(self, delivered_run):
+        '''Makes the pending hashes the delivered ones if they are those of
+        `delivered_run`, and drops them otherwise.'''
+        pending = self.connection.execute(
+            'SELECT run FROM pending_run').fetchone()
+        if pending is not None and pending[0] == delivered_run:
+            self.connection.execute('DELETE FROM row_hashes')
+            self.connection.execute(
+                'INSERT INTO row_hashes SELECT * FROM pending_hashes')
+        self.connection.execute('DELETE FROM pending_hashes')
+        self.connection.execute('DELETE FROM pending_run')
+        self.connection.commit()
+
+    def changed(self, keys, hashes):
+        '''Returns the positions of the rows that are new or changed since
+        the last delivered sync, and records every row as read by this
+        one.'''
+        cursor = self.connection.cursor()
+        changed = []
+        for position, (key, row_hash) in enumerate(zip(keys, hashes)):
+            stored = cursor.execute(
+                'SELECT hash FROM row_hashes WHERE key = ?',
+                (key,)).fetchone()
+            if stored is None or stored[0] != row_hash:
+                changed.append(position)
+        cursor.executemany(
+            'INSERT OR REPLACE INTO pending_hashes (key, hash, run) '
+            'VALUES (?, ?, {})'.format(self.run), zip(keys, hashes))
+        return changed
+
+    def deleted(self):
+        '''Returns the keys of the delivered rows this sync did not
+        read.'''
+        return [json.loads(key) for key, in self.connection.execute(
+            'SELECT key FROM row_hashes WHERE key NOT IN '
+            '(SELECT key FROM pending_hashes)')]
+
+    def commit(self, key_columns, time_extracted):
+        '''Writes this sync's hashes to disk as pending, along with the
+        report of the keys it found deleted.'''
+        deleted = self.deleted()
+        partial = self.tombstones_path + '.partial'
+        with open(partial, 'w') as report:
+            json.dump({'key_properties': key_columns,
+                       'time_extracted': time_extracted.isoformat(),
+                       'deleted': [dict(zip(key_columns, key))
+                                   for key in deleted]}, report)
+        self.connection.execute(
+            'INSERT INTO pending_run (run) VALUES (?)', (self.run,))
+        self.connection.execute('PRAGMA user_version = {}'.format(self.run))
+        self.connection.commit()
+        os.replace(partial, self.tombstones_path)
+        return deleted
+
+    def close(self):
+        self.connection.close()
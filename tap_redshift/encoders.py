@@ -0,0 +1,107 @@
+# tap-redshift
+# Copyright 2018 data.world, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the
+# License.
+#
+# You may obtain a copy of the License at
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied. See the License for the specific language governing
+# permissions and limitations under the License.
+#
+# This product includes software developed at
+# data.world, Inc.(http://data.world/).
+
+import datetime
+from decimal import Decimal
+
+import simplejson as json
+import singer
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+LOGGER = singer.get_logger()
+
+
+def coerce_datetime(o):
+    if isinstance(o, (datetime.datetime, datetime.date)):
+        return o.isoformat()
+    raise TypeError("Type {} is not serializable".format(type(o)))
+
+
+class SimpleJsonEncoder(object):
+    '''The reference encoder; its output is what every other backend has
+    to reproduce.'''
+    name = 'simplejson'
+
+    def dumps(self, obj):
+        return json.dumps(obj, default=coerce_datetime,
+                          use_decimal=True).encode('utf-8')
+
+
+class OrjsonEncoder(object):
+    '''Compiled encoder backed by orjson.
+
+    Decimals are embedded verbatim as JSON fragments, datetimes go through
+    `coerce_datetime` and the floats of records are written by simplejson,
+    which keeps NaN and Infinity rather than writing null and spells
+    exponents as it does, so values come out exactly as they do from
+    simplejson. orjson neither pads separators with spaces nor escapes
+    non-ASCII characters, so the output matches simplejson run with
+    `separators=(',', ':')` and `ensure_ascii=False`.'''
+    name = 'orjson'
+
+    def __init__(self):
+        if not self.available():
+            raise Exception('The orjson encoder requires orjson>=3.9')
+
+    @staticmethod
+    def available():
+        return orjson is not None and hasattr(orjson, 'Fragment')
+
+    @staticmethod
+    def _default(o):
+        if isinstance(o, Decimal):
+            return orjson.Fragment(str(o))
+        return coerce_datetime(o)
+
+    @staticmethod
+    def _simplejson_floats(record):
+        return {key: orjson.Fragment(json.dumps(value))
+                if type(value) is float else value
+                for key, value in record.items()}
+
+    def dumps(self, obj):
+        record = obj.get('record')
+        if record is not None:
+            obj = dict(obj, record=self._simplejson_floats(record))
+        return orjson.dumps(obj, default=self._default,
+                            option=orjson.OPT_PASSTHROUGH_DATETIME)
+
+
+ENCODERS = {
+    SimpleJsonEncoder.name: SimpleJsonEncoder,
+    OrjsonEncoder.name: OrjsonEncoder,
+}
+
+
+def get_encoder(name='auto'):
+    '''Returns the encoder configured by `json_encoder`.
+
+    `auto` is simplejson, the reference encoder; orjson has to be asked
+    for by name.'''
+    if name == 'auto':
+        name = 'simplejson'
+    if name not in ENCODERS:
+        raise Exception('Unknown json_encoder {}, expected one of {}'.format(
+            name, ', '.join(['auto'] + sorted(ENCODERS))))
+    LOGGER.info('Serializing messages with {}'.format(name))
+    return ENCODERS[name]()
@@ -0,0 +1,57 @@
+# tap-redshift
+# Copyright 2018 data.world, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the
+# License.
+#
+# You may obtain a copy of the License at
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied. See the License for the specific language governing
+# permissions and limitations under the License.
+#
+# This product includes software developed at
+# data.world, Inc.(http://data.world/).
+
+# Rows read by each query of a keyset paginated sync.
+DEFAULT_CHUNK_SIZE = 100000
+
+
+def key_columns(mdata):
+    '''Returns the stream's primary key columns.'''
+    stream_md = mdata.get((), {})
+    if stream_md.get('is-view'):
+        return list(stream_md.get('view-key-properties') or [])
+    return list(stream_md.get('table-key-properties') or [])
+
+
+def order_by(columns):
+    return ', '.join('"{}" ASC'.format(column) for column in columns)
+
+
+def keyset_filter(columns, values, prefix='keyset'):
+    '''Returns an SQL condition selecting the rows that come after `values`
+    in the order of `columns`, and its params.
+
+    The comparison is spelled out column by column, as in
+    `a > x OR (a = x AND b > y)`, rather than as a row comparison.'''
+    params = {}
+    alternatives = []
+    for i, column in enumerate(columns):
+        param = '{}_{}'.format(prefix, i)
+        params[param] = values[column]
+        terms = ['"{}" = %({}_{})s'.format(previous, prefix, j)
+                 for j, previous in enumerate(columns[:i])]
+        terms.append('"{}" > %({})s'.format(column, param))
+        alternatives.append('({})'.format(' AND '.join(terms)))
+    return '({})'.format(' OR '.join(alternatives)), params
+
+
+def last_key(batch, columns):
+    '''Returns the key of the last record in a RecordBatch.'''
+    record = batch.records[-1]
+    return {column: record[column] for column in columns}
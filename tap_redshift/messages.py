@@ -0,0 +1,66 @@
+# tap-redshift
+# Copyright 2018 data.world, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the
+# License.
+#
+# You may obtain a copy of the License at
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied. See the License for the specific language governing
+# permissions and limitations under the License.
+#
+# This product includes software developed at
+# data.world, Inc.(http://data.world/).
+
+import pytz
+from singer import utils
+
+from tap_redshift.encoders import SimpleJsonEncoder
+
+DEFAULT_ENCODER = SimpleJsonEncoder()
+
+
+class RecordBatch(object):
+    '''A run of RECORD messages for one stream that share a version and
+    extraction time.
+
+    Batches are produced by `sync_table` so that a whole `fetchmany` worth
+    of rows can be converted and serialized in one pass rather than going
+    through a RecordMessage per row.'''
+
+    def __init__(self, stream, records, version=None, time_extracted=None):
+        self.stream = stream
+        self.records = records
+        self.version = version
+        self.time_extracted = time_extracted
+
+    def __len__(self):
+        return len(self.records)
+
+    def asdicts(self):
+        '''Returns the RECORD message dicts, as RecordMessage.asdict would.'''
+        extra = {}
+        if self.version is not None:
+            extra['version'] = self.version
+        if self.time_extracted:
+            as_utc = self.time_extracted.astimezone(pytz.utc)
+            extra['time_extracted'] = as_utc.strftime(utils.DATETIME_FMT)
+
+        stream = self.stream
+        return [dict({'type': 'RECORD', 'stream': stream, 'record': record},
+                     **extra)
+                for record in self.records]
+
+
+def format_message(message, encoder=DEFAULT_ENCODER):
+    '''Returns the newline terminated JSON lines for a message or batch.'''
+    if isinstance(message, RecordBatch):
+        if not message.records:
+            return b''
+        return b'\n'.join(map(encoder.dumps, message.asdicts())) + b'\n'
+    return encoder.dumps(message.asdict()) + b'\n'
@@ -0,0 +1,107 @@
+# tap-redshift
+# Copyright 2018 data.world, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the
+# License.
+#
+# You may obtain a copy of the License at
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied. See the License for the specific language governing
+# permissions and limitations under the License.
+#
+# This product includes software developed at
+# data.world, Inc.(http://data.world/).
+
+import json
+import sys
+import time
+
+import singer
+
+from tap_redshift.messages import DEFAULT_ENCODER, format_message
+
+DEFAULT_BUFFER_SIZE = 1024 * 1024
+
+DEFAULT_FLUSH_INTERVAL = 1.0
+
+
+class OutputWriter(object):
+    '''Buffers serialized messages and writes them out in large chunks.
+
+    The buffer is flushed once it holds `buffer_size` bytes, once
+    `flush_interval` seconds have passed since the last flush, and always
+    straight after a STATE message so a target never sees a checkpoint
+    before the records it covers.
+
+    stream - binary file-like object to write to, stdout by default
+    encoder - JSON encoder from `tap_redshift.encoders`
+    '''
+
+    def __init__(self, stream=None, buffer_size=DEFAULT_BUFFER_SIZE,
+                 flush_interval=DEFAULT_FLUSH_INTERVAL,
+                 encoder=DEFAULT_ENCODER):
+        self.stream = stream if stream is not None else sys.stdout.buffer
+        self.encoder = encoder
+        self.buffer_size = buffer_size
+        self.flush_interval = flush_interval
+        self.bytes_written = 0
+        self.flush_count = 0
+        self._buffer = bytearray()
+        self._last_flush = time.monotonic()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.flush()
+
+    def write_message(self, message):
+        self._buffer += format_message(message, self.encoder)
+
+        if (isinstance(message, singer.StateMessage)
+                or len(self._buffer) >= self.buffer_size
+                or time.monotonic() - self._last_flush >= self.flush_interval):
+            self.flush()
+
+    def flush(self):
+        if self._buffer:
+            self.stream.write(self._buffer)
+            self.stream.flush()
+            self.bytes_written += len(self._buffer)
+            self.flush_count += 1
+            del self._buffer[:]
+        self._last_flush = time.monotonic()
+
+
+class CatalogWriter(object):
+    '''Writes a catalog one entry at a time, in the same format as
+    `Catalog.dump`, so a catalog never has to be held in memory whole.
+
+    stream - text file-like object to write to, stdout by default
+    '''
+
+    def __init__(self, stream=None):
+        self.stream = stream if stream is not None else sys.stdout
+        self.entry_count = 0
+
+    def __enter__(self):
+        self.stream.write('{\n  "streams": [')
+        return self
+
+    def __exit__(self, exc_type, *args):
+        if exc_type is None:
+            self.stream.write(
+                '\n  ]\n}' if self.entry_count else ']\n}')
+        self.stream.flush()
+
+    def write_entry(self, catalog_entry):
+        entry = json.dumps(catalog_entry.to_dict(), indent=2)
+        self.stream.write('{}\n    {}'.format(
+            ',' if self.entry_count else '',
+            entry.replace('\n', '\n    ')))
+        self.entry_count += 1
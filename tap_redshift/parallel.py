@@ -0,0 +1,134 @@
+# tap-redshift
+# Copyright 2018 data.world, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the
+# License.
+#
+# You may obtain a copy of the License at
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied. See the License for the specific language governing
+# permissions and limitations under the License.
+#
+# This product includes software developed at
+# data.world, Inc.(http://data.world/).
+
+import copy
+import queue
+import threading
+
+import singer
+
+LOGGER = singer.get_logger()
+
+# Upper bound on messages waiting for the writer, so fast workers cannot
+# run arbitrarily far ahead of stdout.
+MAX_PENDING_MESSAGES = 100
+
+TASK_DONE = object()
+
+_DONE = object()
+
+
+def stream_state(state, tap_stream_id):
+    '''Returns a private state holding only the given stream's bookmark.'''
+    bookmark = state.get('bookmarks', {}).get(tap_stream_id)
+    if bookmark is None:
+        return {}
+    return {'bookmarks': {tap_stream_id: copy.deepcopy(bookmark)}}
+
+
+def run_tasks(connections, tasks, work):
+    '''Runs `work(connection, task)` generators concurrently and yields
+    `(task, item)` for every item they produce, from the calling thread.
+
+    Each worker thread owns one connection and takes tasks off a shared
+    queue until none are left, so items from one task keep their order.
+    `(task, TASK_DONE)` is yielded once a task's generator is exhausted. An
+    exception raised by any task stops the remaining work and is re-raised
+    here.
+    '''
+    pending = queue.Queue()
+    for task in tasks:
+        pending.put(task)
+
+    output = queue.Queue(maxsize=MAX_PENDING_MESSAGES)
+    stop = threading.Event()
+
+    def run(connection):
+        try:
+            while not stop.is_set():
+                try:
+                    task = pending.get_nowait()
+                except queue.Empty:
+                    break
+                for item in work(connection, task):
+                    output.put((task, item))
+                    if stop.is_set():
+                        return
+                output.put((task, TASK_DONE))
+        except Exception as exc:
+            output.put((None, exc))
+        finally:
+            output.put((None, _DONE))
+
+    workers = [threading.Thread(target=run, args=(connection,),
+                                daemon=True)
+               for connection in connections]
+    for worker in workers:
+        worker.start()
+
+    running = len(workers)
+    try:
+        while running:
+            task, item = output.get()
+            if item is _DONE:
+                running -= 1
+            elif isinstance(item, Exception):
+                raise item
+            else:
+                yield task, item
+    finally:
+        stop.set()
+        while running:
+            if output.get()[1] is _DONE:
+                running -= 1
+
+
+def sync_streams(connections, streams, state, sync_stream):
+    '''Syncs several streams at once, one per connection, and yields their
+    messages from the calling thread.
+
+    Each stream runs `sync_stream(connection, entry, state)` against a
+    private copy of its own bookmark. STATE messages are merged into
+    `state` here, in the single writer thread, and re-emitted with every
+    stream's bookmark.
+    '''
+    stream_states = {entry.tap_stream_id: stream_state(
+        state, entry.tap_stream_id) for entry in streams}
+
+    def work(connection, catalog_entry):
+        LOGGER.info('Syncing {} concurrently'.format(
+            catalog_entry.tap_stream_id))
+        return sync_stream(connection, catalog_entry,
+                           stream_states[catalog_entry.tap_stream_id])
+
+    for catalog_entry, message in run_tasks(connections, streams, work):
+        if message is TASK_DONE:
+            continue
+        if isinstance(message, singer.StateMessage):
+            tap_stream_id = catalog_entry.tap_stream_id
+            bookmark = message.value.get('bookmarks', {}).get(tap_stream_id)
+            if bookmark is not None:
+                state.setdefault('bookmarks', {})[tap_stream_id] = bookmark
+            # Bookmarks are replaced rather than changed in place, and those
+            # from workers are their own copies, so copying down to the
+            # bookmarks is enough to keep this message from changing.
+            yield singer.StateMessage(value=dict(
+                state, bookmarks=dict(state.get('bookmarks', {}))))
+        else:
+            yield message
@@ -0,0 +1,121 @@
+# tap-redshift
+# Copyright 2018 data.world, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the
+# License.
+#
+# You may obtain a copy of the License at
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied. See the License for the specific language governing
+# permissions and limitations under the License.
+#
+# This product includes software developed at
+# data.world, Inc.(http://data.world/).
+
+import datetime
+
+import pendulum
+import singer
+
+LOGGER = singer.get_logger()
+
+INTEGER_TYPES = {'int2', 'int', 'int4', 'int8', 'smallint', 'integer',
+                 'bigint'}
+
+
+def partition_column(mdata, schema):
+    '''Returns the column a stream's rows are split into ranges over.
+
+    An explicit `partition-key` wins, then the replication key, then the
+    first integer primary key column. None means the stream cannot be
+    partitioned.'''
+    stream_md = mdata.get((), {})
+    if stream_md.get('partition-key'):
+        return stream_md['partition-key']
+    if stream_md.get('replication-key'):
+        return stream_md['replication-key']
+
+    key_properties = (stream_md.get('table-key-properties') or
+                      stream_md.get('view-key-properties') or [])
+    for column in key_properties:
+        sql_datatype = mdata.get(('properties', column), {}).get(
+            'sql-datatype')
+        if column in schema.properties and sql_datatype in INTEGER_TYPES:
+            return column
+    return None
+
+
+def to_bound(value):
+    '''Returns a range bound in the JSON-friendly form kept in state.'''
+    if isinstance(value, (datetime.datetime, datetime.date)):
+        return value.isoformat()
+    return value
+
+
+def from_bound(value, column_schema):
+    '''Returns a bound kept in state as a query parameter.'''
+    if value is not None and column_schema.format == 'date-time':
+        return pendulum.parse(value)
+    return value
+
+
+def probe_bounds(cursor, table, column, where='', params=None):
+    '''Returns the (min, max) of a column over the rows being synced.'''
+    cursor.execute('SELECT MIN("{0}"), MAX("{0}") FROM {1}{2}'.format(
+        column, table, where), params or {})
+    return cursor.fetchone()
+
+
+def split_points(lower, upper, count):
+    '''Returns up to count - 1 increasing values splitting [lower, upper]
+    into ranges of equal width.'''
+    if isinstance(lower, str):
+        lower, upper = pendulum.parse(lower), pendulum.parse(upper)
+    if lower is None or upper is None or not lower < upper:
+        return []
+
+    points = []
+    for i in range(1, count):
+        if isinstance(lower, int):
+            point = lower + (upper - lower) * i // count
+        else:
+            point = lower + (upper - lower) * i / count
+        if lower < point < upper and (not points or point > points[-1]):
+            points.append(point)
+    return points
+
+
+def plan_partitions(lower, upper, count):
+    '''Returns the partitions to track in state for the given bounds.
+
+    The first partition has no lower bound, so rows with a NULL partition
+    key are not lost, and the last has no upper bound, so rows written
+    after the bounds were probed are still picked up.'''
+    bounds = [None] + [to_bound(p) for p in split_points(lower, upper,
+                                                         count)] + [None]
+    return [{'lower': bounds[i], 'upper': bounds[i + 1], 'done': False}
+            for i in range(len(bounds) - 1)]
+
+
+def partition_filter(partition, column, column_schema):
+    '''Returns the SQL predicate and params restricting rows to a
+    partition.'''
+    predicates = []
+    params = {}
+    if partition['lower'] is not None:
+        predicates.append('"{}" >= %(partition_lower)s'.format(column))
+        params['partition_lower'] = from_bound(partition['lower'],
+                                               column_schema)
+    if partition['upper'] is not None:
+        predicates.append('"{}" < %(partition_upper)s'.format(column))
+        params['partition_upper'] = from_bound(partition['upper'],
+                                               column_schema)
+    if partition['lower'] is None and predicates:
+        return '({} OR "{}" IS NULL)'.format(
+            ' AND '.join(predicates), column), params
+    return ' AND '.join(predicates) or 'TRUE', params
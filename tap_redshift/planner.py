@@ -0,0 +1,145 @@
+# tap-redshift
+# Copyright 2018 data.world, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the
+# License.
+#
+# You may obtain a copy of the License at
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied. See the License for the specific language governing
+# permissions and limitations under the License.
+#
+# This product includes software developed at
+# data.world, Inc.(http://data.world/).
+
+import psycopg2
+import singer
+from singer import metadata
+
+from tap_redshift.connections import config_list
+from tap_redshift.partition import partition_column
+
+LOGGER = singer.get_logger()
+
+PLAN_KEYS = ('extraction-method', 'server-side-cursor', 'itersize',
+             'partition-count')
+
+# Config settings applying to every stream, which a plan must not override
+PLAN_CONFIG_KEYS = {'server-side-cursor': 'server_side_cursor',
+                    'itersize': 'itersize'}
+
+# Tables with fewer rows than this are read through a plain cursor.
+DEFAULT_SMALL_TABLE_ROWS = 1000000
+
+# Tables with more rows than this are unloaded or partitioned when the
+# config allows it.
+DEFAULT_LARGE_TABLE_ROWS = 100000000
+
+# Aim for fetch batches of roughly this many bytes.
+TARGET_BATCH_BYTES = 64 * 1024 * 1024
+
+MIN_ITERSIZE = 1000
+
+MAX_ITERSIZE = 100000
+
+
+def table_stats(conn, db_schemas):
+    '''Returns {schema.table: (row count, size in MB)} from SVV_TABLE_INFO
+    for one schema or a list of them, or {} when it cannot be read.'''
+    try:
+        with conn.cursor() as cursor:
+            cursor.execute(
+                'SELECT "schema", "table", tbl_rows, size '
+                'FROM svv_table_info WHERE "schema" IN %s',
+                (tuple(config_list(db_schemas)),))
+            return {'{}.{}'.format(schema, table): (int(rows or 0),
+                                                    int(size or 0))
+                    for schema, table, rows, size in cursor.fetchall()}
+    except psycopg2.Error as exc:
+        conn.rollback()
+        LOGGER.warning('Could not read table sizes from SVV_TABLE_INFO, '
+                       'extraction will not be planned: {}'.format(exc))
+        return {}
+
+
+def plan_extraction(rows, size_mb, partitionable, config):
+    '''Returns the extraction plan for a table of the given size, and the
+    reasons it was chosen.'''
+    small = int(config.get('small_table_rows', DEFAULT_SMALL_TABLE_ROWS))
+    large = int(config.get('large_table_rows', DEFAULT_LARGE_TABLE_ROWS))
+    row_bytes = max(1, size_mb * 1024 * 1024 // max(rows, 1))
+    itersize = int(min(MAX_ITERSIZE, max(MIN_ITERSIZE,
+                                         TARGET_BATCH_BYTES // row_bytes)))
+
+    if rows < small:
+        return ({'extraction-method': 'CURSOR',
+                 'server-side-cursor': False,
+                 'itersize': itersize},
+                '{} rows is below small_table_rows ({}), reading it in '
+                'one query'.format(rows, small))
+
+    plan = {'extraction-method': 'CURSOR',
+            'server-side-cursor': True,
+            'itersize': itersize}
+    reason = '{} rows, streaming through a server-side cursor {} rows ' \
+             'at a time'.format(rows, itersize)
+
+    if rows >= large and config.get('unload_location'):
+        plan['extraction-method'] = 'UNLOAD'
+        reason = '{} rows is above large_table_rows ({}), unloading it ' \
+                 'to {}'.format(rows, large, config['unload_location'])
+    elif rows >= large and partitionable:
+        partitions = int(config.get('max_partitions', 1))
+        if partitions > 1:
+            plan['partition-count'] = partitions
+            reason += ', split into {} partitions as it is above ' \
+                      'large_table_rows ({})'.format(partitions, large)
+    return plan, reason
+
+
+def plan_entry(catalog_entry, stats, config, mdata=None):
+    '''Adds an extraction plan to the stream's metadata, given the
+    table_stats of its schema and optionally its parsed metadata.
+
+    The values planned are recorded as `extraction-plan`, so those still
+    unchanged are planned again from the table's current size, while
+    values edited in the catalog are kept. Settings given in the config are
+    left out of the plan.'''
+    if catalog_entry.table not in stats:
+        return catalog_entry
+
+    if mdata is None:
+        mdata = metadata.to_map(catalog_entry.metadata)
+    rows, size_mb = stats[catalog_entry.table]
+    partitionable = partition_column(
+        mdata, catalog_entry.schema) is not None
+    plan, reason = plan_extraction(rows, size_mb, partitionable, config)
+
+    stream_md = mdata.setdefault((), {})
+    previous_plan = stream_md.pop('extraction-plan', None) or {}
+    stream_md.pop('extraction-plan-reason', None)
+    for key, value in previous_plan.items():
+        if stream_md.get(key) == value:
+            del stream_md[key]
+
+    mdata = metadata.write(mdata, (), 'row-count', rows)
+    mdata = metadata.write(mdata, (), 'table-size-mb', size_mb)
+    planned = {}
+    for key in PLAN_KEYS:
+        if (key in plan and metadata.get(mdata, (), key) is None and
+                PLAN_CONFIG_KEYS.get(key) not in config):
+            mdata = metadata.write(mdata, (), key, plan[key])
+            planned[key] = plan[key]
+    if planned:
+        mdata = metadata.write(mdata, (), 'extraction-plan', planned)
+        mdata = metadata.write(mdata, (), 'extraction-plan-reason', reason)
+        if planned != previous_plan:
+            LOGGER.info('Planned {} for {}: {}'.format(
+                planned, catalog_entry.tap_stream_id, reason))
+    catalog_entry.metadata = metadata.to_list(mdata)
+    return catalog_entry
@@ -65,28 +65,63 @@ def desired_columns(selected, table_schema):
     return selected.intersection(available).union(automatic)
 
 
-def entry_is_selected(catalog_entry):
-    mdata = metadata.new()
-    if catalog_entry.metadata is not None:
-        mdata = metadata.to_map(catalog_entry.metadata)
+class CatalogIndex(object):
+    """A catalog's streams looked up by tap_stream_id, with the metadata of
+    each parsed into a breadcrumb map once and shared by every reader.
+
+    A stream's map is only parsed again when its metadata list has been
+    replaced, as the planner does.
+    """
+
+    def __init__(self, catalog):
+        self.streams = catalog.streams
+        self.entries = {}
+        for entry in self.streams:
+            self.entries.setdefault(entry.tap_stream_id, entry)
+        self.parsed = {}
+
+    def get_stream(self, tap_stream_id):
+        return self.entries.get(tap_stream_id)
+
+    def metadata(self, catalog_entry):
+        # The entry is kept with its map so its id cannot be reused
+        cached = self.parsed.get(id(catalog_entry))
+        if cached is None or cached[1] is not catalog_entry.metadata:
+            cached = (catalog_entry, catalog_entry.metadata,
+                      metadata.to_map(catalog_entry.metadata or []))
+            self.parsed[id(catalog_entry)] = cached
+        return cached[2]
+
+
+def entry_is_selected(catalog_entry, mdata=None):
+    if mdata is None:
+        mdata = metadata.to_map(catalog_entry.metadata or [])
     return bool(catalog_entry.is_selected()
-                or metadata.get(mdata, (), 'selected'))
+                or mdata.get((), {}).get('selected'))
 
 
-def get_selected_properties(catalog_entry):
-    mdata = metadata.to_map(catalog_entry.metadata)
+def get_selected_properties(catalog_entry, mdata=None):
+    if mdata is None:
+        mdata = metadata.to_map(catalog_entry.metadata)
     properties = catalog_entry.schema.properties
 
-    return {
-        k for k, v in properties.items()
-        if (metadata.get(mdata, ('properties', k), 'selected')
-            or (metadata.get(mdata, ('properties', k), 'selected-by-default')
-                and metadata.get(mdata, ('properties', k), 'selected') is None)
-            or properties[k].selected)}
+    selected = set()
+    for k, v in properties.items():
+        column_md = mdata.get(('properties', k), {})
+        if (column_md.get('selected')
+                or (column_md.get('selected-by-default')
+                    and column_md.get('selected') is None)
+                or v.selected):
+            selected.add(k)
+    return selected
 
 
 def resolve_catalog(discovered, catalog, state):
-    streams = list(filter(entry_is_selected, catalog.streams))
+    if not isinstance(discovered, CatalogIndex):
+        discovered = CatalogIndex(discovered)
+    index = CatalogIndex(catalog)
+    streams = [entry for entry in catalog.streams
+               if entry_is_selected(entry, index.metadata(entry))]
 
     currently_syncing = singer.get_currently_syncing(state)
     if currently_syncing:
@@ -104,7 +139,8 @@ def resolve_catalog(discovered, catalog, state):
                            .format(catalog_entry.database,
                                    catalog_entry.table))
             continue
-        selected = get_selected_properties(catalog_entry)
+        selected = get_selected_properties(
+            catalog_entry, index.metadata(catalog_entry))
 
         # These are the columns we need to select
         columns = desired_columns(selected, discovered_table.schema)
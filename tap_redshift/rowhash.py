@@ -0,0 +1,56 @@
+# tap-redshift
+# Copyright 2018 data.world, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the
+# License.
+#
+# You may obtain a copy of the License at
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied. See the License for the specific language governing
+# permissions and limitations under the License.
+#
+# This product includes software developed at
+# data.world, Inc.(http://data.world/).
+# Types Redshift cannot cast to VARCHAR, so their values are spelled out
+BOOL_TYPES = {'bool', 'boolean'}
+
+
+def column_text_sql(column, sql_datatype):
+    '''Returns the SQL expression for a column's value as text.'''
+    if sql_datatype in BOOL_TYPES:
+        return "CASE WHEN \"{0}\" THEN 't' WHEN NOT \"{0}\" THEN 'f' " \
+               "END".format(column)
+    return '"{}"::VARCHAR(MAX)'.format(column)
+
+
+def row_hash_sql(columns, mdata):
+    '''Returns the SQL expression hashing a row's columns to an MD5 hex
+    digest, given the stream's metadata for their `sql-datatype`. Values
+    are prefixed with + so NULLs, hashed as -, differ from empty
+    strings.'''
+    return 'MD5({})'.format(" || '|' || ".join(
+        "COALESCE('+' || {}, '-')".format(column_text_sql(
+            column,
+            mdata.get(('properties', column), {}).get('sql-datatype')))
+        for column in columns))
+
+
+def table_signature_sql(columns, mdata, table_sql):
+    '''Returns the query for a table's row count and the sum of the first
+    32 bits of its row hashes, which an insert, update or delete of the
+    columns is all but certain to change.'''
+    return ('SELECT COUNT(*), SUM(STRTOL(LEFT({}, 8), 16)) FROM {}'
+            .format(row_hash_sql(columns, mdata), table_sql))
+
+
+def table_signature(cursor, columns, mdata, table_sql):
+    '''Returns a table's signature in the JSON-friendly form kept in
+    state.'''
+    cursor.execute(table_signature_sql(columns, mdata, table_sql))
+    count, checksum = cursor.fetchone()
+    return [int(count), int(checksum or 0)]
@@ -0,0 +1,209 @@
+# tap-redshift
+# Copyright 2018 data.world, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the
+# License.
+#
+# You may obtain a copy of the License at
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied. See the License for the specific language governing
+# permissions and limitations under the License.
+#
+# This product includes software developed at
+# data.world, Inc.(http://data.world/).
+
+import csv
+import gzip
+import io
+import json
+import os
+from decimal import Decimal
+from urllib.parse import urlparse
+
+import singer
+
+from tap_redshift import parallel
+from tap_redshift.convert import (TIMEZONE_AWARE_TYPES, cast_timestamp,
+                                  cast_timestamptz)
+from tap_redshift.messages import RecordBatch
+
+try:
+    import boto3
+except ImportError:
+    boto3 = None
+
+LOGGER = singer.get_logger()
+
+NULL_MARKER = '\\N'
+
+DEFAULT_UNLOAD_WORKERS = 4
+
+REQUIRED_UNLOAD_CONFIG_KEYS = ['unload_location', 'unload_iam_role']
+
+
+class S3ObjectStore(object):
+    '''Reads UNLOAD output from S3 or an S3-compatible service.'''
+
+    def __init__(self, endpoint_url=None):
+        if boto3 is None:
+            raise Exception('UNLOAD extraction requires boto3, install '
+                            'tap-redshift[unload]')
+        self.client = boto3.client('s3', endpoint_url=endpoint_url)
+
+    @staticmethod
+    def _split(url):
+        parsed = urlparse(url)
+        return parsed.netloc, parsed.path.lstrip('/')
+
+    def open(self, url):
+        bucket, key = self._split(url)
+        return self.client.get_object(Bucket=bucket, Key=key)['Body']
+
+    def delete(self, urls):
+        for url in urls:
+            bucket, key = self._split(url)
+            self.client.delete_object(Bucket=bucket, Key=key)
+
+
+class LocalObjectStore(object):
+    '''Stand-in for S3 reading `file://` URLs from the local filesystem.'''
+
+    def open(self, url):
+        return open(urlparse(url).path, 'rb')
+
+    def delete(self, urls):
+        for url in urls:
+            os.remove(urlparse(url).path)
+
+
+def check_config(config):
+    '''Raises unless the config has every setting UNLOAD needs.'''
+    missing = [key for key in REQUIRED_UNLOAD_CONFIG_KEYS
+               if not config.get(key)]
+    if missing:
+        raise Exception('UNLOAD extraction requires {} in the config'.format(
+            ', '.join(missing)))
+
+
+def object_store(location, endpoint_url=None):
+    scheme = urlparse(location).scheme
+    if scheme == 's3':
+        return S3ObjectStore(endpoint_url)
+    if scheme == 'file':
+        return LocalObjectStore()
+    raise Exception('Unsupported unload_location {}'.format(location))
+
+
+def unload_statement(query, location, iam_role):
+    '''Returns the UNLOAD writing a query's rows as gzipped CSV parts under
+    `location`, along with a manifest listing them.'''
+    return ("UNLOAD ('{}') TO '{}' IAM_ROLE '{}' FORMAT AS CSV "
+            "NULL AS '{}' GZIP MANIFEST ALLOWOVERWRITE").format(
+                query.replace("'", "''"), location, iam_role, NULL_MARKER)
+
+
+def column_decoder(column_schema, sql_datatype):
+    '''Returns the function turning an unloaded CSV field into the value
+    the cursor based sync would have emitted.'''
+    types = column_schema.type
+    if not isinstance(types, list):
+        types = [types]
+
+    if 'integer' in types:
+        return int
+    if 'number' in types:
+        return Decimal if sql_datatype == 'numeric' else float
+    if 'boolean' in types:
+        return lambda value: value == 't'
+    if column_schema.format == 'date-time':
+        if sql_datatype in TIMEZONE_AWARE_TYPES:
+            return lambda value: cast_timestamptz(value, None)
+        return lambda value: cast_timestamp(value, None)
+    return None
+
+
+def build_row_decoder(catalog_entry, columns):
+    '''Returns a function decoding an unloaded CSV row into a record.'''
+    mdata = singer.metadata.to_map(catalog_entry.metadata)
+    decoders = [column_decoder(
+        catalog_entry.schema.properties[column],
+        singer.metadata.get(mdata, ('properties', column), 'sql-datatype'))
+        for column in columns]
+    columns = tuple(columns)
+
+    def decode(row):
+        return dict(zip(columns, [
+            None if value == NULL_MARKER
+            else decoder(value) if decoder is not None
+            else value
+            for decoder, value in zip(decoders, row)]))
+
+    return decode
+
+
+def read_part(store, url, decode_row, batch_size):
+    '''Yields the records of one gzipped CSV part, `batch_size` at a time,
+    decompressing and decoding it as it is downloaded.'''
+    with store.open(url) as body:
+        with gzip.GzipFile(fileobj=body) as data:
+            reader = csv.reader(io.TextIOWrapper(data, encoding='utf-8'))
+            batch = []
+            for row in reader:
+                batch.append(decode_row(row))
+                if len(batch) >= batch_size:
+                    yield batch
+                    batch = []
+            if batch:
+                yield batch
+
+
+def extract(connection, query, catalog_entry, columns, stream_version,
+            time_extracted, config, batch_size):
+    '''Runs an UNLOAD of `query` and yields its rows as RecordBatches.
+
+    Part files are downloaded and decoded by `unload_workers` threads
+    feeding a bounded queue, so only a few batches are held in memory
+    however large the export is.'''
+    location = '{}/{}/{}/'.format(config['unload_location'].rstrip('/'),
+                                  catalog_entry.tap_stream_id,
+                                  stream_version)
+    store = object_store(location, config.get('unload_endpoint_url'))
+
+    with connection.cursor() as cursor:
+        LOGGER.info('Unloading {} to {}'.format(
+            catalog_entry.tap_stream_id, location))
+        cursor.execute(unload_statement(query, location,
+                                        config['unload_iam_role']))
+
+    manifest_url = location + 'manifest'
+    with store.open(manifest_url) as manifest:
+        parts = [entry['url'] for entry in
+                 json.loads(manifest.read().decode('utf-8'))['entries']]
+    LOGGER.info('Reading {} unloaded parts'.format(len(parts)))
+
+    decode_row = build_row_decoder(catalog_entry, columns)
+
+    def read(store, url):
+        return read_part(store, url, decode_row, batch_size)
+
+    workers = int(config.get('unload_workers', DEFAULT_UNLOAD_WORKERS))
+    parts_read = parallel.run_tasks(
+        [store] * min(workers, len(parts)), parts, read)
+    try:
+        for _, records in parts_read:
+            if records is not parallel.TASK_DONE:
+                yield RecordBatch(stream=catalog_entry.stream,
+                                  records=records,
+                                  version=stream_version,
+                                  time_extracted=time_extracted)
+    finally:
+        # The export is deleted whether or not it was read in full, once
+        # the workers reading it have stopped.
+        parts_read.close()
+        if config.get('unload_cleanup', True):
+            store.delete(parts + [manifest_url])
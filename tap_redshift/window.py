@@ -0,0 +1,97 @@
+# tap-redshift
+# Copyright 2018 data.world, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the
+# License.
+#
+# You may obtain a copy of the License at
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied. See the License for the specific language governing
+# permissions and limitations under the License.
+#
+# This product includes software developed at
+# data.world, Inc.(http://data.world/).
+import datetime
+
+import pendulum
+
+# Seconds of replication key values read by each query of a windowed sync.
+DEFAULT_WINDOW_SIZE = 86400
+
+
+def window_size(catalog_md, config, default=DEFAULT_WINDOW_SIZE):
+    '''Returns the width of a window: seconds for date and time replication
+    keys, key values for numeric ones.'''
+    size = catalog_md.get((), {}).get('incremental-window')
+    if size is None:
+        size = config.get('incremental_window', default)
+    if size is not None and float(size) <= 0:
+        raise Exception('incremental-window must be greater than 0, got '
+                        '{}'.format(size))
+    return size
+
+
+def parse_bound(value, column_schema):
+    '''Returns a probed bound as a value windows can be computed from.
+
+    Connections with the tap's typecasters return timestamps and dates as
+    the strings they are emitted as, rather than as datetimes.'''
+    if isinstance(value, str) and column_schema.format in ('date-time',
+                                                           'date'):
+        parsed = pendulum.parse(value)
+        return parsed.date() if column_schema.format == 'date' else parsed
+    return value
+
+
+def advance(lower, size):
+    '''Returns the end of the window starting at lower.'''
+    if isinstance(lower, datetime.datetime):
+        end = lower + datetime.timedelta(seconds=float(size))
+    elif isinstance(lower, datetime.date):
+        end = lower + datetime.timedelta(days=max(1, int(size) // 86400))
+    else:
+        end = lower + type(lower)(size)
+    # A window that does not move past lower would be read forever
+    if end <= lower:
+        raise Exception('incremental-window {} is too small to advance a '
+                        'window from {}'.format(size, lower))
+    return end
+
+
+def window_filter(column, lower, end, upper):
+    '''Returns the SQL predicate and params restricting rows to the window
+    [lower, end), or to [lower, upper] for the window holding upper.'''
+    params = {'window_lower': lower}
+    if end > upper:
+        clause = '"{0}" >= %(window_lower)s AND "{0}" <= %(window_upper)s'
+        params['window_upper'] = upper
+    else:
+        clause = '"{0}" >= %(window_lower)s AND "{0}" < %(window_upper)s'
+        params['window_upper'] = end
+    return clause.format(column), params
+
+
+def value_key(value):
+    '''Returns a key ordering replication key values of records.
+
+    Records hold timestamps as isoformat strings, which leave out the
+    microseconds when they are zero, so those are padded back in for the
+    strings to compare in time order.'''
+    if isinstance(value, str) and value.endswith('Z') and '.' not in value:
+        return value[:-1] + '.000000Z'
+    return value
+
+
+def batch_max(batch, column, current=None):
+    '''Returns the largest value of column in a batch of records read in no
+    particular order, or current when that is larger.'''
+    values = [record[column] for record in batch.records
+              if record.get(column) is not None]
+    if current is not None:
+        values.append(current)
+    return max(values, key=value_key) if values else None
@@ -0,0 +1,66 @@
+# tap-redshift
+# Copyright 2018 data.world, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the
+# License.
+#
+# You may obtain a copy of the License at
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied. See the License for the specific language governing
+# permissions and limitations under the License.
+#
+# This product includes software developed at
+# data.world, Inc.(http://data.world/).
+"""STATE message cost for a state holding many streams' bookmarks.
+
+Run with: python tests/benchmarks/bench_checkpoint.py [streams] [checkpoints]
+
+Compares deep copying the whole state for every STATE message against
+checkpoint.snapshot, which only copies the bookmark of the stream being
+synced.
+"""
+
+import copy
+import sys
+import time
+
+from tap_redshift import checkpoint
+
+
+def make_state(count):
+    return {'currently_syncing': 'bench.public.table_00000',
+            'bookmarks': {
+                'bench.public.table_{:05}'.format(i): {
+                    'version': 1516304171710,
+                    'replication_key': 'updated_at',
+                    'replication_key_value': '2018-01-01T00:00:00Z',
+                    'partitions': [{'lower': j, 'upper': j + 1,
+                                    'done': True} for j in range(4)]}
+                for i in range(count)}}
+
+
+def measure(name, fn, state, checkpoints):
+    started = time.perf_counter()
+    for _ in range(checkpoints):
+        fn(state)
+    elapsed = time.perf_counter() - started
+    print('{:<10} {:>10,.0f} checkpoints/sec'.format(
+        name, checkpoints / elapsed))
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 500
+    checkpoints = int(sys.argv[2]) if len(sys.argv) > 2 else 1000
+    state = make_state(count)
+    measure('deepcopy', copy.deepcopy, state, checkpoints)
+    measure('snapshot', lambda s: checkpoint.snapshot(
+        s, 'bench.public.table_00000'), state, checkpoints)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,87 @@
+# tap-redshift
+# Copyright 2018 data.world, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the
+# License.
+#
+# You may obtain a copy of the License at
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied. See the License for the specific language governing
+# permissions and limitations under the License.
+#
+# This product includes software developed at
+# data.world, Inc.(http://data.world/).
+"""Columns/sec of building catalog entries during discovery.
+
+Run with: python tests/benchmarks/bench_columns.py [tables] [width]
+
+Compares build_entry, which classifies each column once, with the
+previous approach of deriving the schema and the metadata separately,
+calling schema_for_column twice and metadata.write for every attribute.
+"""
+
+import sys
+import time
+
+from singer import metadata
+from singer.schema import Schema
+
+import tap_redshift
+
+COLUMN_TYPES = ['int8', 'varchar', 'numeric', 'float8', 'bool', 'timestamp',
+                'timestamptz', 'date', 'bpchar', 'super']
+
+
+def make_columns(width):
+    return [{'pos': pos, 'name': 'col{}'.format(pos),
+             'type': COLUMN_TYPES[pos % len(COLUMN_TYPES)],
+             'nullable': 'YES' if pos % 2 else 'NO'}
+            for pos in range(1, width + 1)]
+
+
+def two_pass(cols):
+    schema = Schema(type='object', properties={
+        c['name']: tap_redshift.schema_for_column(c) for c in cols})
+    mdata = metadata.new()
+    mdata = metadata.write(mdata, (), 'selected-by-default', False)
+    for c in cols:
+        column_schema = tap_redshift.schema_for_column(c)
+        breadcrumb = ('properties', c['name'])
+        mdata = metadata.write(mdata, breadcrumb, 'selected-by-default',
+                               column_schema.inclusion != 'unsupported')
+        mdata = metadata.write(mdata, breadcrumb, 'sql-datatype',
+                               c['type'].lower())
+        mdata = metadata.write(mdata, breadcrumb, 'inclusion',
+                               column_schema.inclusion)
+    return schema, metadata.to_list(mdata)
+
+
+def single_pass(cols):
+    return tap_redshift.build_entry('bench', 'public', 'table', cols, [],
+                                    False, None)
+
+
+def measure(name, fn, tables, cols):
+    started = time.perf_counter()
+    for _ in range(tables):
+        fn(cols)
+    elapsed = time.perf_counter() - started
+    print('{:<12} {:>12,.0f} columns/sec'.format(
+        name, tables * len(cols) / elapsed))
+
+
+def main():
+    tables = int(sys.argv[1]) if len(sys.argv) > 1 else 1000
+    width = int(sys.argv[2]) if len(sys.argv) > 2 else 200
+    cols = make_columns(width)
+    measure('two-pass', two_pass, tables, cols)
+    measure('single-pass', single_pass, tables, cols)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,130 @@
+# tap-redshift
+# Copyright 2018 data.world, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the
+# License.
+#
+# You may obtain a copy of the License at
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied. See the License for the specific language governing
+# permissions and limitations under the License.
+#
+# This product includes software developed at
+# data.world, Inc.(http://data.world/).
+"""Discovery time over the pg_catalog and INFORMATION_SCHEMA paths.
+
+Run with: python tests/benchmarks/bench_discovery.py [tables] [config.json]
+
+Without a config the query results are synthesised in memory, which times
+only the tap's side of discovery. With one, a tap_redshift_bench schema of
+that many ten column tables is created in the configured database (if it
+does not exist yet) and discovered from there.
+"""
+
+import sys
+import time
+
+from singer import utils
+
+import tap_redshift
+
+BENCH_SCHEMA = 'tap_redshift_bench'
+
+COLUMN_TYPES = ['int8', 'varchar', 'numeric', 'float8', 'bool', 'timestamp',
+                'timestamptz', 'date', 'varchar', 'int4']
+
+
+class SyntheticCursor(object):
+    def __init__(self, tables, name=None):
+        self.tables = tables
+        self.name = name
+        self.itersize = 2000
+        self.rows = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        pass
+
+    def execute(self, query, params=None):
+        tables = ['table_{:05}'.format(i) for i in range(self.tables)]
+        columns = list(enumerate(COLUMN_TYPES, 1))
+        if 'pg_catalog' in query:
+            self.rows = [(BENCH_SCHEMA, t, 'r', pos, 'col{}'.format(pos),
+                          sql_type, pos == 1, [1])
+                         for t in tables for pos, sql_type in columns]
+        elif 'key_column_usage' in query:
+            self.rows = [(t, 'col1') for t in tables]
+        elif 'Columns' in query:
+            self.rows = [(t, pos, 'col{}'.format(pos), sql_type,
+                          'NO' if pos == 1 else 'YES')
+                         for t in tables for pos, sql_type in columns]
+        else:
+            self.rows = [(t, 'BASE TABLE') for t in tables]
+
+    def __iter__(self):
+        # Hands rows over itersize at a time, as a named cursor would
+        for start in range(0, len(self.rows), self.itersize):
+            for row in self.rows[start:start + self.itersize]:
+                yield row
+
+    def fetchall(self):
+        return self.rows
+
+    def close(self):
+        pass
+
+
+class SyntheticConnection(object):
+    def __init__(self, tables):
+        self.tables = tables
+
+    def cursor(self, name=None):
+        return SyntheticCursor(self.tables, name=name)
+
+    def get_dsn_parameters(self):
+        return {'dbname': 'bench'}
+
+
+def create_schema(conn, tables):
+    with conn.cursor() as cursor:
+        cursor.execute('CREATE SCHEMA IF NOT EXISTS {}'.format(BENCH_SCHEMA))
+        columns = ', '.join(
+            'col{} {}{}'.format(pos, sql_type,
+                                ' PRIMARY KEY' if pos == 1 else '')
+            for pos, sql_type in enumerate(COLUMN_TYPES, 1))
+        for i in range(tables):
+            cursor.execute('CREATE TABLE IF NOT EXISTS {}.table_{:05} ({})'
+                           .format(BENCH_SCHEMA, i, columns))
+    conn.commit()
+
+
+def measure(method, conn, db_schema):
+    tap_redshift.CONFIG['discovery_method'] = method
+    started = time.perf_counter()
+    catalog = tap_redshift.discover_catalog(conn, db_schema)
+    elapsed = time.perf_counter() - started
+    print('{:<20} {:>8.2f}s {:>8,} streams'.format(
+        method, elapsed, len(catalog.streams)))
+
+
+def main():
+    tables = int(sys.argv[1]) if len(sys.argv) > 1 else 10000
+    if len(sys.argv) > 2:
+        tap_redshift.CONFIG.update(utils.load_json(sys.argv[2]))
+        conn = tap_redshift.open_connection(tap_redshift.CONFIG)
+        create_schema(conn, tables)
+    else:
+        conn = SyntheticConnection(tables)
+    for method in ('pg_catalog', 'information_schema'):
+        measure(method, conn, BENCH_SCHEMA)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,105 @@
+# tap-redshift
+# Copyright 2018 data.world, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the
+# License.
+#
+# You may obtain a copy of the License at
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied. See the License for the specific language governing
+# permissions and limitations under the License.
+#
+# This product includes software developed at
+# data.world, Inc.(http://data.world/).
+"""Catalog resolution time for large catalogs.
+
+Run with: python tests/benchmarks/bench_resolve.py [streams]
+
+Compares resolve_catalog against the previous approach of scanning the
+discovered catalog for every selected stream and parsing each stream's
+metadata in every function that reads it.
+"""
+
+import sys
+import time
+
+from singer import metadata
+from singer.catalog import Catalog, CatalogEntry
+from singer.schema import Schema
+
+from tap_redshift import resolve
+
+COLUMNS = ['col{}'.format(i) for i in range(10)]
+
+
+def make_catalog(count, selected):
+    entries = []
+    for i in range(count):
+        mdata = [{'breadcrumb': (),
+                  'metadata': {'selected': selected,
+                               'selected-by-default': False}}]
+        mdata.extend({'breadcrumb': ('properties', column),
+                      'metadata': {'selected-by-default': True,
+                                   'inclusion': 'available'}}
+                     for column in COLUMNS)
+        entries.append(CatalogEntry(
+            tap_stream_id='bench.public.table_{:05}'.format(i),
+            stream='table_{:05}'.format(i),
+            table='public.table_{:05}'.format(i),
+            schema=Schema(type='object', properties={
+                column: Schema(type=['null', 'string'],
+                               inclusion='available')
+                for column in COLUMNS}),
+            metadata=mdata))
+    return Catalog(entries)
+
+
+def linear(discovered, catalog):
+    '''Resolution as it was: get_stream scans, metadata parsed per call.'''
+    def is_selected(entry):
+        return metadata.get(metadata.to_map(entry.metadata), (), 'selected')
+
+    def selected_properties(entry):
+        mdata = metadata.to_map(entry.metadata)
+        return {k for k in entry.schema.properties
+                if metadata.get(mdata, ('properties', k), 'selected') or
+                metadata.get(mdata, ('properties', k),
+                             'selected-by-default')}
+
+    resolved = []
+    for entry in filter(is_selected, catalog.streams):
+        discovered_entry = discovered.get_stream(entry.tap_stream_id)
+        resolve.desired_columns(selected_properties(entry),
+                                discovered_entry.schema)
+        metadata.to_map(entry.metadata)
+        resolved.append(discovered_entry)
+    return resolved
+
+
+def indexed(discovered, catalog):
+    return resolve.resolve_catalog(discovered, catalog, {}).streams
+
+
+def measure(name, fn, discovered, catalog):
+    started = time.perf_counter()
+    streams = fn(discovered, catalog)
+    elapsed = time.perf_counter() - started
+    print('{:<10} {:>8.2f}s {:>8,} streams'.format(
+        name, elapsed, len(streams)))
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 10000
+    discovered = make_catalog(count, False)
+    catalog = make_catalog(count, True)
+    measure('linear', linear, discovered, catalog)
+    measure('indexed', indexed, discovered, catalog)
+
+
+if __name__ == '__main__':
+    main()
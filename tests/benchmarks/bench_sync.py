@@ -0,0 +1,136 @@
+# tap-redshift
+# Copyright 2018 data.world, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the
+# License.
+#
+# You may obtain a copy of the License at
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied. See the License for the specific language governing
+# permissions and limitations under the License.
+#
+# This product includes software developed at
+# data.world, Inc.(http://data.world/).
+"""Rows/sec of the batched sync pipeline against the per-row path.
+
+Run with: python tests/benchmarks/bench_sync.py [rows] [batch size] [width]
+
+width is the number of columns, in multiples of ten.
+"""
+
+import datetime
+import io
+import sys
+import time
+from decimal import Decimal
+
+import simplejson as json
+import singer
+from singer import utils
+from singer.catalog import CatalogEntry
+from singer.schema import Schema
+
+import tap_redshift
+from tap_redshift.convert import build_row_converter
+from tap_redshift.encoders import OrjsonEncoder, coerce_datetime
+from tap_redshift.messages import (DEFAULT_ENCODER, RecordBatch,
+                                   format_message)
+
+COLUMN_TYPES = [('id', 'int8'), ('name', 'varchar'), ('amount', 'numeric'),
+                ('ratio', 'float8'), ('active', 'bool'),
+                ('created_at', 'timestamp'), ('updated_at', 'timestamp'),
+                ('notes', 'varchar'), ('region', 'varchar'),
+                ('quantity', 'int4')]
+
+
+def make_entry(width):
+    columns = [('{}_{}'.format(name, i), sql_type)
+               for i in range(width // len(COLUMN_TYPES))
+               for name, sql_type in COLUMN_TYPES]
+    return CatalogEntry(
+        stream='bench',
+        schema=Schema(type='object', properties={
+            name: tap_redshift.schema_for_column(
+                {'type': sql_type, 'nullable': 'YES'})
+            for name, sql_type in columns}),
+        metadata=[{'breadcrumb': ('properties', name),
+                   'metadata': {'sql-datatype': sql_type}}
+                  for name, sql_type in columns])
+
+
+def make_rows(count, width):
+    created = datetime.datetime(2018, 1, 1, 12, 30)
+    return [(i, 'name {}'.format(i), Decimal('{}.25'.format(i)), i / 7.0,
+             i % 2 == 0, created, created, None, 'eu-west-1', i * 3) *
+            (width // len(COLUMN_TYPES))
+            for i in range(count)]
+
+
+def row_to_record(catalog_entry, version, row, columns, time_extracted):
+    '''The per-row conversion the tap used before rows were batched.'''
+    row_to_persist = ()
+    for elem in row:
+        if isinstance(elem, datetime.datetime):
+            elem = elem.isoformat('T') + 'Z'
+        elif isinstance(elem, datetime.date):
+            elem = elem.isoformat()
+        row_to_persist += (elem,)
+    return singer.RecordMessage(
+        stream=catalog_entry.stream,
+        record=dict(zip(columns, row_to_persist)),
+        version=version,
+        time_extracted=time_extracted)
+
+
+def per_row(entry, rows, out):
+    '''The fetchone/row_to_record/flush-per-message path.'''
+    columns = list(entry.schema.properties)
+    time_extracted = utils.now()
+    for row in rows:
+        message = row_to_record(
+            entry, 1, row, columns, time_extracted)
+        out.write((json.dumps(message.asdict(), default=coerce_datetime,
+                              use_decimal=True) + '\n').encode('utf-8'))
+        out.flush()
+
+
+def batched(entry, rows, out, batch_size, encoder=DEFAULT_ENCODER):
+    convert_row = build_row_converter(entry, list(entry.schema.properties))
+    time_extracted = utils.now()
+    for start in range(0, len(rows), batch_size):
+        batch = RecordBatch(
+            'bench',
+            list(map(convert_row, rows[start:start + batch_size])),
+            version=1,
+            time_extracted=time_extracted)
+        out.write(format_message(batch, encoder))
+        out.flush()
+
+
+def measure(name, fn, entry, rows, *args):
+    out = io.BytesIO()
+    started = time.perf_counter()
+    fn(entry, rows, out, *args)
+    elapsed = time.perf_counter() - started
+    print('{:<10} {:>12,.0f} rows/sec'.format(name, len(rows) / elapsed))
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    batch_size = int(sys.argv[2]) if len(sys.argv) > 2 else 1000
+    width = int(sys.argv[3]) if len(sys.argv) > 3 else 10
+    entry = make_entry(width)
+    rows = make_rows(count, width)
+    measure('per-row', per_row, entry, rows)
+    measure('batched', batched, entry, rows, batch_size)
+    if OrjsonEncoder.available():
+        measure('orjson', batched, entry, rows, batch_size, OrjsonEncoder())
+
+
+if __name__ == '__main__':
+    main()
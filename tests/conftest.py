@@ -16,9 +16,15 @@
 #
 # This product includes software developed at
 # data.world, Inc.(http://data.world/).
+import datetime
+from decimal import Decimal
+
 import pytest
 from doublex import Mock, ANY_ARG, Stub
-from singer.catalog import Catalog
+from singer.catalog import Catalog, CatalogEntry
+from singer.schema import Schema
+
+import tap_redshift
 
 # TODO Smarter and less verbose fixtures
 # TODO Possibly move from conftest.py if not shared
@@ -112,11 +118,13 @@ def expected_catalog_from_db():
              {'breadcrumb': (),
               'metadata': {'selected-by-default': False,
                            'valid-replication-keys': [
-                               'col3', 'col4', 'col5'],
+                               'col1', 'col3', 'col4', 'col5'],
                            'table-key-properties': ['col1'],
                            'is-view': False,
                            'schema-name': 'table1',
-                           'database-name': 'test-db'}},
+                           'database-name': 'test-db',
+                           'column-signature':
+                               'd7d4506a504b2b0ee70a499f569561ed45ba7b27'}},
              {'breadcrumb': ('properties', 'col1'),
               'metadata': {'selected-by-default': True,
                            'sql-datatype': 'int2',
@@ -156,14 +164,13 @@ def expected_catalog_from_db():
          'metadata': [
              {'breadcrumb': (),
               'metadata': {'selected-by-default': False,
-                           'forced-replication-method': {
-                            'replication-method': 'FULL_TABLE',
-                            'reason': 'No replication keys found from table'
-                           },
+                           'valid-replication-keys': ['col1'],
                            'table-key-properties': ['col1', 'col2'],
                            'is-view': False,
                            'schema-name': 'table2',
-                           'database-name': 'test-db'}},
+                           'database-name': 'test-db',
+                           'column-signature':
+                               '487d9dad34f76f6b7e81f3fb45deffceb99cc3f5'}},
              {'breadcrumb': ('properties', 'col1'),
               'metadata': {'selected-by-default': True,
                            'sql-datatype': 'int4',
@@ -194,7 +201,9 @@ def expected_catalog_from_db():
                            'view-key-properties': [],
                            'is-view': True,
                            'schema-name': 'view1',
-                           'database-name': 'test-db'}},
+                           'database-name': 'test-db',
+                           'column-signature':
+                               '2d8d69be661845485496c633303104ff09754801'}},
              {'breadcrumb': ('properties', 'col1'),
               'metadata': {'selected-by-default': True,
                            'sql-datatype': 'varchar',
@@ -931,3 +940,159 @@ def selectable_properties_param(request):
         'category': {'id', 'name'}})])
 def resolvable_catalog_param(request):
     return request.param
+
+
+class FakeCursor(object):
+    """psycopg2 cursor stand-in serving rows from a FakeConnection."""
+
+    def __init__(self, connection, name=None):
+        self.connection = connection
+        self.name = name
+        self.itersize = 2000
+        self.rows = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def __iter__(self):
+        while self.rows:
+            yield self.rows.pop(0)
+
+    def mogrify(self, query, params=None):
+        return query
+
+    def execute(self, query, params=None):
+        self.connection.queries.append((query, params))
+        self.rows = list(self.connection.rows_for(query, params))
+
+    def fetchone(self):
+        return self.rows.pop(0) if self.rows else None
+
+    def fetchmany(self, size=1):
+        batch, self.rows = self.rows[:size], self.rows[size:]
+        return batch
+
+    def fetchall(self):
+        return self.fetchmany(len(self.rows))
+
+    def close(self):
+        pass
+
+
+class FakeConnection(object):
+    """psycopg2 connection stand-in.
+
+    results - either a list of rows returned for every query, or a callable
+              taking (query, params) and returning the rows for it
+    """
+
+    def __init__(self, results, dbname='test-db'):
+        self.results = results
+        self.dbname = dbname
+        self.queries = []
+        self.cursors = []
+
+    def rows_for(self, query, params):
+        if callable(self.results):
+            return self.results(query, params)
+        return self.results
+
+    def cursor(self, name=None):
+        cursor = FakeCursor(self, name=name)
+        self.cursors.append(cursor)
+        return cursor
+
+    def get_dsn_parameters(self):
+        return {'dbname': self.dbname}
+
+    def rollback(self):
+        self.queries.append(('ROLLBACK', None))
+
+    def close(self):
+        pass
+
+
+@pytest.fixture()
+def fake_connection():
+    return FakeConnection
+
+
+@pytest.fixture()
+def config():
+    tap_redshift.CONFIG.clear()
+    tap_redshift.CONFIG.update({'start_date': '2018-01-01T00:00:00Z'})
+    yield tap_redshift.CONFIG
+    tap_redshift.CONFIG.clear()
+
+
+@pytest.fixture()
+def sync_rows():
+    return [
+        (1, Decimal('10.50'), datetime.datetime(2018, 1, 1, 10, 0, 0)),
+        (2, Decimal('0.25'), datetime.datetime(2018, 1, 2, 11, 30, 0)),
+        (3, None, datetime.datetime(2018, 1, 3, 12, 45, 15))]
+
+
+@pytest.fixture()
+def sync_conn(sync_rows):
+    return FakeConnection(sync_rows)
+
+
+def sync_entry(replication_key=None, table='orders'):
+    mdata = [
+        {'breadcrumb': (),
+         'metadata': {'selected': True,
+                      'table-key-properties': ['id'],
+                      'is-view': False}},
+        {'breadcrumb': ('properties', 'id'),
+         'metadata': {'sql-datatype': 'int4'}},
+        {'breadcrumb': ('properties', 'amount'),
+         'metadata': {'sql-datatype': 'numeric'}},
+        {'breadcrumb': ('properties', 'created_at'),
+         'metadata': {'sql-datatype': 'timestamp'}}]
+    if replication_key:
+        mdata[0]['metadata'].update({'replication-method': 'INCREMENTAL',
+                                     'replication-key': replication_key})
+    return CatalogEntry(
+        tap_stream_id='test-db.public.{}'.format(table),
+        stream=table,
+        table='public.{}'.format(table),
+        database='test-db',
+        schema=Schema(type='object', properties={
+            'id': Schema(type='integer', inclusion='available'),
+            'amount': Schema(type=['null', 'number'],
+                             inclusion='available'),
+            'created_at': Schema(type=['null', 'string'],
+                                 format='date-time',
+                                 inclusion='available')}),
+        metadata=mdata)
+
+
+@pytest.fixture()
+def full_table_entry():
+    return sync_entry()
+
+
+@pytest.fixture()
+def bool_column_entry():
+    entry = sync_entry()
+    entry.schema.properties['active'] = Schema(type=['null', 'boolean'],
+                                               inclusion='available')
+    entry.metadata.append({'breadcrumb': ('properties', 'active'),
+                           'metadata': {'sql-datatype': 'bool'}})
+    return entry
+
+
+@pytest.fixture()
+def incremental_entry():
+    return sync_entry(replication_key='created_at')
+
+
+@pytest.fixture()
+def parallel_entries():
+    return [sync_entry('created_at', table='orders'),
+            sync_entry(table='refunds'),
+            sync_entry('created_at', table='payments')]
@@ -0,0 +1,172 @@
+# tap-redshift
+# Copyright 2018 data.world, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the
+# License.
+#
+# You may obtain a copy of the License at
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied. See the License for the specific language governing
+# permissions and limitations under the License.
+#
+# This product includes software developed at
+# data.world, Inc.(http://data.world/).
+
+import copy
+
+from doublex import assert_that
+from hamcrest import equal_to, has_key, is_not, none
+from singer import metadata
+
+import tap_redshift
+from tap_redshift.cache import DiscoveryCache
+
+
+def structure(columns):
+    def results(query, params):
+        if 'pg_attribute' in query:
+            return columns
+        return [('public', 'orders', [1])]
+    return results
+
+
+ORDERS = [('public', 'orders', 'r', 1, 'id', 23, -1, True)]
+
+
+class TestDiscoveryCache(object):
+    def test_fingerprint_changes_with_columns(self, fake_connection,
+                                              tmpdir):
+        cache = DiscoveryCache(str(tmpdir), 'db', 'public', '1.0')
+        before = cache.fingerprint(fake_connection(structure(ORDERS)))
+        after = cache.fingerprint(fake_connection(structure(
+            ORDERS + [('public', 'orders', 'r', 2, 'amount', 1700, 1179658,
+                       False)])))
+        assert_that(before, is_not(equal_to(after)))
+
+    def test_fingerprint_changes_with_version(self, fake_connection,
+                                              tmpdir):
+        conn = fake_connection(structure(ORDERS))
+        assert_that(
+            DiscoveryCache(str(tmpdir), 'db', 'public', '1.0')
+            .fingerprint(conn),
+            is_not(equal_to(DiscoveryCache(str(tmpdir), 'db', 'public', '2.0')
+                            .fingerprint(conn))))
+
+    def test_read_round_trips_saved_catalog(self, tmpdir,
+                                            expected_catalog_from_db):
+        cache = DiscoveryCache(str(tmpdir.join('cache')), 'db', 'public',
+                               '1.0')
+        cache.save('abc', expected_catalog_from_db)
+        assert_that(cache.read(),
+                    equal_to(('abc', expected_catalog_from_db)))
+
+    def test_read_without_cache_file(self, tmpdir):
+        cache = DiscoveryCache(str(tmpdir), 'db', 'public', '1.0')
+        assert_that(cache.read(), equal_to((None, None)))
+
+
+class TestGetDiscoveredCatalog(object):
+    def test_discovers_once_while_schema_unchanged(
+            self, config, fake_connection, monkeypatch, tmpdir,
+            expected_catalog_from_db):
+        discovered = []
+
+        def discover_catalog(conn, db_schema, previous=None):
+            discovered.append(db_schema)
+            return expected_catalog_from_db
+
+        monkeypatch.setattr(tap_redshift, 'discover_catalog',
+                            discover_catalog)
+        config['discovery_cache_dir'] = str(tmpdir)
+        conn = fake_connection(structure(ORDERS))
+
+        tap_redshift.get_discovered_catalog(conn, 'public')
+        catalog = tap_redshift.get_discovered_catalog(conn, 'public')
+        assert_that(discovered, equal_to([['public']]))
+        assert_that(catalog, equal_to(expected_catalog_from_db))
+
+        changed = fake_connection(structure(
+            ORDERS + [('public', 'orders', 'r', 2, 'amount', 1700, 1179658,
+                       False)]))
+        tap_redshift.get_discovered_catalog(changed, 'public')
+        assert_that(discovered, equal_to([['public'], ['public']]))
+
+    def test_without_cache_dir_always_discovers(
+            self, config, fake_connection, monkeypatch):
+        discovered = []
+        monkeypatch.setattr(
+            tap_redshift, 'discover_catalog',
+            lambda conn, db_schema, previous=None: discovered.append(1))
+        conn = fake_connection([])
+        tap_redshift.get_discovered_catalog(conn, 'public')
+        tap_redshift.get_discovered_catalog(conn, 'public')
+        assert_that(discovered, equal_to([1, 1]))
+        assert_that(conn.queries, equal_to([]))
+
+    def test_rediscovers_against_cached_catalog(
+            self, config, fake_connection, monkeypatch, tmpdir,
+            expected_catalog_from_db):
+        previous = []
+
+        def discover_catalog(conn, db_schema, previous_catalog=None):
+            previous.append(previous_catalog)
+            return expected_catalog_from_db
+
+        monkeypatch.setattr(tap_redshift, 'discover_catalog',
+                            discover_catalog)
+        config['discovery_cache_dir'] = str(tmpdir)
+        tap_redshift.get_discovered_catalog(
+            fake_connection(structure(ORDERS)), 'public')
+        tap_redshift.get_discovered_catalog(
+            fake_connection(structure(ORDERS[:0])), 'public')
+        assert_that(previous[0], none())
+        assert_that(previous[1], equal_to(expected_catalog_from_db))
+
+    def test_passed_catalog_is_refreshed_from_cache(
+            self, config, fake_connection, monkeypatch, tmpdir,
+            expected_catalog_from_db):
+        monkeypatch.setattr(
+            tap_redshift, 'discover_catalog',
+            lambda conn, db_schema, previous=None: expected_catalog_from_db)
+        config['discovery_cache_dir'] = str(tmpdir)
+        conn = fake_connection(structure(ORDERS))
+        tap_redshift.get_discovered_catalog(conn, 'public')
+
+        previous = copy.deepcopy(expected_catalog_from_db)
+        for entry in previous.streams[:2]:
+            entry.metadata[0]['metadata'].update({
+                'selected': True, 'replication-method': 'FULL_TABLE'})
+        previous.streams[1].metadata[0]['metadata'][
+            'column-signature'] = 'stale'
+        catalog = tap_redshift.get_discovered_catalog(conn, 'public',
+                                                      previous)
+
+        table1, table2, view1 = catalog.streams
+        assert_that(table1, equal_to(previous.streams[0]))
+        table2_md = metadata.to_map(table2.metadata)[()]
+        assert_that(table2_md['selected'], equal_to(True))
+        assert_that(table2_md['column-signature'], equal_to(
+            metadata.to_map(expected_catalog_from_db.streams[1].metadata)[()][
+                'column-signature']))
+        assert_that(metadata.to_map(view1.metadata)[()],
+                    is_not(has_key('selected')))
+
+    def test_cached_entries_are_renamed_for_the_configured_schemas(
+            self, config, fake_connection, monkeypatch, tmpdir,
+            expected_catalog_from_db):
+        monkeypatch.setattr(
+            tap_redshift, 'discover_catalog',
+            lambda conn, db_schema, previous=None: expected_catalog_from_db)
+        config['discovery_cache_dir'] = str(tmpdir)
+        conn = fake_connection(structure(ORDERS))
+        tap_redshift.get_discovered_catalog(conn, 'public')
+
+        config['dbname'] = ['test-db', 'other-db']
+        catalog = tap_redshift.get_discovered_catalog(conn, 'public')
+        assert_that([entry.stream for entry in catalog.streams], equal_to(
+            ['test-db-table1', 'test-db-table2', 'test-db-view1']))
@@ -0,0 +1,100 @@
+# tap-redshift
+# Copyright 2018 data.world, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the
+# License.
+#
+# You may obtain a copy of the License at
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied. See the License for the specific language governing
+# permissions and limitations under the License.
+#
+# This product includes software developed at
+# data.world, Inc.(http://data.world/).
+import singer
+from doublex import assert_that
+from hamcrest import equal_to, is_, is_not, none
+
+import tap_redshift
+from tap_redshift import checkpoint
+from tap_redshift.messages import RecordBatch
+
+
+def batch(count):
+    return RecordBatch('orders', [{'id': i} for i in range(count)])
+
+
+class TestSnapshot(object):
+    def test_copies_only_the_stream_bookmark(self):
+        other = {'replication_key_value': 1}
+        state = {'currently_syncing': 'orders',
+                 'bookmarks': {'orders': {'version': 1}, 'other': other}}
+        copied = checkpoint.snapshot(state, 'orders')
+
+        state['bookmarks']['orders']['version'] = 2
+        state['bookmarks']['new'] = {}
+        assert_that(copied, equal_to({
+            'currently_syncing': 'orders',
+            'bookmarks': {'orders': {'version': 1}, 'other': other}}))
+        assert_that(copied['bookmarks']['other'], is_(other))
+
+
+class TestCheckpointer(object):
+    def test_checkpoints_by_rows(self):
+        state = {}
+        checkpoints = checkpoint.Checkpointer(state, 'orders', rows=3)
+
+        assert_that(checkpoints.record(batch(2), replication_key_value=2),
+                    none())
+        assert_that(state, equal_to({}))
+        message = checkpoints.record(batch(2), replication_key_value=4)
+        assert_that(message.value, equal_to({'bookmarks': {
+            'orders': {'replication_key_value': 4}}}))
+        assert_that(checkpoints.record(batch(2)), none())
+
+    def test_checkpoints_by_bytes(self):
+        checkpoints = checkpoint.Checkpointer(
+            {}, 'orders', rows=None, bytes_emitted=100)
+        assert_that(checkpoints.record(batch(1)), none())
+        assert_that(checkpoints.record(batch(5)), is_not(none()))
+
+    def test_checkpoints_by_time(self, monkeypatch):
+        now = [100.0]
+        monkeypatch.setattr(checkpoint.time, 'monotonic', lambda: now[0])
+        checkpoints = checkpoint.Checkpointer(
+            {}, 'orders', rows=None, seconds=30)
+        assert_that(checkpoints.record(batch(1)), none())
+        now[0] += 30
+        assert_that(checkpoints.record(batch(1)), is_not(none()))
+
+    def test_from_config(self):
+        checkpoints = checkpoint.Checkpointer.from_config(
+            {}, 'orders', {'checkpoint_rows': 0, 'checkpoint_seconds': '5'})
+        assert_that((checkpoints.rows, checkpoints.seconds,
+                     checkpoints.bytes_emitted), equal_to((None, 5.0, None)))
+
+    def test_flush_writes_pending_bookmark(self):
+        state = {}
+        checkpoints = checkpoint.Checkpointer(state, 'orders')
+        checkpoints.record(batch(1), replication_key_value=1)
+        assert_that(checkpoints.flush(), equal_to({'bookmarks': {
+            'orders': {'replication_key_value': 1}}}))
+
+
+class TestSyncCheckpoints(object):
+    def test_state_every_checkpoint_rows(self, config, sync_conn,
+                                         incremental_entry):
+        config.update({'itersize': 1, 'checkpoint_rows': 2})
+        messages = list(tap_redshift.sync_table(
+            sync_conn, incremental_entry, {}))
+
+        values = [singer.get_bookmark(m.value, incremental_entry.tap_stream_id,
+                                      'replication_key_value')
+                  for m in messages if isinstance(m, singer.StateMessage)]
+        assert_that(values, equal_to(['2018-01-02T11:30:00Z',
+                                      '2018-01-03T12:45:15Z']))
@@ -0,0 +1,94 @@
+# tap-redshift
+# Copyright 2018 data.world, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the
+# License.
+#
+# You may obtain a copy of the License at
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied. See the License for the specific language governing
+# permissions and limitations under the License.
+#
+# This product includes software developed at
+# data.world, Inc.(http://data.world/).
+
+import singer
+from doublex import assert_that
+from hamcrest import equal_to, has_length, same_instance
+
+import tap_redshift
+from tap_redshift.connections import ConnectionPool, config_list
+
+
+class TestConfigList(object):
+    def test_single_value(self):
+        assert_that(config_list('public'), equal_to(['public']))
+
+    def test_list(self):
+        assert_that(config_list(['public', 'sales']),
+                    equal_to(['public', 'sales']))
+
+
+class TestConnectionPool(object):
+    def test_released_connections_are_reused(self, fake_connection):
+        opened = []
+
+        def open_connection(dbname):
+            opened.append(fake_connection([], dbname=dbname))
+            return opened[-1]
+
+        first = fake_connection([], dbname='db1')
+        pool = ConnectionPool(open_connection, [first])
+
+        assert_that(pool.acquire('db1'), same_instance(first))
+        second = pool.acquire('db1')
+        other = pool.acquire('db2')
+        pool.release(second)
+        assert_that(pool.acquire('db1'), same_instance(second))
+        assert_that([c.dbname for c in opened], equal_to(['db1', 'db2']))
+        assert_that(other.dbname, equal_to('db2'))
+
+
+class TestMultipleDatabases(object):
+    def test_streams_sync_over_their_database(
+            self, config, monkeypatch, fake_connection, sync_rows,
+            parallel_entries):
+        config.update({'dbname': ['test-db', 'other-db'],
+                       'plan_extraction': False})
+        orders, refunds, payments = parallel_entries
+        refunds.tap_stream_id = 'other-db.public.refunds'
+        connections = {'test-db': fake_connection(sync_rows)}
+
+        def open_connection(config, dbname=None):
+            connections[dbname] = fake_connection(sync_rows, dbname=dbname)
+            return connections[dbname]
+
+        def discover_catalog(conn, db_schemas, previous=None):
+            return singer.catalog.Catalog(
+                [entry for entry in parallel_entries
+                 if entry.tap_stream_id.startswith(conn.dbname)])
+
+        monkeypatch.setattr(tap_redshift, 'open_connection', open_connection)
+        monkeypatch.setattr(tap_redshift, 'discover_catalog',
+                            discover_catalog)
+        monkeypatch.setattr(tap_redshift.resolve, 'resolve_catalog',
+                            lambda discovered, catalog, state: discovered)
+
+        messages = list(tap_redshift.generate_messages(
+            connections['test-db'], ['public'],
+            singer.catalog.Catalog(parallel_entries), {}))
+
+        def tables(dbname):
+            return [query.split('FROM ')[1].split()[0]
+                    for query, _ in connections[dbname].queries
+                    if query.startswith('SELECT "id"')]
+
+        assert_that(sorted(tables('test-db')),
+                    equal_to(['"public"."orders"', '"public"."payments"']))
+        assert_that(tables('other-db'), equal_to(['"public"."refunds"']))
+        assert_that(messages[-1].value['bookmarks'], has_length(3))
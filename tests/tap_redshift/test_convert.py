@@ -0,0 +1,114 @@
+# tap-redshift
+# Copyright 2018 data.world, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the
+# License.
+#
+# You may obtain a copy of the License at
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied. See the License for the specific language governing
+# permissions and limitations under the License.
+#
+# This product includes software developed at
+# data.world, Inc.(http://data.world/).
+
+import datetime
+from decimal import Decimal
+
+from doublex import assert_that
+from hamcrest import equal_to
+from singer.catalog import CatalogEntry
+from singer.schema import Schema
+
+from tap_redshift.convert import (build_row_converter, cast_date,
+                                  cast_timestamp, cast_timestamptz)
+
+
+def entry_for(columns):
+    return CatalogEntry(
+        stream='wide',
+        schema=Schema(type='object', properties={
+            name: Schema(type=['null', 'string'], format=fmt)
+            for name, _, fmt in columns}),
+        metadata=[{'breadcrumb': ('properties', name),
+                   'metadata': {'sql-datatype': sql_type}}
+                  for name, sql_type, _ in columns])
+
+
+class TestRowConverter(object):
+    def test_converts_only_temporal_columns(self):
+        columns = [('id', 'int4', None),
+                   ('cost', 'numeric', None),
+                   ('created_at', 'timestamp', 'date-time'),
+                   ('updated_at', 'timestamptz', 'date-time'),
+                   ('expires_on', 'date', 'date')]
+        convert = build_row_converter(entry_for(columns),
+                                      [c[0] for c in columns])
+        eastern = datetime.timezone(datetime.timedelta(hours=-5))
+
+        record = convert((1, Decimal('2.50'),
+                          datetime.datetime(2018, 1, 1, 10, 0, 0, 500),
+                          datetime.datetime(2018, 1, 1, 10, 0, 0,
+                                            tzinfo=eastern),
+                          datetime.date(2018, 2, 1)))
+
+        assert_that(record, equal_to({
+            'id': 1,
+            'cost': Decimal('2.50'),
+            'created_at': '2018-01-01T10:00:00.000500Z',
+            'updated_at': '2018-01-01T15:00:00Z',
+            'expires_on': '2018-02-01'}))
+
+    def test_nulls_pass_through(self):
+        columns = [('created_at', 'timestamp', 'date-time')]
+        convert = build_row_converter(entry_for(columns), ['created_at'])
+        assert_that(convert((None,)), equal_to({'created_at': None}))
+
+    def test_wide_table(self):
+        columns = [('col{}'.format(i), 'varchar', None) for i in range(300)]
+        convert = build_row_converter(entry_for(columns),
+                                      [c[0] for c in columns])
+        row = tuple('value{}'.format(i) for i in range(300))
+        record = convert(row)
+        assert_that(len(record), equal_to(300))
+        assert_that(record['col299'], equal_to('value299'))
+
+    def test_native_typecasters_skip_conversion(self):
+        columns = [('created_at', 'timestamp', 'date-time')]
+        convert = build_row_converter(entry_for(columns), ['created_at'],
+                                      native_typecasters=True)
+        assert_that(convert(('2018-01-01T10:00:00Z',)),
+                    equal_to({'created_at': '2018-01-01T10:00:00Z'}))
+
+
+class TestTypecasters(object):
+    def test_timestamp(self):
+        assert_that(cast_timestamp('2018-01-01 10:00:00', None),
+                    equal_to('2018-01-01T10:00:00Z'))
+
+    def test_timestamp_pads_fraction_like_isoformat(self):
+        value = datetime.datetime(2018, 1, 1, 10, 0, 0, 500)
+        assert_that(cast_timestamp('2018-01-01 10:00:00.0005', None),
+                    equal_to(value.isoformat('T') + 'Z'))
+
+    def test_timestamp_special_values(self):
+        assert_that(cast_timestamp(None, None), equal_to(None))
+        assert_that(cast_timestamp('infinity', None), equal_to('infinity'))
+
+    def test_timestamptz_utc(self):
+        assert_that(cast_timestamptz('2018-01-01 10:00:00.25+00', None),
+                    equal_to('2018-01-01T10:00:00.250000Z'))
+
+    def test_timestamptz_with_offset(self):
+        assert_that(cast_timestamptz('2018-01-01 10:00:00-05', None),
+                    equal_to('2018-01-01T15:00:00Z'))
+        assert_that(cast_timestamptz('2018-01-01 00:15:00.5+05:30', None),
+                    equal_to('2017-12-31T18:45:00.500000Z'))
+
+    def test_date(self):
+        assert_that(cast_date('2018-02-01', None), equal_to('2018-02-01'))
@@ -0,0 +1,160 @@
+# tap-redshift
+# Copyright 2018 data.world, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the
+# License.
+#
+# You may obtain a copy of the License at
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied. See the License for the specific language governing
+# permissions and limitations under the License.
+#
+# This product includes software developed at
+# data.world, Inc.(http://data.world/).
+import datetime
+import json
+
+import singer
+from doublex import assert_that
+from hamcrest import contains_string, equal_to, is_not
+
+import tap_redshift
+from tap_redshift import delta
+from tap_redshift.messages import RecordBatch
+
+
+def hashed(rows):
+    '''Rows as read in delta mode, with the row hash last.'''
+    return [row + (hash_,) for row, hash_ in rows]
+
+
+def delta_entry(entry):
+    entry.metadata[0]['metadata']['full-table-mode'] = 'DELTA'
+    return entry
+
+
+def synced_ids(messages):
+    return [r['id'] for m in messages if isinstance(m, RecordBatch)
+            for r in m.records]
+
+
+class TestHashStore(object):
+    def test_changed_and_deleted(self, tmpdir):
+        with delta.HashStore(str(tmpdir), 'orders') as store:
+            assert_that(store.changed(['[1]', '[2]'], ['a', 'b']),
+                        equal_to([0, 1]))
+            store.commit(['id'], datetime.datetime(2018, 1, 1))
+            run = store.run
+
+        with delta.HashStore(str(tmpdir), 'orders', run) as store:
+            assert_that(store.changed(['[1]', '[3]'], ['c', 'd']),
+                        equal_to([0, 1]))
+            assert_that(store.commit(['id'], datetime.datetime(2018, 1, 2)),
+                        equal_to([[2]]))
+
+    def test_nothing_is_kept_until_commit(self, tmpdir):
+        with delta.HashStore(str(tmpdir), 'orders') as store:
+            store.changed(['[1]'], ['a'])
+
+        with delta.HashStore(str(tmpdir), 'orders', 1) as store:
+            assert_that(store.changed(['[1]'], ['a']), equal_to([0]))
+
+    def test_undelivered_runs_are_dropped(self, tmpdir):
+        with delta.HashStore(str(tmpdir), 'orders') as store:
+            store.changed(['[1]'], ['a'])
+            store.commit(['id'], datetime.datetime(2018, 1, 1))
+            first = store.run
+
+        with delta.HashStore(str(tmpdir), 'orders', first) as store:
+            store.changed(['[1]'], ['b'])
+            store.commit(['id'], datetime.datetime(2018, 1, 2))
+            second = store.run
+
+        # Started from the state before the second run, whose rows the
+        # target never loaded, so its changes are found again.
+        with delta.HashStore(str(tmpdir), 'orders', first) as store:
+            assert_that(store.run, equal_to(second + 1))
+            assert_that(store.changed(['[1]'], ['b']), equal_to([0]))
+
+
+class TestDeltaSync(object):
+    created = datetime.datetime(2018, 1, 1)
+
+    def test_emits_only_new_and_changed_rows(
+            self, config, fake_connection, full_table_entry, tmpdir):
+        config['delta_store_dir'] = str(tmpdir)
+        first = hashed([((1, None, self.created), 'a'),
+                        ((2, None, self.created), 'b'),
+                        ((3, None, self.created), 'c')])
+        conn = fake_connection(first)
+        messages = list(tap_redshift.sync_table(
+            conn, delta_entry(full_table_entry), {}))
+
+        assert_that(synced_ids(messages), equal_to([1, 2, 3]))
+        assert_that(conn.queries[0][0], contains_string(',MD5('))
+        assert_that([m for m in messages
+                     if isinstance(m, singer.ActivateVersionMessage)],
+                    equal_to([]))
+
+        second = hashed([((1, None, self.created), 'a'),
+                         ((2, None, self.created), 'changed'),
+                         ((4, None, self.created), 'd')])
+        messages = list(tap_redshift.sync_table(
+            fake_connection(second), full_table_entry, messages[-1].value))
+
+        assert_that(synced_ids(messages), equal_to([2, 4]))
+        with open(str(tmpdir.join(
+                '{}.deleted.json'.format(full_table_entry.tap_stream_id)))) \
+                as report:
+            assert_that(json.load(report)['deleted'],
+                        equal_to([{'id': 3}]))
+
+    def test_rows_are_sent_again_until_delivered(
+            self, config, fake_connection, full_table_entry, tmpdir):
+        config['delta_store_dir'] = str(tmpdir)
+        rows = hashed([((1, None, self.created), 'a')])
+        messages = list(tap_redshift.sync_table(
+            fake_connection(rows), delta_entry(full_table_entry), {}))
+        assert_that(singer.get_bookmark(
+            messages[-1].value, full_table_entry.tap_stream_id, 'delta_run'),
+            equal_to(1))
+
+        # The state of the first sync was never handed back.
+        messages = list(tap_redshift.sync_table(
+            fake_connection(rows), full_table_entry, {}))
+        assert_that(synced_ids(messages), equal_to([1]))
+
+        messages = list(tap_redshift.sync_table(
+            fake_connection(rows), full_table_entry, messages[-1].value))
+        assert_that(synced_ids(messages), equal_to([]))
+
+    def test_build_state_keeps_run(self, full_table_entry):
+        state = tap_redshift.build_state(
+            {'bookmarks': {full_table_entry.tap_stream_id: {
+                'delta_run': 3}}},
+            singer.catalog.Catalog([full_table_entry]))
+        assert_that(state['bookmarks'][full_table_entry.tap_stream_id],
+                    equal_to({'delta_run': 3}))
+
+    def test_hashes_bool_columns_without_a_cast(
+            self, config, fake_connection, bool_column_entry, tmpdir):
+        config['delta_store_dir'] = str(tmpdir)
+        conn = fake_connection([])
+        list(tap_redshift.sync_table(conn, delta_entry(bool_column_entry), {}))
+
+        assert_that(conn.queries[0][0], contains_string(
+            "CASE WHEN \"active\" THEN 't' WHEN NOT \"active\" THEN 'f' "
+            "END"))
+        assert_that(conn.queries[0][0],
+                    is_not(contains_string('"active"::VARCHAR')))
+
+    def test_needs_a_store(self, config, fake_connection, full_table_entry):
+        conn = fake_connection([(1, None, self.created)])
+        list(tap_redshift.sync_table(conn, delta_entry(full_table_entry), {}))
+        assert_that(conn.queries[0][0], equal_to(
+            'SELECT "id","amount","created_at" FROM "public"."orders"'))
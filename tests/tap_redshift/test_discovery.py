@@ -0,0 +1,195 @@
+# tap-redshift
+# Copyright 2018 data.world, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the
+# License.
+#
+# You may obtain a copy of the License at
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied. See the License for the specific language governing
+# permissions and limitations under the License.
+#
+# This product includes software developed at
+# data.world, Inc.(http://data.world/).
+
+import json
+
+from doublex import assert_that
+from hamcrest import (equal_to, has_entries, has_key, has_length, is_not,
+                      same_instance)
+from singer import metadata
+
+import tap_redshift
+
+
+def table_rows(table, *columns, conkey=(1,), schema='public'):
+    return [(schema, table, 'r', pos, name, sql_type, False, list(conkey))
+            for pos, (name, sql_type) in enumerate(columns, 1)]
+
+
+ORDERS = table_rows('orders', ('id', 'int4'), ('updated_at', 'timestamp'))
+REFUNDS = table_rows('refunds', ('id', 'int4'))
+PAYMENTS = table_rows('payments', ('id', 'int4'))
+
+
+def discover(fake_connection, rows, previous=None):
+    return tap_redshift.discover_changes(fake_connection(rows), 'public',
+                                         previous)
+
+
+def stream_metadata(catalog, tap_stream_id):
+    return metadata.to_map(catalog.get_stream(tap_stream_id).metadata)
+
+
+class TestDiscoverChanges(object):
+    def test_without_previous_catalog_everything_is_added(
+            self, config, fake_connection):
+        catalog, report = discover(fake_connection, ORDERS + REFUNDS)
+        assert_that(report, equal_to({
+            'added': ['test-db.public.orders', 'test-db.public.refunds'],
+            'altered': [], 'dropped': [], 'unchanged': []}))
+        assert_that(len(catalog.streams), equal_to(2))
+
+    def test_reports_changes_against_previous_catalog(
+            self, config, fake_connection):
+        previous, _ = discover(fake_connection, ORDERS + REFUNDS)
+        altered_orders = ORDERS + table_rows(
+            'orders', ('id', 'int4'), ('updated_at', 'timestamp'),
+            ('amount', 'numeric'))[2:]
+
+        catalog, report = discover(
+            fake_connection, altered_orders + PAYMENTS, previous)
+
+        assert_that(report, equal_to({
+            'added': ['test-db.public.payments'],
+            'altered': ['test-db.public.orders'],
+            'dropped': ['test-db.public.refunds'],
+            'unchanged': []}))
+        assert_that(
+            [entry.tap_stream_id for entry in catalog.streams],
+            equal_to(['test-db.public.orders', 'test-db.public.payments']))
+        assert_that(catalog.get_stream('test-db.public.orders')
+                    .schema.properties, has_key('amount'))
+
+    def test_reuses_unchanged_entries(self, config, fake_connection):
+        previous, _ = discover(fake_connection, ORDERS + REFUNDS)
+        catalog, report = discover(fake_connection, ORDERS + REFUNDS,
+                                   previous)
+        assert_that(report['unchanged'], equal_to(
+            ['test-db.public.orders', 'test-db.public.refunds']))
+        assert_that(catalog.streams[0],
+                    same_instance(previous.streams[0]))
+
+    def test_renames_unchanged_entries_for_the_configured_databases(
+            self, config, fake_connection):
+        previous, _ = discover(fake_connection, ORDERS)
+        config['dbname'] = ['test-db', 'other-db']
+        catalog, report = discover(fake_connection, ORDERS, previous)
+        assert_that(report['unchanged'], equal_to(['test-db.public.orders']))
+        assert_that(catalog.streams[0].stream,
+                    equal_to('test-db-orders'))
+
+    def test_altered_entry_keeps_user_metadata(self, config,
+                                               fake_connection):
+        previous, _ = discover(fake_connection, ORDERS)
+        entry = previous.streams[0]
+        mdata = metadata.to_map(entry.metadata)
+        mdata[()].update({'selected': True,
+                          'replication-method': 'INCREMENTAL',
+                          'replication-key': 'updated_at'})
+        mdata[('properties', 'id')]['selected'] = False
+        entry.metadata = metadata.to_list(mdata)
+
+        catalog, report = discover(
+            fake_connection,
+            table_rows('orders', ('id', 'int8'), ('updated_at', 'timestamp')),
+            previous)
+
+        mdata = stream_metadata(catalog, 'test-db.public.orders')
+        assert_that(report['altered'], equal_to(['test-db.public.orders']))
+        assert_that(mdata[()], has_entries({
+            'selected': True, 'replication-key': 'updated_at',
+            'column-signature': is_not(equal_to(
+                metadata.to_map(entry.metadata)[()]['column-signature']))}))
+        assert_that(mdata[('properties', 'id')], has_entries({
+            'selected': False, 'sql-datatype': 'int8'}))
+
+    def test_ignores_previous_entries_of_other_schemas(
+            self, config, fake_connection):
+        previous, _ = tap_redshift.discover_changes(
+            fake_connection(table_rows('refunds', ('id', 'int4'),
+                                       schema='sales')), 'sales')
+        catalog, report = discover(fake_connection, ORDERS, previous)
+        assert_that(report['dropped'], equal_to([]))
+
+    def test_discovers_several_schemas_in_one_query(
+            self, config, fake_connection):
+        config['schema'] = ['public', 'sales']
+        conn = fake_connection(ORDERS + table_rows(
+            'orders', ('id', 'int4'), schema='sales'))
+        catalog, report = tap_redshift.discover_changes(
+            conn, ['public', 'sales'])
+
+        assert_that(conn.queries, has_length(1))
+        assert_that(report['added'], equal_to(
+            ['test-db.public.orders', 'test-db.sales.orders']))
+        assert_that([entry.stream for entry in catalog.streams],
+                    equal_to(['public-orders', 'sales-orders']))
+
+    def test_streams_pg_catalog_rows_through_a_named_cursor(
+            self, fake_connection, monkeypatch):
+        monkeypatch.setattr(tap_redshift, 'DISCOVERY_ITERSIZE', 10)
+        conn = fake_connection(ORDERS)
+        tap_redshift.discover_changes(conn, 'public')
+
+        assert_that(conn.cursors[0].name, equal_to('tap_redshift_discovery'))
+        assert_that(conn.cursors[0].itersize, equal_to(10))
+
+
+class TestDoDiscover(object):
+    def test_writes_planned_entries(self, config, fake_connection, capsys):
+        def results(query, params):
+            if 'svv_table_info' in query:
+                return [('public', 'orders', 5000, 1)]
+            return ORDERS + REFUNDS
+
+        tap_redshift.do_discover(fake_connection(results), 'public')
+
+        catalog = json.loads(capsys.readouterr().out)
+        assert_that([s['tap_stream_id'] for s in catalog['streams']],
+                    equal_to(['test-db.public.orders',
+                              'test-db.public.refunds']))
+        orders = metadata.to_map(catalog['streams'][0]['metadata'])
+        assert_that(orders[()], has_entries({'row-count': 5000,
+                                             'extraction-method': 'CURSOR'}))
+
+
+class TestBuildEntry(object):
+    def test_classifies_each_column_once(self, config, monkeypatch):
+        calls = []
+        schema_for_column = tap_redshift.schema_for_column
+
+        def counting(c):
+            calls.append(c['name'])
+            return schema_for_column(c)
+
+        monkeypatch.setattr(tap_redshift, 'schema_for_column', counting)
+        cols = [{'pos': 1, 'name': 'id', 'type': 'int4', 'nullable': 'NO'},
+                {'pos': 2, 'name': 'updated_at', 'type': 'timestamp',
+                 'nullable': 'YES'}]
+        entry = tap_redshift.build_entry('test-db', 'public', 'orders', cols,
+                                         ['id'], False, None)
+
+        assert_that(calls, equal_to(['id', 'updated_at']))
+        mdata = metadata.to_map(entry.metadata)
+        assert_that(mdata[()], has_entries({
+            'table-key-properties': ['id'],
+            'valid-replication-keys': ['id', 'updated_at']}))
+        assert_that(mdata[('properties', 'updated_at')], equal_to({
+            'selected-by-default': True, 'sql-datatype': 'timestamp',
+            'inclusion': 'available'}))
@@ -0,0 +1,96 @@
+# tap-redshift
+# Copyright 2018 data.world, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the
+# License.
+#
+# You may obtain a copy of the License at
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied. See the License for the specific language governing
+# permissions and limitations under the License.
+#
+# This product includes software developed at
+# data.world, Inc.(http://data.world/).
+
+import datetime
+from decimal import Decimal
+
+import pytest
+import pytz
+import simplejson as json
+from doublex import assert_that
+from hamcrest import equal_to, instance_of
+
+from tap_redshift.encoders import (OrjsonEncoder, SimpleJsonEncoder,
+                                   coerce_datetime, get_encoder)
+
+SAMPLE_MESSAGES = [
+    {'type': 'RECORD', 'stream': 'orders',
+     'record': {'id': 9223372036854775807,
+                'cost': Decimal('10.50'),
+                'tiny': Decimal('0.000000000000000001'),
+                'exp': Decimal('1E+2'),
+                'negative': Decimal('-0.00'),
+                'ratio': 0.1,
+                'verified': True,
+                'note': None,
+                'name': 'café ☃ "quoted"\n'},
+     'version': 1525176000000,
+     'time_extracted': '2018-05-01T12:00:00.000000Z'},
+    {'type': 'RECORD', 'stream': 'events',
+     'record': {'naive': datetime.datetime(2018, 1, 2, 3, 4, 5, 678901),
+                'aware': datetime.datetime(2018, 1, 2, 3, 4, 5,
+                                           tzinfo=pytz.utc),
+                'day': datetime.date(2018, 1, 2)}},
+    {'type': 'RECORD', 'stream': 'readings',
+     'record': {'missing': float('nan'),
+                'high': float('inf'),
+                'low': float('-inf'),
+                'large': 1e16,
+                'small': 1e-07,
+                'count': 3}},
+    {'type': 'STATE',
+     'value': {'currently_syncing': None,
+               'bookmarks': {'db.public.orders': {
+                   'replication_key': 'updated_at',
+                   'replication_key_value': '2018-01-01T00:00:00Z',
+                   'version': 1}}}},
+]
+
+
+def reference_dumps(obj, **kwargs):
+    '''The serialization do_sync used before encoders were pluggable.'''
+    return json.dumps(obj, default=coerce_datetime, use_decimal=True,
+                      **kwargs).encode('utf-8')
+
+
+class TestEncoders(object):
+    @pytest.mark.parametrize('message', SAMPLE_MESSAGES)
+    def test_simplejson_matches_reference(self, message):
+        assert_that(SimpleJsonEncoder().dumps(message),
+                    equal_to(reference_dumps(message)))
+
+    @pytest.mark.skipif(not OrjsonEncoder.available(),
+                        reason='orjson>=3.9 is not installed')
+    @pytest.mark.parametrize('message', SAMPLE_MESSAGES)
+    def test_orjson_matches_reference(self, message):
+        assert_that(OrjsonEncoder().dumps(message),
+                    equal_to(reference_dumps(message,
+                                             separators=(',', ':'),
+                                             ensure_ascii=False)))
+
+    def test_get_encoder_by_name(self):
+        assert_that(get_encoder('simplejson'),
+                    instance_of(SimpleJsonEncoder))
+
+    def test_auto_is_simplejson(self):
+        assert_that(get_encoder('auto'), instance_of(SimpleJsonEncoder))
+
+    def test_unknown_encoder(self):
+        with pytest.raises(Exception):
+            get_encoder('marshal')
@@ -0,0 +1,172 @@
+# tap-redshift
+# Copyright 2018 data.world, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the
+# License.
+#
+# You may obtain a copy of the License at
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied. See the License for the specific language governing
+# permissions and limitations under the License.
+#
+# This product includes software developed at
+# data.world, Inc.(http://data.world/).
+
+import datetime
+
+import singer
+from doublex import assert_that
+from hamcrest import contains_string, equal_to, is_not
+
+import tap_redshift
+from tap_redshift import keyset
+from tap_redshift.messages import RecordBatch
+
+
+def keyset_entry(entry, chunk_size=2):
+    entry.metadata[0]['metadata'].update({'full-table-mode': 'KEYSET',
+                                          'keyset-chunk-size': chunk_size})
+    return entry
+
+
+def table_in_key_order(rows):
+    '''Serves keyset queries over rows keyed by id.'''
+    def results(query, params):
+        limit = int(query.rsplit('LIMIT ', 1)[1])
+        after = params.get('keyset_0')
+        return [row for row in sorted(rows)
+                if after is None or row[0] > after][:limit]
+    return results
+
+
+def synced_ids(messages):
+    return [r['id'] for m in messages if isinstance(m, RecordBatch)
+            for r in m.records]
+
+
+class TestKeysetFilter(object):
+    def test_single_column(self):
+        clause, params = keyset.keyset_filter(['id'], {'id': 5})
+        assert_that(clause, equal_to('(("id" > %(keyset_0)s))'))
+        assert_that(params, equal_to({'keyset_0': 5}))
+
+    def test_compound_key(self):
+        clause, params = keyset.keyset_filter(
+            ['a', 'b'], {'a': 1, 'b': 2})
+        assert_that(clause, equal_to(
+            '(("a" > %(keyset_0)s) OR '
+            '("a" = %(keyset_0)s AND "b" > %(keyset_1)s))'))
+        assert_that(params, equal_to({'keyset_0': 1, 'keyset_1': 2}))
+
+
+class TestKeysetSync(object):
+    rows = [(i, None, datetime.datetime(2018, 1, 1)) for i in range(1, 6)]
+
+    def test_reads_table_in_chunks(self, config, fake_connection,
+                                   full_table_entry):
+        conn = fake_connection(table_in_key_order(self.rows))
+        messages = list(tap_redshift.sync_table(
+            conn, keyset_entry(full_table_entry), {}))
+
+        assert_that(synced_ids(messages), equal_to([1, 2, 3, 4, 5]))
+        assert_that(len(conn.queries), equal_to(3))
+        assert_that(conn.queries[0][0],
+                    equal_to('SELECT "id","amount","created_at" FROM '
+                             '"public"."orders" ORDER BY "id" ASC LIMIT 2'))
+        checkpoints = [m.value['bookmarks'][full_table_entry.tap_stream_id]
+                       .get('last_pk_fetched') for m in messages
+                       if isinstance(m, singer.StateMessage)]
+        assert_that(checkpoints, equal_to(
+            [{'id': 2}, {'id': 4}, {'id': 5}, None]))
+
+    def test_resumes_after_last_pk_fetched(
+            self, config, fake_connection, full_table_entry):
+        state = {'bookmarks': {full_table_entry.tap_stream_id: {
+            'version': 1, 'last_pk_fetched': {'id': 3}}}}
+        messages = list(tap_redshift.sync_table(
+            fake_connection(table_in_key_order(self.rows)),
+            keyset_entry(full_table_entry), state))
+
+        assert_that(synced_ids(messages), equal_to([4, 5]))
+        assert_that(messages[0].version, equal_to(1))
+        assert_that(messages[-1].value['bookmarks'][
+            full_table_entry.tap_stream_id], equal_to({'version': None}))
+
+    def test_build_state_keeps_last_pk_fetched(self, full_table_entry):
+        raw_state = {'bookmarks': {full_table_entry.tap_stream_id: {
+            'version': 1, 'last_pk_fetched': {'id': 3}}}}
+        state = tap_redshift.build_state(
+            raw_state, singer.catalog.Catalog([full_table_entry]))
+        assert_that(state['bookmarks'][full_table_entry.tap_stream_id],
+                    equal_to({'version': 1, 'last_pk_fetched': {'id': 3}}))
+
+    def test_needs_selected_primary_key(self, config, fake_connection,
+                                        full_table_entry):
+        keyset_entry(full_table_entry)
+        del full_table_entry.schema.properties['id']
+        conn = fake_connection(lambda query, params: [])
+        list(tap_redshift.sync_table(conn, full_table_entry, {}))
+        assert_that(conn.queries[0][0], is_not(contains_string('LIMIT')))
+
+
+class TestIncrementalKeyset(object):
+    def keyset_entry(self, entry):
+        entry.metadata[0]['metadata']['incremental-mode'] = 'KEYSET'
+        return entry
+
+    def test_orders_by_replication_key_then_pk(
+            self, config, sync_conn, incremental_entry):
+        messages = list(tap_redshift.sync_table(
+            sync_conn, self.keyset_entry(incremental_entry), {}))
+
+        assert_that(sync_conn.queries[0][0], contains_string(
+            'ORDER BY "created_at" ASC, "id" ASC'))
+        bookmark = messages[-1].value['bookmarks'][
+            incremental_entry.tap_stream_id]
+        assert_that(bookmark['replication_key_value'],
+                    equal_to('2018-01-03T12:45:15Z'))
+        assert_that(bookmark['replication_key_pk'], equal_to({'id': 3}))
+
+    def test_resumes_after_last_row(self, config, sync_conn,
+                                    incremental_entry):
+        state = {'bookmarks': {incremental_entry.tap_stream_id: {
+            'version': 1,
+            'replication_key': 'created_at',
+            'replication_key_value': '2018-01-02T11:30:00Z',
+            'replication_key_pk': {'id': 2}}}}
+        list(tap_redshift.sync_table(
+            sync_conn, self.keyset_entry(incremental_entry), state))
+
+        query, params = sync_conn.queries[0]
+        assert_that(query, contains_string(
+            'WHERE "created_at" >= %(keyset_0)s AND '
+            '(("created_at" > %(keyset_0)s) OR '
+            '("created_at" = %(keyset_0)s AND "id" > %(keyset_1)s))'))
+        assert_that(params['keyset_1'], equal_to(2))
+
+    def test_without_pk_bookmark_starts_at_value(
+            self, config, sync_conn, incremental_entry):
+        state = {'bookmarks': {incremental_entry.tap_stream_id: {
+            'version': 1,
+            'replication_key': 'created_at',
+            'replication_key_value': '2018-01-02T11:30:00Z'}}}
+        list(tap_redshift.sync_table(
+            sync_conn, self.keyset_entry(incremental_entry), state))
+        assert_that(sync_conn.queries[0][0], contains_string(
+            'WHERE created_at >= %(replication_key_value)s'))
+
+    def test_build_state_keeps_replication_key_pk(self, incremental_entry):
+        bookmark = {'version': 1,
+                    'replication_key': 'created_at',
+                    'replication_key_value': '2018-01-02T11:30:00Z',
+                    'replication_key_pk': {'id': 2}}
+        state = tap_redshift.build_state(
+            {'bookmarks': {incremental_entry.tap_stream_id: bookmark}},
+            singer.catalog.Catalog([incremental_entry]))
+        assert_that(state['bookmarks'][incremental_entry.tap_stream_id],
+                    equal_to(bookmark))
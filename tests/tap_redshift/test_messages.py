@@ -0,0 +1,58 @@
+# tap-redshift
+# Copyright 2018 data.world, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the
+# License.
+#
+# You may obtain a copy of the License at
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied. See the License for the specific language governing
+# permissions and limitations under the License.
+#
+# This product includes software developed at
+# data.world, Inc.(http://data.world/).
+
+import datetime
+from decimal import Decimal
+
+import pytz
+import simplejson as json
+import singer
+from doublex import assert_that
+from hamcrest import equal_to
+
+from tap_redshift.encoders import coerce_datetime
+from tap_redshift.messages import RecordBatch, format_message
+
+
+class TestMessages(object):
+    def test_batch_matches_per_record_output(self):
+        time_extracted = datetime.datetime(2018, 5, 1, 12, tzinfo=pytz.utc)
+        records = [{'id': 1, 'cost': Decimal('1.10')},
+                   {'id': 2, 'cost': None}]
+        batch = RecordBatch('orders', records, version=7,
+                            time_extracted=time_extracted)
+
+        messages = [singer.RecordMessage(stream='orders', record=record,
+                                         version=7,
+                                         time_extracted=time_extracted)
+                    for record in records]
+        expected = ''.join(
+            json.dumps(m.asdict(), default=coerce_datetime,
+                       use_decimal=True) + '\n'
+            for m in messages).encode('utf-8')
+        assert_that(format_message(batch), equal_to(expected))
+
+    def test_empty_batch(self):
+        assert_that(format_message(RecordBatch('orders', [])), equal_to(b''))
+
+    def test_single_message(self):
+        message = singer.StateMessage(value={'bookmarks': {}})
+        assert_that(
+            format_message(message),
+            equal_to(b'{"type": "STATE", "value": {"bookmarks": {}}}\n'))
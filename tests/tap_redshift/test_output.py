@@ -0,0 +1,90 @@
+# tap-redshift
+# Copyright 2018 data.world, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the
+# License.
+#
+# You may obtain a copy of the License at
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied. See the License for the specific language governing
+# permissions and limitations under the License.
+#
+# This product includes software developed at
+# data.world, Inc.(http://data.world/).
+
+import io
+import json
+
+import singer
+from doublex import assert_that
+from hamcrest import equal_to
+
+from tap_redshift.messages import RecordBatch
+from singer.catalog import Catalog
+
+from tap_redshift.output import CatalogWriter, OutputWriter
+
+
+def batch():
+    return RecordBatch('orders', [{'id': 1}, {'id': 2}])
+
+
+class TestOutputWriter(object):
+    def test_buffers_records_until_closed(self):
+        stream = io.BytesIO()
+        with OutputWriter(stream, buffer_size=1024,
+                          flush_interval=60) as writer:
+            writer.write_message(batch())
+            assert_that(stream.getvalue(), equal_to(b''))
+
+        assert_that(stream.getvalue().count(b'\n'), equal_to(2))
+        assert_that(writer.flush_count, equal_to(1))
+        assert_that(writer.bytes_written, equal_to(len(stream.getvalue())))
+
+    def test_flushes_on_size_threshold(self):
+        stream = io.BytesIO()
+        writer = OutputWriter(stream, buffer_size=10, flush_interval=60)
+        writer.write_message(batch())
+
+        assert_that(writer.flush_count, equal_to(1))
+        assert_that(stream.getvalue().count(b'\n'), equal_to(2))
+
+    def test_flushes_on_time_threshold(self):
+        stream = io.BytesIO()
+        writer = OutputWriter(stream, buffer_size=1024, flush_interval=0)
+        writer.write_message(batch())
+        writer.write_message(batch())
+
+        assert_that(writer.flush_count, equal_to(2))
+
+    def test_flushes_after_state(self):
+        stream = io.BytesIO()
+        writer = OutputWriter(stream, buffer_size=1024, flush_interval=60)
+        writer.write_message(batch())
+        writer.write_message(singer.StateMessage(value={}))
+
+        assert_that(writer.flush_count, equal_to(1))
+        assert_that(stream.getvalue().splitlines()[-1],
+                    equal_to(b'{"type": "STATE", "value": {}}'))
+
+
+class TestCatalogWriter(object):
+    def write(self, catalog):
+        stream = io.StringIO()
+        with CatalogWriter(stream) as writer:
+            for entry in catalog.streams:
+                writer.write_entry(entry)
+        return stream.getvalue()
+
+    def test_matches_catalog_dump(self, expected_catalog_from_db):
+        assert_that(self.write(expected_catalog_from_db), equal_to(
+            json.dumps(expected_catalog_from_db.to_dict(), indent=2)))
+
+    def test_empty_catalog(self):
+        assert_that(self.write(Catalog([])),
+                    equal_to(json.dumps({'streams': []}, indent=2)))
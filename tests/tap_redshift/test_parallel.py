@@ -0,0 +1,95 @@
+# tap-redshift
+# Copyright 2018 data.world, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the
+# License.
+#
+# You may obtain a copy of the License at
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied. See the License for the specific language governing
+# permissions and limitations under the License.
+#
+# This product includes software developed at
+# data.world, Inc.(http://data.world/).
+
+import pytest
+import singer
+from doublex import assert_that
+from hamcrest import (equal_to, has_entries, has_length,
+                      less_than_or_equal_to)
+
+import tap_redshift
+from tap_redshift import parallel
+from tap_redshift.messages import RecordBatch
+
+
+class TestParallelSync(object):
+    def sync(self, connections, entries, state):
+        return list(parallel.sync_streams(
+            connections, entries, state, tap_redshift.sync_stream))
+
+    def test_each_stream_keeps_its_order(
+            self, config, fake_connection, sync_rows, parallel_entries):
+        connections = [fake_connection(sync_rows), fake_connection(sync_rows)]
+        messages = self.sync(connections, parallel_entries, {})
+
+        for entry in parallel_entries:
+            kinds = [type(m) for m in messages
+                     if getattr(m, 'stream', None) == entry.stream]
+            assert_that(kinds[0], equal_to(singer.SchemaMessage))
+            records = sum(len(m) for m in messages
+                          if isinstance(m, RecordBatch) and
+                          m.stream == entry.stream)
+            assert_that(records, equal_to(len(sync_rows)))
+
+    def test_state_merges_every_stream(
+            self, config, fake_connection, sync_rows, parallel_entries):
+        state = {'bookmarks': {'test-db.public.refunds': {'version': 1}}}
+        connections = [fake_connection(sync_rows), fake_connection(sync_rows)]
+        messages = self.sync(connections, parallel_entries, state)
+
+        final = messages[-1].value
+        assert_that(final['bookmarks'], has_length(3))
+        assert_that(final['bookmarks']['test-db.public.orders'],
+                    has_entries(replication_key_value='2018-01-03T12:45:15Z'))
+        assert_that(final['bookmarks']['test-db.public.payments'],
+                    has_entries(replication_key_value='2018-01-03T12:45:15Z'))
+        assert_that(state, equal_to(final))
+
+    def test_worker_errors_are_raised(
+            self, config, fake_connection, parallel_entries):
+        def fail(query, params):
+            raise Exception('connection lost')
+
+        with pytest.raises(Exception):
+            self.sync([fake_connection(fail), fake_connection(fail)],
+                      parallel_entries, {})
+
+    def test_generate_messages_opens_worker_connections(
+            self, config, monkeypatch, fake_connection, sync_rows,
+            parallel_entries):
+        config.update({'max_workers': 4, 'plan_extraction': False})
+        opened = []
+
+        def open_connection(config, dbname=None):
+            opened.append(fake_connection(sync_rows))
+            return opened[-1]
+
+        monkeypatch.setattr(tap_redshift, 'open_connection', open_connection)
+        monkeypatch.setattr(tap_redshift.resolve, 'resolve_catalog',
+                            lambda discovered, catalog, state: catalog)
+        monkeypatch.setattr(tap_redshift, 'discover_catalog',
+                            lambda conn, db_schema, previous=None:
+                            singer.catalog.Catalog([]))
+
+        messages = list(tap_redshift.generate_messages(
+            fake_connection(sync_rows), 'public',
+            singer.catalog.Catalog(parallel_entries), {}))
+
+        assert_that(len(opened), less_than_or_equal_to(2))
+        assert_that(messages[-1].value['currently_syncing'], equal_to(None))
@@ -0,0 +1,140 @@
+# tap-redshift
+# Copyright 2018 data.world, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the
+# License.
+#
+# You may obtain a copy of the License at
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied. See the License for the specific language governing
+# permissions and limitations under the License.
+#
+# This product includes software developed at
+# data.world, Inc.(http://data.world/).
+
+import datetime
+
+import singer
+from doublex import assert_that
+from hamcrest import equal_to, has_length
+from singer.schema import Schema
+
+import tap_redshift
+from tap_redshift import partition
+from tap_redshift.messages import RecordBatch
+
+
+def partitioned(entry, count=3, **extra):
+    entry.metadata[0]['metadata'].update({'partition-count': count}, **extra)
+    return entry
+
+
+def table_by_id(rows):
+    '''Serves MIN/MAX probes and partition queries over rows keyed by id.'''
+    def results(query, params):
+        ids = [row[0] for row in rows]
+        if query.startswith('SELECT MIN'):
+            return [(min(ids), max(ids))]
+        lower = params.get('partition_lower')
+        upper = params.get('partition_upper')
+        return [row for row in rows
+                if (lower is None or row[0] >= lower) and
+                (upper is None or row[0] < upper)]
+    return results
+
+
+class TestPartitionPlanning(object):
+    def test_integer_split_points(self):
+        assert_that(partition.split_points(0, 100, 4),
+                    equal_to([25, 50, 75]))
+
+    def test_split_points_skip_duplicates(self):
+        assert_that(partition.split_points(1, 2, 4), equal_to([]))
+        assert_that(partition.split_points(None, None, 4), equal_to([]))
+
+    def test_datetime_split_points(self):
+        points = partition.split_points('2018-01-01T00:00:00+00:00',
+                                        '2018-01-03T00:00:00+00:00', 2)
+        assert_that([p.isoformat() for p in points],
+                    equal_to(['2018-01-02T00:00:00+00:00']))
+
+    def test_plan_partitions(self):
+        assert_that(partition.plan_partitions(0, 90, 3), equal_to([
+            {'lower': None, 'upper': 30, 'done': False},
+            {'lower': 30, 'upper': 60, 'done': False},
+            {'lower': 60, 'upper': None, 'done': False}]))
+
+    def test_first_partition_keeps_nulls(self):
+        clause, params = partition.partition_filter(
+            {'lower': None, 'upper': 30}, 'id', Schema(type='integer'))
+        assert_that(clause, equal_to('("id" < %(partition_upper)s OR '
+                                     '"id" IS NULL)'))
+        assert_that(params, equal_to({'partition_upper': 30}))
+
+    def test_partition_column_prefers_integer_primary_key(
+            self, full_table_entry):
+        mdata = singer.metadata.to_map(full_table_entry.metadata)
+        assert_that(partition.partition_column(
+            mdata, full_table_entry.schema), equal_to('id'))
+
+
+class TestPartitionedSync(object):
+    def test_syncs_every_partition(
+            self, config, fake_connection, full_table_entry, monkeypatch):
+        rows = [(i, None, datetime.datetime(2018, 1, 1)) for i in range(10)]
+        connections = []
+
+        def open_connection(config, dbname=None):
+            connections.append(fake_connection(table_by_id(rows)))
+            return connections[-1]
+
+        monkeypatch.setattr(tap_redshift, 'open_connection', open_connection)
+        messages = list(tap_redshift.sync_table(
+            fake_connection(table_by_id(rows)),
+            partitioned(full_table_entry), {}))
+
+        ids = sorted(r['id'] for m in messages if isinstance(m, RecordBatch)
+                     for r in m.records)
+        assert_that(ids, equal_to(list(range(10))))
+        assert_that(connections, has_length(2))
+        bookmark = messages[-1].value['bookmarks'][
+            full_table_entry.tap_stream_id]
+        assert_that(bookmark, equal_to({'version': None}))
+
+    def test_resumes_unfinished_partitions(
+            self, config, fake_connection, full_table_entry, monkeypatch):
+        rows = [(i, None, datetime.datetime(2018, 1, 1)) for i in range(10)]
+        monkeypatch.setattr(
+            tap_redshift, 'open_connection',
+            lambda config, dbname=None: fake_connection(table_by_id(rows)))
+        state = {'bookmarks': {full_table_entry.tap_stream_id: {
+            'version': 1,
+            'partition_key': 'id',
+            'partitions': [{'lower': None, 'upper': 5, 'done': True},
+                           {'lower': 5, 'upper': None, 'done': False}]}}}
+
+        messages = list(tap_redshift.sync_table(
+            fake_connection(table_by_id(rows)),
+            partitioned(full_table_entry, count=2), state))
+
+        ids = sorted(r['id'] for m in messages if isinstance(m, RecordBatch)
+                     for r in m.records)
+        assert_that(ids, equal_to([5, 6, 7, 8, 9]))
+        assert_that(messages[0].version, equal_to(1))
+
+    def test_build_state_keeps_partitions(self, full_table_entry):
+        bookmark = {'version': 1,
+                    'partition_key': 'id',
+                    'partition_max': 9,
+                    'partitions': [{'lower': None, 'upper': None,
+                                    'done': False}]}
+        state = tap_redshift.build_state(
+            {'bookmarks': {full_table_entry.tap_stream_id: bookmark}},
+            singer.catalog.Catalog([partitioned(full_table_entry)]))
+        assert_that(state['bookmarks'][full_table_entry.tap_stream_id],
+                    equal_to(bookmark))
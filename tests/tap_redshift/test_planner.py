@@ -0,0 +1,135 @@
+# tap-redshift
+# Copyright 2018 data.world, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the
+# License.
+#
+# You may obtain a copy of the License at
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied. See the License for the specific language governing
+# permissions and limitations under the License.
+#
+# This product includes software developed at
+# data.world, Inc.(http://data.world/).
+
+import psycopg2
+from doublex import assert_that
+from hamcrest import contains_string, equal_to, has_entries, is_not, has_key
+from singer import metadata
+
+import tap_redshift
+from tap_redshift import planner
+
+
+def stream_metadata(entry):
+    return metadata.to_map(entry.metadata)[()]
+
+
+class TestPlanExtraction(object):
+    def test_small_table_uses_plain_cursor(self):
+        plan, reason = planner.plan_extraction(5000, 10, True, {})
+        assert_that(plan, has_entries({'extraction-method': 'CURSOR',
+                                       'server-side-cursor': False}))
+
+    def test_medium_table_uses_server_side_cursor(self):
+        plan, reason = planner.plan_extraction(5000000, 5000, True, {})
+        assert_that(plan, has_entries({'extraction-method': 'CURSOR',
+                                       'server-side-cursor': True}))
+        assert_that(plan, is_not(has_key('partition-count')))
+
+    def test_itersize_follows_row_width(self):
+        narrow, _ = planner.plan_extraction(2000000, 200, False, {})
+        wide, _ = planner.plan_extraction(2000000, 200000, False, {})
+        assert_that(narrow['itersize'], equal_to(planner.MAX_ITERSIZE))
+        assert_that(wide['itersize'], equal_to(planner.MIN_ITERSIZE))
+
+    def test_large_table_is_unloaded_when_configured(self):
+        plan, reason = planner.plan_extraction(
+            500000000, 10, True, {'unload_location': 's3://bucket/tap'})
+        assert_that(plan['extraction-method'], equal_to('UNLOAD'))
+
+    def test_large_table_is_partitioned_when_allowed(self):
+        plan, reason = planner.plan_extraction(
+            250000000, 10, True, {'max_partitions': 8})
+        assert_that(plan['partition-count'], equal_to(8))
+
+
+class TestPlanEntry(object):
+    def test_plans_are_stored_in_metadata(
+            self, config, fake_connection, full_table_entry):
+        conn = fake_connection([('public', 'orders', 5000, 1)])
+        entry = planner.plan_entry(
+            full_table_entry, planner.table_stats(conn, 'public'), config)
+
+        assert_that(stream_metadata(entry), has_entries({
+            'row-count': 5000,
+            'table-size-mb': 1,
+            'extraction-method': 'CURSOR',
+            'server-side-cursor': False}))
+
+    def test_catalog_overrides_are_kept(
+            self, config, fake_connection, full_table_entry):
+        full_table_entry.metadata[0]['metadata']['server-side-cursor'] = True
+        conn = fake_connection([('public', 'orders', 5000, 1)])
+        entry = planner.plan_entry(
+            full_table_entry, planner.table_stats(conn, 'public'), config)
+
+        assert_that(stream_metadata(entry),
+                    has_entries({'server-side-cursor': True}))
+
+    def test_planned_values_are_planned_again(self, config,
+                                              full_table_entry):
+        planner.plan_entry(full_table_entry, {'public.orders': (5000, 1)},
+                           config)
+        entry = planner.plan_entry(
+            full_table_entry, {'public.orders': (5000000, 1000)}, config)
+
+        mdata = stream_metadata(entry)
+        assert_that(mdata, has_entries({
+            'row-count': 5000000,
+            'server-side-cursor': True,
+            'extraction-plan': has_entries({'server-side-cursor': True}),
+            'extraction-plan-reason': contains_string('5000000 rows')}))
+
+    def test_edited_plan_values_are_kept(self, config, full_table_entry):
+        planner.plan_entry(full_table_entry, {'public.orders': (5000, 1)},
+                           config)
+        full_table_entry.metadata[0]['metadata']['itersize'] = 10
+        entry = planner.plan_entry(
+            full_table_entry, {'public.orders': (5000000, 1000)}, config)
+
+        mdata = stream_metadata(entry)
+        assert_that(mdata['itersize'], equal_to(10))
+        assert_that(mdata['extraction-plan'], is_not(has_key('itersize')))
+        assert_that(mdata['server-side-cursor'], equal_to(True))
+
+    def test_unreadable_table_info(
+            self, config, fake_connection, full_table_entry):
+        def denied(query, params):
+            raise psycopg2.ProgrammingError('permission denied')
+
+        conn = fake_connection(denied)
+        entry = planner.plan_entry(
+            full_table_entry, planner.table_stats(conn, 'public'), config)
+
+        assert_that(stream_metadata(entry),
+                    is_not(has_key('extraction-method')))
+        assert_that(conn.queries[-1], equal_to(('ROLLBACK', None)))
+
+    def test_config_settings_are_not_planned(
+            self, config, fake_connection, full_table_entry):
+        config.update({'server_side_cursor': True, 'itersize': 500})
+        entry = planner.plan_entry(
+            full_table_entry, {'public.orders': (5000, 1)}, config)
+
+        mdata = metadata.to_map(entry.metadata)
+        assert_that(mdata[()], is_not(has_key('server-side-cursor')))
+        assert_that(mdata[()], is_not(has_key('itersize')))
+        cursor = tap_redshift.open_cursor(fake_connection([]), mdata)
+        assert_that((cursor.name, cursor.itersize),
+                    equal_to(('tap_redshift_sync', 500)))
@@ -18,12 +18,13 @@
 # data.world, Inc.(http://data.world/).
 
 from doublex import assert_that
-from hamcrest import (equal_to, calling, raises, contains_inanyorder)
+from hamcrest import (equal_to, calling, raises, contains_inanyorder,
+                      none, same_instance)
 from singer.schema import Schema
 
 import tap_redshift
-from tap_redshift.resolve import (entry_is_selected, get_selected_properties,
-                                  resolve_catalog)
+from tap_redshift.resolve import (CatalogIndex, entry_is_selected,
+                                  get_selected_properties, resolve_catalog)
 
 
 class TestResolve(object):
@@ -75,3 +76,28 @@ class TestResolve(object):
                             *streams_and_properties[entry.stream]))
 
             # TODO test currently_syncing scenario
+
+
+class TestCatalogIndex(object):
+    def test_get_stream(self, expected_catalog_from_db):
+        index = CatalogIndex(expected_catalog_from_db)
+        assert_that(index.get_stream('test-db.public.table2'),
+                    same_instance(expected_catalog_from_db.streams[1]))
+        assert_that(index.get_stream('test-db.public.missing'), none())
+
+    def test_metadata_is_parsed_once(self, expected_catalog_from_db):
+        index = CatalogIndex(expected_catalog_from_db)
+        entry = expected_catalog_from_db.streams[0]
+        assert_that(index.metadata(entry), same_instance(
+            index.metadata(entry)))
+        assert_that(index.metadata(entry)[()]['schema-name'],
+                    equal_to('table1'))
+
+    def test_replaced_metadata_is_parsed_again(self,
+                                               expected_catalog_from_db):
+        index = CatalogIndex(expected_catalog_from_db)
+        entry = expected_catalog_from_db.streams[0]
+        index.metadata(entry)
+        entry.metadata = [{'breadcrumb': (), 'metadata': {'selected': True}}]
+        assert_that(index.metadata(entry),
+                    equal_to({(): {'selected': True}}))
@@ -0,0 +1,127 @@
+# tap-redshift
+# Copyright 2018 data.world, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the
+# License.
+#
+# You may obtain a copy of the License at
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied. See the License for the specific language governing
+# permissions and limitations under the License.
+#
+# This product includes software developed at
+# data.world, Inc.(http://data.world/).
+import datetime
+
+import singer
+from doublex import assert_that
+from hamcrest import contains_string, equal_to, is_not
+
+import tap_redshift
+from tap_redshift import rowhash
+from tap_redshift.messages import RecordBatch
+
+ROWS = [(1, None, datetime.datetime(2018, 1, 1)),
+        (2, None, datetime.datetime(2018, 1, 2))]
+
+
+def table_with_signature(signature):
+    '''Serves a table signature query and the table's rows.'''
+    def results(query, params):
+        if query.startswith('SELECT COUNT(*)'):
+            return [signature]
+        return ROWS
+    return results
+
+
+def skipping_unchanged(entry):
+    entry.metadata[0]['metadata']['skip-unchanged'] = True
+    return entry
+
+
+class TestRowHash(object):
+    def test_row_hash_sql(self):
+        mdata = {('properties', 'a'): {'sql-datatype': 'int4'},
+                 ('properties', 'b'): {'sql-datatype': 'varchar'}}
+        assert_that(rowhash.row_hash_sql(['a', 'b'], mdata), equal_to(
+            "MD5(COALESCE('+' || \"a\"::VARCHAR(MAX), '-') || '|' || "
+            "COALESCE('+' || \"b\"::VARCHAR(MAX), '-'))"))
+
+    def test_bool_columns_are_not_cast(self):
+        mdata = {('properties', 'a'): {'sql-datatype': 'bool'}}
+        assert_that(rowhash.row_hash_sql(['a'], mdata), equal_to(
+            "MD5(COALESCE('+' || CASE WHEN \"a\" THEN 't' "
+            "WHEN NOT \"a\" THEN 'f' END, '-'))"))
+
+    def test_table_signature(self, fake_connection):
+        conn = fake_connection([(2, 1234)])
+        with conn.cursor() as cursor:
+            signature = rowhash.table_signature(
+                cursor, ['id'], {}, '"public"."orders"')
+        assert_that(signature, equal_to([2, 1234]))
+        assert_that(conn.queries[0][0], contains_string(
+            'SUM(STRTOL(LEFT(MD5('))
+
+
+class TestSkipUnchanged(object):
+    def test_first_sync_bookmarks_signature(self, config, fake_connection,
+                                            full_table_entry):
+        messages = list(tap_redshift.sync_table(
+            fake_connection(table_with_signature((2, 1234))),
+            skipping_unchanged(full_table_entry), {}))
+
+        assert_that(len([m for m in messages if isinstance(m, RecordBatch)]),
+                    equal_to(1))
+        assert_that(singer.get_bookmark(
+            messages[-1].value, full_table_entry.tap_stream_id,
+            'table_signature'), equal_to([2, 1234]))
+
+    def test_hashes_bool_columns_without_a_cast(
+            self, config, fake_connection, bool_column_entry):
+        conn = fake_connection(table_with_signature((2, 1234)))
+        list(tap_redshift.sync_table(
+            conn, skipping_unchanged(bool_column_entry), {}))
+
+        assert_that(conn.queries[0][0], contains_string(
+            "CASE WHEN \"active\" THEN 't' WHEN NOT \"active\" THEN 'f' "
+            "END"))
+        assert_that(conn.queries[0][0],
+                    is_not(contains_string('"active"::VARCHAR')))
+
+    def test_skips_unchanged_table(self, config, fake_connection,
+                                   full_table_entry):
+        state = {'bookmarks': {full_table_entry.tap_stream_id: {
+            'version': None, 'table_signature': [2, 1234]}}}
+        conn = fake_connection(table_with_signature((2, 1234)))
+        messages = list(tap_redshift.sync_table(
+            conn, skipping_unchanged(full_table_entry), state))
+
+        assert_that(messages, equal_to([]))
+        assert_that(len(conn.queries), equal_to(1))
+
+    def test_reads_changed_table(self, config, fake_connection,
+                                 full_table_entry):
+        state = {'bookmarks': {full_table_entry.tap_stream_id: {
+            'version': None, 'table_signature': [2, 1234]}}}
+        messages = list(tap_redshift.sync_table(
+            fake_connection(table_with_signature((3, 99))),
+            skipping_unchanged(full_table_entry), state))
+
+        assert_that(len([m for m in messages if isinstance(m, RecordBatch)]),
+                    equal_to(1))
+        assert_that(singer.get_bookmark(
+            messages[-1].value, full_table_entry.tap_stream_id,
+            'table_signature'), equal_to([3, 99]))
+
+    def test_build_state_keeps_signature(self, full_table_entry):
+        state = tap_redshift.build_state(
+            {'bookmarks': {full_table_entry.tap_stream_id: {
+                'table_signature': [2, 1234]}}},
+            singer.catalog.Catalog([full_table_entry]))
+        assert_that(state['bookmarks'][full_table_entry.tap_stream_id],
+                    equal_to({'table_signature': [2, 1234]}))
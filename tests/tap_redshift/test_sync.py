@@ -0,0 +1,109 @@
+# tap-redshift
+# Copyright 2018 data.world, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the
+# License.
+#
+# You may obtain a copy of the License at
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied. See the License for the specific language governing
+# permissions and limitations under the License.
+#
+# This product includes software developed at
+# data.world, Inc.(http://data.world/).
+
+from decimal import Decimal
+
+import singer
+from doublex import assert_that
+from hamcrest import contains_string, equal_to, is_not, none
+
+import tap_redshift
+from tap_redshift.messages import RecordBatch
+
+
+def records(messages):
+    return [record for m in messages if isinstance(m, RecordBatch)
+            for record in m.records]
+
+
+class TestSyncTable(object):
+    def test_full_table_sync(self, config, sync_conn, full_table_entry):
+        messages = list(tap_redshift.sync_table(
+            sync_conn, full_table_entry, {}))
+
+        assert_that([r['id'] for r in records(messages)],
+                    equal_to([1, 2, 3]))
+        assert_that(sync_conn.cursors[0].name, none())
+
+    def test_server_side_cursor(self, config, sync_conn, full_table_entry):
+        config.update({'server_side_cursor': True, 'itersize': 500})
+        messages = list(tap_redshift.sync_table(
+            sync_conn, full_table_entry, {}))
+
+        cursor = sync_conn.cursors[0]
+        assert_that(cursor.name, equal_to('tap_redshift_sync'))
+        assert_that(cursor.itersize, equal_to(500))
+        assert_that(len(records(messages)), equal_to(3))
+
+    def test_incremental_sync_bookmarks_last_row(
+            self, config, sync_conn, incremental_entry):
+        messages = list(tap_redshift.sync_table(
+            sync_conn, incremental_entry, {}))
+
+        state = messages[-1].value
+        assert_that(
+            singer.get_bookmark(state, incremental_entry.tap_stream_id,
+                                'replication_key_value'),
+            equal_to('2018-01-03T12:45:15Z'))
+
+    def test_rows_are_fetched_in_batches(
+            self, config, sync_conn, incremental_entry):
+        config['itersize'] = 2
+        messages = list(tap_redshift.sync_table(
+            sync_conn, incremental_entry, {}))
+
+        batches = [m for m in messages if isinstance(m, RecordBatch)]
+        assert_that([len(b) for b in batches], equal_to([2, 1]))
+        assert_that(batches[0].records[0],
+                    equal_to({'id': 1,
+                              'amount': Decimal('10.50'),
+                              'created_at': '2018-01-01T10:00:00Z'}))
+
+
+def keyed_by_id(entry):
+    entry.metadata[0]['metadata']['replication-key'] = 'id'
+    return entry
+
+
+class TestIntegerReplicationKey(object):
+    def test_first_sync_reads_every_row(self, config, sync_conn,
+                                        incremental_entry):
+        entry = keyed_by_id(incremental_entry)
+        messages = list(tap_redshift.sync_table(sync_conn, entry, {}))
+
+        assert_that(sync_conn.queries[0][0], is_not(contains_string('WHERE')))
+        assert_that(singer.get_bookmark(messages[-1].value,
+                                        entry.tap_stream_id,
+                                        'replication_key_value'),
+                    equal_to(3))
+
+    def test_resumes_from_bookmarked_id(self, config, sync_conn,
+                                        incremental_entry):
+        entry = keyed_by_id(incremental_entry)
+        state = tap_redshift.build_state(
+            {'bookmarks': {entry.tap_stream_id: {
+                'version': 1, 'replication_key': 'id',
+                'replication_key_value': 2}}},
+            singer.catalog.Catalog([entry]))
+        list(tap_redshift.sync_table(sync_conn, entry, state))
+
+        query, params = sync_conn.queries[0]
+        assert_that(query, contains_string(
+            'WHERE id >= %(replication_key_value)s ORDER BY id ASC'))
+        assert_that(params, equal_to({'replication_key_value': 2}))
@@ -200,7 +200,9 @@ expected_result = {
 
 
 class TestRedShiftTap(object):
-    def test_discover_catalog(self, discovery_conn, expected_catalog_from_db):
+    def test_discover_catalog(self, config, discovery_conn,
+                              expected_catalog_from_db):
+        config['discovery_method'] = 'information_schema'
         actual_catalog = tap_redshift.discover_catalog(discovery_conn,
                                                        'public')
         for i, actual_entry in enumerate(actual_catalog.streams):
@@ -240,7 +242,8 @@ class TestRedShiftTap(object):
         is_view = False
         expected_mdata = metadata.new()
         metadata.write(expected_mdata, (), 'selected-by-default', False)
-        metadata.write(expected_mdata, (), 'valid-replication-keys', ['col3'])
+        metadata.write(expected_mdata, (), 'valid-replication-keys',
+                       ['col1', 'col3'])
         metadata.write(expected_mdata, (),
                        'table-key-properties', key_properties)
         metadata.write(expected_mdata, (), 'is-view', is_view)
@@ -308,7 +311,9 @@ class TestRedShiftTap(object):
         expected_schema = stream_schema['schema']['properties']['created_at']
         assert_that(column_schema, equal_to(expected_schema))
 
-    def test_table_metadata(self, discovery_conn, expected_catalog_from_db):
+    def test_table_metadata(self, config, discovery_conn,
+                            expected_catalog_from_db):
+        config['discovery_method'] = 'information_schema'
         actual_catalog = tap_redshift.discover_catalog(discovery_conn,
                                                        'public')
         for i, actual_entry in enumerate(actual_catalog.streams):
@@ -348,4 +353,29 @@ class TestRedShiftTap(object):
             assert_that(actual_is_view,
                         equal_to(expected_is_view))
 
+    def test_pg_catalog_discovery_matches_information_schema(
+            self, config, discovery_conn, fake_connection):
+        pg_catalog_rows = [
+            ('public', 'table1', 'r', 1, 'col1', 'int2', True, [1]),
+            ('public', 'table1', 'r', 2, 'col2', 'float8', False, [1]),
+            ('public', 'table1', 'r', 3, 'col3', 'timestamptz', True, [1]),
+            ('public', 'table1', 'r', 4, 'col4', 'timestamp', True, [1]),
+            ('public', 'table1', 'r', 5, 'col5', 'timestamp with time zone',
+             True, [1]),
+            ('public', 'table2', 'r', 1, 'col1', 'int4', True, [1, 2]),
+            ('public', 'table2', 'r', 2, 'col2', 'bool', False, [1, 2]),
+            ('public', 'view1', 'v', 1, 'col1', 'varchar', True, None),
+            ('public', 'view1', 'v', 2, 'col2', 'unknown', True, None)]
+        conn = fake_connection(pg_catalog_rows)
+
+        actual_catalog = tap_redshift.discover_catalog(conn, 'public')
+        config['discovery_method'] = 'information_schema'
+        expected_catalog = tap_redshift.discover_catalog(discovery_conn,
+                                                         'public')
+
+        assert_that(len(conn.queries), equal_to(1))
+        assert_that(conn.queries[0][1], equal_to((('public',),)))
+        assert_that(actual_catalog.to_dict(),
+                    equal_to(expected_catalog.to_dict()))
+
         # TODO write tests for full and incremental sync
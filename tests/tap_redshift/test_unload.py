@@ -0,0 +1,160 @@
+# tap-redshift
+# Copyright 2018 data.world, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the
+# License.
+#
+# You may obtain a copy of the License at
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied. See the License for the specific language governing
+# permissions and limitations under the License.
+#
+# This product includes software developed at
+# data.world, Inc.(http://data.world/).
+
+import csv
+import datetime
+import gzip
+import io
+import json
+import os
+import re
+from decimal import Decimal
+from urllib.parse import urlparse
+
+import pytest
+import singer
+from doublex import assert_that
+from hamcrest import equal_to, contains_string
+
+import tap_redshift
+from tap_redshift import unload
+from tap_redshift.messages import RecordBatch
+
+UNLOADED_PARTS = [
+    [['1', '10.50', '2018-01-01 10:00:00'],
+     ['2', '0.25', '2018-01-02 11:30:00.5']],
+    [['3', '\\N', '2018-01-03 12:45:15']]]
+
+
+def unloading_table(parts, bounds=(datetime.datetime(2018, 1, 1),
+                                   datetime.datetime(2018, 1, 3, 12, 45, 15))):
+    '''Serves probes and writes UNLOAD output like Redshift would.'''
+    def results(query, params):
+        if query.startswith('SELECT MIN'):
+            return [bounds]
+        location = re.search(r"TO '([^']+)'", query).group(1)
+        directory = urlparse(location).path
+        os.makedirs(directory)
+        urls = []
+        for i, rows in enumerate(parts):
+            url = '{}{:04d}_part_00.gz'.format(location, i)
+            text = io.StringIO()
+            csv.writer(text).writerows(rows)
+            with gzip.open(urlparse(url).path, 'wb') as part:
+                part.write(text.getvalue().encode('utf-8'))
+            urls.append(url)
+        with open(os.path.join(directory, 'manifest'), 'w') as manifest:
+            json.dump({'entries': [{'url': url} for url in urls]}, manifest)
+        return []
+    return results
+
+
+def unloading(entry):
+    entry.metadata[0]['metadata']['extraction-method'] = 'UNLOAD'
+    return entry
+
+
+class TestUnload(object):
+    def test_unload_statement_escapes_query(self):
+        statement = unload.unload_statement(
+            "SELECT * FROM t WHERE name = 'x'", 's3://bucket/prefix/',
+            'arn:aws:iam::1:role/unload')
+        assert_that(statement, contains_string("name = ''x''"))
+        assert_that(statement, contains_string("TO 's3://bucket/prefix/'"))
+
+    def test_full_table_unload(
+            self, config, fake_connection, full_table_entry, tmpdir):
+        config.update({'unload_location': 'file://{}'.format(tmpdir),
+                       'unload_iam_role': 'arn:aws:iam::1:role/unload'})
+        connection = fake_connection(unloading_table(UNLOADED_PARTS))
+
+        messages = list(tap_redshift.sync_table(
+            connection, unloading(full_table_entry), {}))
+
+        records = sorted((r for m in messages if isinstance(m, RecordBatch)
+                          for r in m.records), key=lambda r: r['id'])
+        assert_that(records, equal_to([
+            {'id': 1, 'amount': Decimal('10.50'),
+             'created_at': '2018-01-01T10:00:00Z'},
+            {'id': 2, 'amount': Decimal('0.25'),
+             'created_at': '2018-01-02T11:30:00.500000Z'},
+            {'id': 3, 'amount': None,
+             'created_at': '2018-01-03T12:45:15Z'}]))
+        assert_that(tmpdir.listdir()[0].listdir()[0].listdir(), equal_to([]))
+
+    def test_incremental_unload_bookmarks_probed_max(
+            self, config, fake_connection, incremental_entry, tmpdir):
+        config.update({'unload_location': 'file://{}'.format(tmpdir),
+                       'unload_iam_role': 'arn:aws:iam::1:role/unload',
+                       'unload_cleanup': False})
+        connection = fake_connection(unloading_table(UNLOADED_PARTS))
+
+        messages = list(tap_redshift.sync_table(
+            connection, unloading(incremental_entry), {}))
+
+        unload_query = connection.queries[-1][0]
+        assert_that(unload_query,
+                    contains_string('<= %(replication_key_max)s'))
+        assert_that(
+            singer.get_bookmark(messages[-1].value,
+                                incremental_entry.tap_stream_id,
+                                'replication_key_value'),
+            equal_to('2018-01-03T12:45:15'))
+
+    def test_first_incremental_unload_over_integer_key(
+            self, config, fake_connection, incremental_entry, tmpdir):
+        config.update({'unload_location': 'file://{}'.format(tmpdir),
+                       'unload_iam_role': 'arn:aws:iam::1:role/unload',
+                       'unload_cleanup': False})
+        incremental_entry.metadata[0]['metadata']['replication-key'] = 'id'
+        connection = fake_connection(unloading_table(UNLOADED_PARTS, (1, 3)))
+
+        messages = list(tap_redshift.sync_table(
+            connection, unloading(incremental_entry), {}))
+
+        assert_that(connection.queries[-1][0], contains_string(
+            'FROM "public"."orders" WHERE "id" <= %(replication_key_max)s'))
+        assert_that(
+            singer.get_bookmark(messages[-1].value,
+                                incremental_entry.tap_stream_id,
+                                'replication_key_value'),
+            equal_to(3))
+
+    def test_requires_iam_role(self, config, fake_connection,
+                               incremental_entry, tmpdir):
+        config['unload_location'] = 'file://{}'.format(tmpdir)
+        connection = fake_connection(unloading_table(UNLOADED_PARTS))
+
+        with pytest.raises(Exception) as error:
+            list(tap_redshift.sync_table(
+                connection, unloading(incremental_entry), {}))
+        assert_that(str(error.value), contains_string('unload_iam_role'))
+        assert_that(connection.queries, equal_to([]))
+
+    def test_failed_read_still_cleans_up(
+            self, config, fake_connection, full_table_entry, tmpdir):
+        config.update({'unload_location': 'file://{}'.format(tmpdir),
+                       'unload_iam_role': 'arn:aws:iam::1:role/unload'})
+        connection = fake_connection(unloading_table(
+            UNLOADED_PARTS + [[['not a number', '1', '2018-01-01']]]))
+
+        with pytest.raises(ValueError):
+            list(tap_redshift.sync_table(
+                connection, unloading(full_table_entry), {}))
+        assert_that(tmpdir.listdir()[0].listdir()[0].listdir(), equal_to([]))
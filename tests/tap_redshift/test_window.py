@@ -0,0 +1,229 @@
+# tap-redshift
+# Copyright 2018 data.world, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the
+# License.
+#
+# You may obtain a copy of the License at
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied. See the License for the specific language governing
+# permissions and limitations under the License.
+#
+# This product includes software developed at
+# data.world, Inc.(http://data.world/).
+import datetime
+
+import pytest
+import singer
+from doublex import assert_that
+from hamcrest import contains_string, equal_to, is_not
+
+import tap_redshift
+from tap_redshift import convert, window
+from tap_redshift.messages import RecordBatch
+
+
+def windowed(entry, size=86400):
+    entry.metadata[0]['metadata'].update({'incremental-mode': 'WINDOWED',
+                                          'incremental-window': size})
+    return entry
+
+
+def table_by_created_at(rows):
+    '''Serves MIN/MAX probes and window queries over rows keyed by their
+    created_at column.'''
+    def results(query, params):
+        lower = params.get('window_lower')
+        upper = params.get('window_upper')
+        matching = [row for row in rows
+                    if (lower is None or row[2] >= lower) and
+                    (upper is None or row[2] < upper or
+                     '<= %(window_upper)s' in query and row[2] == upper)]
+        if query.startswith('SELECT MIN'):
+            values = [row[2] for row in matching]
+            return [(min(values), max(values)) if values else (None, None)]
+        return sorted(matching, key=lambda row: row[2])
+    return results
+
+
+def typecast_table(rows, cast):
+    '''Serves window queries over rows keyed by their created_at column as a
+    TypecastConnection does: MIN/MAX probes come back as the strings
+    `cast` turns Redshift's text output into.'''
+    serve = table_by_created_at(rows)
+
+    def results(query, params):
+        served = serve(query, params)
+        if query.startswith('SELECT MIN'):
+            return [tuple(None if value is None else cast(text(value), None)
+                          for value in served[0])]
+        return served
+    return results
+
+
+def text(value):
+    '''Returns a timestamp or date the way Redshift writes it out.'''
+    if isinstance(value, datetime.datetime):
+        return value.strftime('%Y-%m-%d %H:%M:%S')
+    return value.isoformat()
+
+
+class TestWindowHelpers(object):
+    def test_advance(self):
+        assert_that(window.advance(datetime.datetime(2018, 1, 1), 3600),
+                    equal_to(datetime.datetime(2018, 1, 1, 1)))
+        assert_that(window.advance(datetime.date(2018, 1, 1), 3600),
+                    equal_to(datetime.date(2018, 1, 2)))
+        assert_that(window.advance(10, 5), equal_to(15))
+
+    def test_window_size_must_be_positive(self):
+        with pytest.raises(Exception):
+            window.window_size({(): {'incremental-window': 0}}, {})
+        with pytest.raises(Exception):
+            window.window_size({}, {'incremental_window': -5})
+
+    def test_window_must_advance(self):
+        with pytest.raises(Exception):
+            window.advance(10, 0.5)
+
+    def test_last_window_includes_upper(self):
+        clause, params = window.window_filter('id', 10, 20, 15)
+        assert_that(clause, equal_to(
+            '"id" >= %(window_lower)s AND "id" <= %(window_upper)s'))
+        assert_that(params, equal_to({'window_lower': 10,
+                                      'window_upper': 15}))
+
+
+class TestWindowedSync(object):
+    rows = [(1, None, datetime.datetime(2018, 1, 1, 10)),
+            (2, None, datetime.datetime(2018, 1, 1, 20)),
+            (3, None, datetime.datetime(2018, 1, 2, 12)),
+            (4, None, datetime.datetime(2018, 1, 10, 9))]
+
+    def test_syncs_a_window_at_a_time(self, config, fake_connection,
+                                      incremental_entry):
+        conn = fake_connection(table_by_created_at(self.rows))
+        messages = list(tap_redshift.sync_table(
+            conn, windowed(incremental_entry), {}))
+
+        batches = [[r['id'] for r in m.records] for m in messages
+                   if isinstance(m, RecordBatch)]
+        assert_that(batches, equal_to([[1, 2], [3], [4]]))
+        checkpoints = [m.value['bookmarks'][incremental_entry.tap_stream_id]
+                       ['replication_key_value'] for m in messages
+                       if isinstance(m, singer.StateMessage)]
+        assert_that(checkpoints, equal_to([
+            '2018-01-02T10:00:00', '2018-01-03T12:00:00',
+            '2018-01-10T09:00:00', '2018-01-10T09:00:00']))
+
+    def test_every_query_sorts_one_window(self, config, fake_connection,
+                                          incremental_entry):
+        conn = fake_connection(table_by_created_at(self.rows))
+        list(tap_redshift.sync_table(conn, windowed(incremental_entry), {}))
+
+        window_queries = [q for q, _ in conn.queries
+                          if not q.startswith('SELECT MIN')]
+        assert_that(len(window_queries), equal_to(3))
+        for query in window_queries:
+            assert_that(query, contains_string(
+                'AND "created_at" >= %(window_lower)s'))
+
+    def test_zero_window_is_rejected(self, config, fake_connection,
+                                     incremental_entry):
+        conn = fake_connection(table_by_created_at(self.rows))
+        with pytest.raises(Exception):
+            list(tap_redshift.sync_table(
+                conn, windowed(incremental_entry, 0), {}))
+        assert_that(conn.queries, equal_to([]))
+
+    def test_nothing_new(self, config, fake_connection, incremental_entry):
+        conn = fake_connection(table_by_created_at([]))
+        messages = list(tap_redshift.sync_table(
+            conn, windowed(incremental_entry), {}))
+        assert_that(len(conn.queries), equal_to(1))
+        assert_that([m for m in messages if isinstance(m, RecordBatch)],
+                    equal_to([]))
+
+
+class TestTypecastBounds(object):
+    def test_timestamp_bounds(self, config, fake_connection,
+                              incremental_entry):
+        utc = datetime.timezone.utc
+        rows = [(i, None, created.replace(tzinfo=utc))
+                for i, _, created in TestWindowedSync.rows]
+        conn = fake_connection(typecast_table(rows, convert.cast_timestamp))
+        messages = list(tap_redshift.sync_table(
+            conn, windowed(incremental_entry), {}))
+
+        assert_that([r['id'] for m in messages if isinstance(m, RecordBatch)
+                     for r in m.records], equal_to([1, 2, 3, 4]))
+        window_params = [params for query, params in conn.queries
+                         if not query.startswith('SELECT MIN')]
+        assert_that(window_params[0]['window_upper'], equal_to(
+            datetime.datetime(2018, 1, 2, 10, tzinfo=utc)))
+
+    def test_date_bounds(self, config, fake_connection, incremental_entry):
+        incremental_entry.schema.properties['created_at'].format = 'date'
+        rows = [(1, None, datetime.date(2018, 1, 1)),
+                (2, None, datetime.date(2018, 1, 2)),
+                (3, None, datetime.date(2018, 1, 5))]
+        conn = fake_connection(typecast_table(rows, convert.cast_date))
+        messages = list(tap_redshift.sync_table(
+            conn, windowed(incremental_entry), {}))
+
+        batches = [[r['id'] for r in m.records] for m in messages
+                   if isinstance(m, RecordBatch)]
+        assert_that(batches, equal_to([[1], [2], [3]]))
+        assert_that(messages[-1].value['bookmarks'][
+            incremental_entry.tap_stream_id]['replication_key_value'],
+            equal_to('2018-01-05'))
+
+
+class TestUnorderedSync(object):
+    rows = TestWindowedSync.rows
+
+    def unordered(self, entry, **extra):
+        entry.metadata[0]['metadata'].update(
+            {'incremental-mode': 'UNORDERED'}, **extra)
+        return entry
+
+    def test_bookmarks_largest_value_once_read(
+            self, config, fake_connection, incremental_entry):
+        rows = [self.rows[2], self.rows[0], self.rows[3], self.rows[1]]
+        conn = fake_connection(rows)
+        config['itersize'] = 2
+        messages = list(tap_redshift.sync_table(
+            conn, self.unordered(incremental_entry), {}))
+
+        assert_that(conn.queries[0][0], is_not(contains_string('ORDER BY')))
+        states = [m for m in messages if isinstance(m, singer.StateMessage)]
+        assert_that(len(states), equal_to(1))
+        assert_that(states[0].value['bookmarks'][
+            incremental_entry.tap_stream_id]['replication_key_value'],
+            equal_to('2018-01-10T09:00:00Z'))
+
+    def test_windows_are_not_sorted(self, config, fake_connection,
+                                    incremental_entry):
+        conn = fake_connection(table_by_created_at(self.rows))
+        list(tap_redshift.sync_table(conn, self.unordered(
+            incremental_entry, **{'incremental-window': 86400}), {}))
+
+        assert_that(len(conn.queries), equal_to(6))
+        for query, _ in conn.queries:
+            assert_that(query, is_not(contains_string('ORDER BY')))
+
+    def test_batch_max_compares_timestamps_in_time_order(self):
+        batch = RecordBatch('orders', [
+            {'created_at': '2018-01-01T10:00:00.500000Z'},
+            {'created_at': '2018-01-01T10:00:00Z'},
+            {'created_at': None}])
+        assert_that(window.batch_max(batch, 'created_at'),
+                    equal_to('2018-01-01T10:00:00.500000Z'))
+        assert_that(window.batch_max(batch, 'created_at',
+                                     '2018-01-02T00:00:00Z'),
+                    equal_to('2018-01-02T00:00:00Z'))